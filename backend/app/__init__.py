@@ -1,13 +1,15 @@
 import logging
-import datetime
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 import pymysql
 
 from .config import Config
-from .extensions import limiter
+from .extensions import limiter, compressor, log_pipeline, metrics, sql_tracer, profiler, captcha_pool, token_guard, feishu_client, login_guard, thumbnail_service, backup_runner, batch_verifier
 from .db import init_db
+from .scheduler import init_scheduler
+from .utils import fast_json
 
 # 引入路由蓝图
 from .routes.auth import auth_bp
@@ -17,17 +19,9 @@ from .routes.audit import audit_bp
 
 def configure_logging():
     """
-    对应 server.py 中 # 配置日志 (北京时间) 部分
+    日志经有界队列交给后台线程写出 (JSON，北京时间)，请求线程不做文件 I/O，见 utils/log_pipeline.py
     """
-    def beijing_converter(*args):
-        return (datetime.datetime.utcnow() + datetime.timedelta(hours=8)).timetuple()
-
-    logging.Formatter.converter = beijing_converter
-    logging.basicConfig(
-        level=logging.INFO, 
-        format='%(asctime)s - %(levelname)s - %(message)s', 
-        handlers=[logging.FileHandler("app.log", encoding='utf-8'), logging.StreamHandler()]
-    )
+    log_pipeline.configure(Config)
     # 获取 logger 实例
     return logging.getLogger(__name__)
 
@@ -36,10 +30,36 @@ logger = configure_logging()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    fast_json.init_app(app)
+    # 部署在反向代理之后时，remote_addr (登录防爆破 / 限流按 IP 计数) 取代理转发的客户端地址
+    hops = app.config.get('TRUSTED_PROXY_HOPS', 0)
+    if hops: app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
 
     # 初始化插件
-    CORS(app)
+    # 暴露分页预览相关响应头给前端
+    CORS(app, expose_headers=['X-Request-ID', 'X-Page-Count', 'X-Page-Range', 'X-Checksum-Sha256', 'X-Part-Offset', 'X-Part-Count', 'X-Profile-Id'])
+    # after_request 按注册的逆序执行，压缩在其余插件之前注册，待它们改完响应后再压缩
+    compressor.init_app(app)
+    log_pipeline.init_app(app)
     limiter.init_app(app)
+    metrics.init_app(app)
+    limiter.exempt(app.view_functions['metrics'])
+    sql_tracer.init_app(app)
+    profiler.init_app(app)
+    captcha_pool.init_app(app)
+    token_guard.init_app(app)
+    feishu_client.init_app(app)
+    login_guard.init_app(app)
+    thumbnail_service.init_app(app)
+    backup_runner.init_app(app)
+    batch_verifier.init_app(app)
+    metrics.register_collector('captcha', captcha_pool.snapshot)
+    metrics.register_collector('login_guard', login_guard.snapshot)
+    metrics.register_collector('feishu', lambda: dict(feishu_client.stats))
+    metrics.register_collector('sql', lambda: dict(sql_tracer.stats))
+    metrics.register_collector('profiler', profiler.snapshot)
+    metrics.register_collector('logging', log_pipeline.snapshot)
+    metrics.register_collector('compression', compressor.snapshot)
 
     # 注册蓝图 (将拆分的路由挂载到主程序)
     app.register_blueprint(auth_bp)
@@ -59,7 +79,8 @@ def create_app():
     @app.after_request
     def add_security_headers(response):
         response.headers['X-Content-Type-Options'] = 'nosniff'
-        if request.path.startswith('/api/'):
+        # 列表接口自带 ETag 与 private, no-cache (可缓存但每次重新验证)，不覆盖
+        if request.path.startswith('/api/') and 'Cache-Control' not in response.headers:
             response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
             response.headers['Pragma'] = 'no-cache'
             response.headers['Expires'] = '0'
@@ -72,4 +93,10 @@ def create_app():
         except Exception as e: 
             logger.error(f"DB Init Failed: {e}")
 
+    # 定时备份
+    try:
+        init_scheduler(app)
+    except Exception as e:
+        logger.error(f"Scheduler Init Failed: {e}")
+
     return app
\ No newline at end of file
@@ -9,16 +9,124 @@ class Config:
     DB_HOST = os.getenv('DB_HOST', '192.168.252.49')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASS = os.getenv('DB_PASS', 'mysql_ZtpfH7')
-    DB_NAME = 'contract_system'
+    DB_NAME = os.getenv('DB_NAME', 'contract_system')
 
     SECRET_KEY = os.getenv('SECRET_KEY') or uuid.uuid4().hex
 
     FEISHU_APP_ID = "cli_a9ac2ab224fa1cd1"
     FEISHU_APP_SECRET = os.getenv('FEISHU_APP_SECRET', "580ZjrMTq74UD6nUyivZqeH4SdmE3w61")
+    # 可指向本地 stub (tools/feishu_stub.py) 做联调/压测
+    FEISHU_BASE_URL = os.getenv('FEISHU_BASE_URL', "https://open.feishu.cn")
+    FEISHU_CONNECT_TIMEOUT = float(os.getenv('FEISHU_CONNECT_TIMEOUT', 3))
+    FEISHU_READ_TIMEOUT = float(os.getenv('FEISHU_READ_TIMEOUT', 10))
+    FEISHU_TOKEN_REFRESH_AHEAD = int(os.getenv('FEISHU_TOKEN_REFRESH_AHEAD', 300))
 
     # 使用绝对路径，确保在任何地方运行都不会出错
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'contracts_storage')
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
 
-    ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx', 'xls', 'xlsx'}
\ No newline at end of file
+    # 预览缓存 (Office 转换结果等)，与 contracts_storage 同级，可随时清空
+    PREVIEW_CACHE_FOLDER = os.getenv('PREVIEW_CACHE_FOLDER', os.path.join(BASE_DIR, 'preview_cache'))
+    CONVERT_CACHE_FOLDER = os.path.join(PREVIEW_CACHE_FOLDER, 'converted')
+    # 转换缓存上限(MB)，超出后按最近访问时间淘汰；合同删除 / 替换时对应缓存随之删除
+    CONVERT_CACHE_MAX_MB = int(os.getenv('CONVERT_CACHE_MAX_MB', 2048))
+
+    # 缩略图缓存上限(MB) / 生成线程数 / 上传时预生成的页数
+    THUMB_CACHE_MAX_MB = int(os.getenv('THUMB_CACHE_MAX_MB', 512))
+    THUMB_WORKERS = int(os.getenv('THUMB_WORKERS', 2))
+    THUMB_PREGENERATE_PAGES = int(os.getenv('THUMB_PREGENERATE_PAGES', 1))
+
+    # Office 转换上限：最大行(段)数 / 最大页数 / 内存缓冲阈值(字节)
+    OFFICE_MAX_ROWS = int(os.getenv('OFFICE_MAX_ROWS', 100000))
+    OFFICE_MAX_PAGES = int(os.getenv('OFFICE_MAX_PAGES', 2000))
+    OFFICE_SPOOL_MAX_BYTES = int(os.getenv('OFFICE_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+    # xlsx 表格渲染时用于估算列宽的采样行数
+    XLSX_SAMPLE_ROWS = int(os.getenv('XLSX_SAMPLE_ROWS', 200))
+
+    # 备份：目录 / 并行压缩线程数 / 连续增量次数上限 (之后自动全量) / gzip 级别
+    BACKUP_FOLDER = os.getenv('BACKUP_FOLDER', os.path.join(BASE_DIR, 'backups'))
+    BACKUP_WORKERS = int(os.getenv('BACKUP_WORKERS', 4))
+    BACKUP_MAX_CHAIN = int(os.getenv('BACKUP_MAX_CHAIN', 7))
+    BACKUP_COMPRESS_LEVEL = int(os.getenv('BACKUP_COMPRESS_LEVEL', 6))
+    # 备份读写带宽上限 (MB/s，读文件、写归档、导出数据库共用)，0 为不限
+    BACKUP_BANDWIDTH_MB = float(os.getenv('BACKUP_BANDWIDTH_MB', 0))
+    # 备份分段下载的段大小 (MB)
+    BACKUP_PART_SIZE_MB = int(os.getenv('BACKUP_PART_SIZE_MB', 512))
+    # 各 worker 从 system_settings 重新读取备份计划的周期(秒)
+    BACKUP_SCHEDULE_SYNC_SECONDS = int(os.getenv('BACKUP_SCHEDULE_SYNC_SECONDS', 60))
+
+    # 批量水印验证：并行线程数 / 单次最多文件数 / 解压后总体积上限(MB)
+    VERIFY_WORKERS = int(os.getenv('VERIFY_WORKERS', os.cpu_count() or 2))
+    VERIFY_MAX_FILES = int(os.getenv('VERIFY_MAX_FILES', 1000))
+    VERIFY_MAX_MB = int(os.getenv('VERIFY_MAX_MB', 2048))
+
+    ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx', 'xls', 'xlsx'}
+
+    # /metrics 访问令牌 (Bearer)；为空时只允许 METRICS_ALLOW 中的地址 (逗号分隔的 IP / CIDR) 直接访问，其余返回 403
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_ALLOW = os.getenv('METRICS_ALLOW', '127.0.0.1,::1')
+    # SQL 追踪：慢查询阈值(毫秒) / 单请求同形状语句超过多少次视为 N+1 / 保留的记录条数
+    SQL_SLOW_MS = int(os.getenv('SQL_SLOW_MS', 200))
+    SQL_N_PLUS_ONE = int(os.getenv('SQL_N_PLUS_ONE', 10))
+    SQL_TRACE_BUFFER = int(os.getenv('SQL_TRACE_BUFFER', 200))
+    # 采样分析器：采样间隔(毫秒) / 单次最长采样(秒) / 结果目录 (多 worker 共享)
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 10))
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 120))
+    PROFILE_FOLDER = os.path.join(PREVIEW_CACHE_FOLDER, 'profiles')
+
+    # 日志：异步队列 + JSON；输出目标 file (每 worker 一个文件) / socket (tools/log_aggregator.py 聚合) / stdout
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json / text
+    LOG_SINK = os.getenv('LOG_SINK', 'file')  # file / socket / stdout
+    LOG_DIR = os.getenv('LOG_DIR', os.path.join(BASE_DIR, 'logs'))
+    LOG_PER_WORKER = os.getenv('LOG_PER_WORKER', '1') == '1'
+    LOG_ROTATE = os.getenv('LOG_ROTATE', 'size')  # size / time
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+    LOG_MAX_MB = int(os.getenv('LOG_MAX_MB', 50))
+    LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 10))
+    LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 14))
+    LOG_SOCKET = os.getenv('LOG_SOCKET', '127.0.0.1:9020')
+    LOG_STDOUT = os.getenv('LOG_STDOUT', '1') == '1'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+    # ASGI 模式 (backend/asgi.py) 各线程池大小：轻量接口 / 水印等 CPU 密集接口 (默认核数) / 外部 I/O；请求体内存缓冲上限(MB)
+    ASGI_LIGHT_WORKERS = int(os.getenv('ASGI_LIGHT_WORKERS', 32))
+    ASGI_HEAVY_WORKERS = int(os.getenv('ASGI_HEAVY_WORKERS', os.cpu_count() or 2))
+    ASGI_IO_WORKERS = int(os.getenv('ASGI_IO_WORKERS', 64))
+    ASGI_SPOOL_MB = int(os.getenv('ASGI_SPOOL_MB', 1))
+
+    # JSON 序列化：orjson (未安装时自动退回标准库) / std
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+    # 响应压缩：JSON / 文本响应超过阈值(字节)时按 Accept-Encoding 选择 br (需安装 brotli) 或 gzip
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.getenv('COMPRESS_BR_QUALITY', 4))
+    # 目录树接口：默认展开层数 (0 为不限) / 单次返回的最多节点数，超出的子目录由前端按需展开
+    FOLDER_TREE_DEPTH = int(os.getenv('FOLDER_TREE_DEPTH', 2))
+    FOLDER_TREE_MAX_NODES = int(os.getenv('FOLDER_TREE_MAX_NODES', 2000))
+
+    # 验证码池：预渲染数量 / 有效期(秒) / 同时有效的已发放验证码上限 (超出淘汰最早的)
+    CAPTCHA_POOL_SIZE = int(os.getenv('CAPTCHA_POOL_SIZE', 200))
+    CAPTCHA_TTL = int(os.getenv('CAPTCHA_TTL', 300))
+    CAPTCHA_MAX_ISSUED = int(os.getenv('CAPTCHA_MAX_ISSUED', 10000))
+
+    # token epoch 同步周期(秒) / 已验签 token 缓存条数
+    TOKEN_EPOCH_SYNC_INTERVAL = int(os.getenv('TOKEN_EPOCH_SYNC_INTERVAL', 10))
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 4096))
+
+    # 反向代理层数：>0 时按 X-Forwarded-For 等头取客户端 IP (ProxyFix)，只应在确有对应层数的可信代理时设置
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+
+    # 登录防爆破：用户名失败阈值、IP 失败阈值 (超过后该 IP 每 LOGIN_IP_DELAY 秒一次尝试)、统计窗口(秒)、锁定时长(分钟)、退避基数/上限(秒)
+    LOGIN_FAIL_THRESHOLD = int(os.getenv('LOGIN_FAIL_THRESHOLD', 5))
+    LOGIN_IP_FAIL_THRESHOLD = int(os.getenv('LOGIN_IP_FAIL_THRESHOLD', 100))
+    LOGIN_IP_DELAY = float(os.getenv('LOGIN_IP_DELAY', 2))
+    LOGIN_FAIL_WINDOW = int(os.getenv('LOGIN_FAIL_WINDOW', 900))
+    LOGIN_LOCKOUT_MINUTES = int(os.getenv('LOGIN_LOCKOUT_MINUTES', 15))
+    LOGIN_DELAY_BASE = float(os.getenv('LOGIN_DELAY_BASE', 1))
+    LOGIN_DELAY_MAX = float(os.getenv('LOGIN_DELAY_MAX', 30))
+
+    # 图片盲水印：线程池大小、QIM 量化步长 (越大越抗压缩、画质损失越大；修改后旧图片将无法解码)
+    WATERMARK_WORKERS = int(os.getenv('WATERMARK_WORKERS', os.cpu_count() or 2))
+    WATERMARK_STRENGTH = float(os.getenv('WATERMARK_STRENGTH', 48))
\ No newline at end of file
@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import request, jsonify, current_app
-import jwt
+
+from app.extensions import token_guard
 
 def token_required(f):
     @wraps(f)
@@ -11,7 +12,11 @@ def token_required(f):
             token = request.headers['Authorization'].split(" ")[1]
         if not token: return jsonify({'error': 'Token is missing!'}), 401
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            data = token_guard.decode(token, current_app.config['SECRET_KEY'])
+        except: return jsonify({'error': 'Token is invalid or expired!'}), 401
+        # 吊销检查 (内存 epoch 表，不查库)
+        if not token_guard.is_current(data): return jsonify({'error': 'Token has been revoked!'}), 401
+        try:
             request.current_user_id = data['user_id']
             request.current_user_role = data.get('role')
             request.current_user_name = data.get('name', 'Unknown')
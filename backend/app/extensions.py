@@ -7,4 +7,48 @@ limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["3000 per day", "600 per hour"],
     storage_uri="memory://"
-)
\ No newline at end of file
+)
+
+# 异步结构化日志 + 请求关联 ID
+from app.utils.log_pipeline import log_pipeline
+
+# 请求 / SQL / 水印阶段指标 (/metrics)
+from app.utils.metrics import metrics
+
+# 逐请求 SQL 追踪 / 慢查询 / N+1 检测
+from app.utils.sql_trace import sql_tracer
+
+# 采样分析器 (管理员触发 / 单请求签名头)
+from app.utils.profiler import profiler
+
+# JSON / 文本响应压缩 (gzip / br)
+from app.utils.compression import ResponseCompressor
+compressor = ResponseCompressor()
+
+# 验证码池 (后台线程预渲染)
+from app.utils.captcha_pool import CaptchaPool
+captcha_pool = CaptchaPool()
+
+# JWT 吊销 / epoch 校验
+from app.utils.token_guard import TokenGuard
+token_guard = TokenGuard()
+
+# 飞书 API 客户端 (共享连接池 + token 缓存)
+from app.utils.feishu_client import FeishuClient
+feishu_client = FeishuClient()
+
+# 登录防爆破 (内存滑动窗口)
+from app.utils.login_guard import LoginGuard
+login_guard = LoginGuard()
+
+# 页面缩略图 / 栅格预览
+from app.utils.thumbnails import ThumbnailService
+thumbnail_service = ThumbnailService()
+
+# 备份后台任务 (文件锁防重叠)
+from app.utils.backup_jobs import BackupJobRunner
+backup_runner = BackupJobRunner()
+
+# 泄露排查批量水印验证
+from app.utils.batch_verify import BatchVerifier
+batch_verifier = BatchVerifier()
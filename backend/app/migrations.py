@@ -0,0 +1,151 @@
+# backend/app/migrations.py
+"""
+数据库 schema 的唯一来源：按版本号顺序执行的迁移列表。
+
+- schema_migrations 记录已执行的版本；init_db 启动时只查一次最大版本号，已是最新则直接返回；
+- 多个 worker 同时启动时用 MySQL GET_LOCK 串行化，拿到锁后再确认一次版本；
+- 每个迁移都写成可重复执行 (IF NOT EXISTS / 先查 information_schema)，
+  没有 schema_migrations 表的旧库会从版本 1 开始补齐，不会报错。
+新增字段 / 索引时追加一个新版本，不要修改已发布的版本。
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'contract_system_schema_migrate'
+
+# 版本 1：原 init_db 建出的表结构，之后新增的字段 / 表由后续版本追加
+TABLES = [
+    "users (id INT AUTO_INCREMENT PRIMARY KEY, feishu_open_id VARCHAR(255), username VARCHAR(100), password VARCHAR(255), name VARCHAR(100), email VARCHAR(255), role VARCHAR(20) DEFAULT 'user', is_active BOOLEAN DEFAULT TRUE, failed_attempts INT DEFAULT 0, lockout_until TIMESTAMP NULL, mfa_secret VARCHAR(32) DEFAULT NULL, force_change_password BOOLEAN DEFAULT FALSE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "user_groups (id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "group_members (group_id INT, user_id INT, PRIMARY KEY (group_id, user_id))",
+    "folders (id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(255) NOT NULL, parent_id INT DEFAULT 0, creator_id INT DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "contracts (id INT AUTO_INCREMENT PRIMARY KEY, title VARCHAR(255) NOT NULL, file_path VARCHAR(500) NOT NULL, file_type VARCHAR(50), security_level VARCHAR(50), file_size VARCHAR(50), uploader_id INT, folder_id INT DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "folder_permissions (id INT AUTO_INCREMENT PRIMARY KEY, folder_id INT NOT NULL, subject_id INT NOT NULL, subject_type ENUM('user', 'group') NOT NULL, can_view BOOLEAN DEFAULT FALSE, can_download BOOLEAN DEFAULT FALSE, UNIQUE KEY unique_perm (folder_id, subject_id, subject_type))",
+    "contract_permissions (id INT AUTO_INCREMENT PRIMARY KEY, contract_id INT NOT NULL, subject_id INT NOT NULL, subject_type ENUM('user', 'group') DEFAULT 'user', can_view BOOLEAN DEFAULT FALSE, can_download BOOLEAN DEFAULT FALSE, UNIQUE KEY unique_perm (contract_id, subject_id, subject_type))",
+    "audit_logs (id INT AUTO_INCREMENT PRIMARY KEY, user_id INT, contract_id INT, action_type VARCHAR(50), trace_id VARCHAR(255), created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+]
+
+# 热点查询所需索引: (表, 索引名, 列, 是否唯一)
+INDEXES = [
+    ('users', 'idx_users_username', 'username', False),                      # 账号登录
+    ('users', 'idx_users_feishu', 'feishu_open_id', False),                  # 飞书登录
+    ('group_members', 'idx_group_members_user', 'user_id', False),           # 主键以 group_id 开头，按用户查组需单独索引
+    ('folders', 'idx_folders_parent', 'parent_id, created_at', False),       # 子目录列表 (按创建时间排序)
+    ('folders', 'idx_folders_creator', 'creator_id', False),                 # 可见目录计算
+    ('contracts', 'idx_contracts_folder', 'folder_id, created_at', False),   # 目录下文件列表 (按时间倒序)
+    ('contracts', 'idx_contracts_folder_title', 'folder_id, title', False),  # 上传同名覆盖检查
+    ('contracts', 'idx_contracts_uploader', 'uploader_id', False),           # 可见文件计算
+    ('audit_logs', 'idx_audit_created', 'created_at', False),                # 审计日志按时间倒序分页
+    ('folder_permissions', 'idx_fp_subject', 'subject_type, subject_id', False),   # 按用户/组清理与查询授权
+    ('contract_permissions', 'idx_cp_subject', 'subject_type, subject_id', False),
+]
+
+
+# ---------- 工具 ----------
+def _column_exists(cursor, table, column):
+    cursor.execute("SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s", (table, column))
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND INDEX_NAME=%s", (table, index))
+    return cursor.fetchone() is not None
+
+
+def _add_column(cursor, table, column, ddl):
+    if not _column_exists(cursor, table, column): cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _add_index(cursor, table, index, columns, unique=False):
+    if not _index_exists(cursor, table, index):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {table}({columns})")
+
+
+# ---------- 迁移 ----------
+def _v1_baseline(cursor):
+    for t in TABLES: cursor.execute(f"CREATE TABLE IF NOT EXISTS {t}")
+
+
+def _v2_legacy_columns(cursor):
+    """早期库缺少的字段与索引 (原 init_db 中每次启动都执行的 SHOW COLUMNS / ALTER)"""
+    _add_column(cursor, 'users', 'mfa_secret', 'VARCHAR(32) DEFAULT NULL')
+    _add_column(cursor, 'users', 'force_change_password', 'BOOLEAN DEFAULT FALSE')
+    _add_column(cursor, 'users', 'token_epoch', 'INT DEFAULT 0')
+    _add_index(cursor, 'user_groups', 'unique_name', 'name', unique=True)
+    _add_index(cursor, 'audit_logs', 'idx_audit_trace', 'trace_id')
+
+
+def _v3_query_indexes(cursor):
+    for table, index, columns, unique in INDEXES: _add_index(cursor, table, index, columns, unique)
+
+
+def _v4_seed(cursor):
+    """默认管理员 (首次登录强制改密 + 绑定 MFA) 与默认用户组"""
+    for g_name in ['默认组', '管理组']:
+        cursor.execute("INSERT IGNORE INTO user_groups (name) VALUES (%s)", (g_name,))
+    cursor.execute("SELECT id FROM users WHERE username='admin'")
+    if cursor.fetchone(): return
+    cursor.execute("INSERT INTO users (username, password, name, role, force_change_password) VALUES ('admin', 'admin', '系统管理员', 'admin', 1)")
+    admin_id = cursor.lastrowid
+    cursor.execute("SELECT id FROM user_groups WHERE name='管理组'")
+    group = cursor.fetchone()
+    if group: cursor.execute("INSERT IGNORE INTO group_members (group_id, user_id) VALUES (%s, %s)", (_row_value(group, 'id'), admin_id))
+
+
+def _v5_listing_versions(cursor):
+    """列表 ETag 所需的文件夹变更版本与用户授权版本 (见 utils/listing_versions.py)"""
+    cursor.execute("CREATE TABLE IF NOT EXISTS folder_versions (folder_id INT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0)")
+    _add_column(cursor, 'users', 'acl_version', 'INT DEFAULT 0')
+
+
+def _v6_system_settings(cursor):
+    """备份计划等系统设置 (admin 接口与 scheduler 读写，原 init_db 从未建表)"""
+    cursor.execute("CREATE TABLE IF NOT EXISTS system_settings (`key` VARCHAR(100) PRIMARY KEY, `value` TEXT)")
+
+
+def _row_value(row, key):
+    # 兼容 DictCursor 与普通 Cursor
+    return row[key] if isinstance(row, dict) else row[0]
+
+
+MIGRATIONS = [
+    (1, 'baseline', _v1_baseline),
+    (2, 'legacy_columns', _v2_legacy_columns),
+    (3, 'query_indexes', _v3_query_indexes),
+    (4, 'seed_admin_and_groups', _v4_seed),
+    (5, 'listing_versions', _v5_listing_versions),
+    (6, 'system_settings', _v6_system_settings),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------- 执行 ----------
+def current_version(cursor):
+    """已执行的最大版本；表不存在时返回 0"""
+    cursor.execute("SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='schema_migrations'")
+    if not cursor.fetchone(): return 0
+    cursor.execute("SELECT MAX(version) AS v FROM schema_migrations")
+    return _row_value(cursor.fetchone(), 'v') or 0
+
+
+def apply_migrations(conn):
+    """在已选中目标库的连接上执行所有未执行的迁移，返回本次执行的版本号列表"""
+    applied = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, 60) AS locked", (LOCK_NAME,))
+        if not _row_value(cursor.fetchone(), 'locked'): raise RuntimeError("Timed out waiting for schema migration lock")
+        try:
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INT PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+            version = current_version(cursor)
+            for v, name, fn in MIGRATIONS:
+                if v <= version: continue
+                logger.info(f"Applying schema migration {v}: {name}")
+                fn(cursor)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (v, name))
+                # DDL 在 MySQL 中隐式提交，这里提交的是数据变更与版本记录
+                conn.commit()
+                applied.append(v)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return applied
@@ -5,17 +5,22 @@ import io
 import base64
 import json
 import os
-from flask import Blueprint, jsonify, request, current_app, send_file
+from flask import Blueprint, jsonify, request, current_app, send_file, Response
+from werkzeug.wsgi import wrap_file
 
 from app.db import get_db_connection
 from app.decorators import token_required, admin_required, super_admin_required
 from app.utils.common import get_beijing_time, check_password_complexity
-from app.utils.db_helpers import get_user_group_ids, get_all_sub_file_ids
+from app.utils.db_helpers import get_user_group_ids, get_all_sub_file_ids, get_users_in_group
+from app.extensions import token_guard, backup_runner, sql_tracer, profiler
 from app.routes.file_ops import _propagate_folder_permissions
+from app.utils.listing_versions import bump_folder_chain, bump_contract_folder, bump_user_acl
 
 # 导入备份服务
-from app.utils.backup_service import BackupManager
+from app.utils.backup_service import BackupManager, BackupInUseError
 from app.scheduler import update_backup_job
+from app.utils.backup_jobs import BackupBusyError
+from app.utils.profiler import ProfilerBusyError, PROFILE_HEADER
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -197,12 +202,14 @@ def admin_reset_password():
             target_name = target_user['username'] if target_user else f"ID:{target_id}"
 
             cursor.execute("UPDATE users SET password=%s, force_change_password=1 WHERE id=%s", (new_password, target_id))
+            bumped = token_guard.bump(cursor, target_id)
             
             # 🟢 中文日志
             trace_info = f"重置用户密码: {target_name}"
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'RESET_USER_PWD', %s, %s)", (operator_id, trace_info, get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -217,6 +224,7 @@ def delete_admin_account(uid):
             target = cursor.fetchone()
             target_name = target['username'] if target else "Unknown"
 
+            bumped = token_guard.bump(cursor, uid, is_active=False)
             cursor.execute("DELETE FROM group_members WHERE user_id=%s", (uid,))
             cursor.execute("DELETE FROM folder_permissions WHERE subject_type='user' AND subject_id=%s", (uid,))
             cursor.execute("DELETE FROM contract_permissions WHERE subject_type='user' AND subject_id=%s", (uid,))
@@ -227,6 +235,7 @@ def delete_admin_account(uid):
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'DELETE_ADMIN', %s, %s)", (operator_id, trace_info, get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -242,12 +251,17 @@ def update_admin_profile():
     try:
         with conn.cursor() as cursor:
             if new_username: cursor.execute("UPDATE users SET username=%s WHERE id=%s", (new_username, user_id))
-            if new_password: cursor.execute("UPDATE users SET password=%s WHERE id=%s", (new_password, user_id))
+            bumped = None
+            if new_password:
+                cursor.execute("UPDATE users SET password=%s WHERE id=%s", (new_password, user_id))
+                # 改密码后该用户已签发的全部 token (含当前会话) 失效，前端提示重新登录
+                bumped = token_guard.bump(cursor, user_id)
             
             # 🟢 中文日志
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'UPDATE_PROFILE', '更新个人资料', %s)", (user_id, get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -315,6 +329,7 @@ def update_file_permissions(cid):
             if perms:
                 vals = [(cid, p.get('subject_id'), p.get('subject_type'), p.get('can_view', 0), p.get('can_download', 0)) for p in perms]
                 cursor.executemany("INSERT INTO contract_permissions (contract_id, subject_id, subject_type, can_view, can_download) VALUES (%s, %s, %s, %s, %s)", vals)
+            bump_contract_folder(cursor, cid)
             
             # 🟢 中文日志
             trace_info = f"修改文件权限: {len(perms)} 项"
@@ -377,6 +392,7 @@ def update_folder_permissions(folder_id):
                 cursor.execute(f"DELETE FROM contract_permissions WHERE contract_id IN ({fmt})", tuple(all_file_ids))
                 for p in perms:
                     _propagate_folder_permissions(cursor, folder_id, p.get('subject_id'), p.get('subject_type'), p.get('can_view', 0), p.get('can_download', 0))
+            bump_folder_chain(cursor, folder_id, subtree=True)
             
             # 🟢 中文日志
             trace_info = f"修改文件夹权限 (ID:{folder_id})"
@@ -392,10 +408,13 @@ def get_users_with_groups():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT id, name, email, feishu_open_id, is_active, IF(mfa_secret IS NOT NULL, 1, 0) as mfa_enabled FROM users WHERE role != 'admin'")
+            # 只取用户管理弹窗渲染的列；分组一次查出，不再逐个用户查询
+            cursor.execute("SELECT id, name, email, is_active FROM users WHERE role != 'admin'")
             users = cursor.fetchall()
-            for u in users:
-                u['group_ids'] = get_user_group_ids(cursor, u['id'])
+            cursor.execute("SELECT gm.user_id, gm.group_id FROM group_members gm JOIN users u ON gm.user_id = u.id WHERE u.role != 'admin'")
+            groups_by_user = {}
+            for row in cursor.fetchall(): groups_by_user.setdefault(row['user_id'], []).append(row['group_id'])
+            for u in users: u['group_ids'] = groups_by_user.get(u['id'], [])
             return jsonify(users)
     finally: conn.close()
 
@@ -412,6 +431,8 @@ def update_user_groups():
             if group_ids:
                 vals = [(gid, user_id) for gid in group_ids]
                 cursor.executemany("INSERT INTO group_members (group_id, user_id) VALUES (%s, %s)", vals)
+            bumped = token_guard.bump(cursor, user_id)
+            bump_user_acl(cursor, [user_id])
             
             # 🟢 中文日志
             group_str = ",".join(map(str, group_ids))
@@ -419,6 +440,7 @@ def update_user_groups():
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'UPDATE_USER_GROUP', %s, %s)", (request.current_user_id, trace_info, get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -432,6 +454,9 @@ def delete_group(gid):
             g = cursor.fetchone()
             if g['name'] in ['默认组', '管理组']: return jsonify({"error": "Cannot delete system groups"}), 400
             
+            members = get_users_in_group(cursor, gid)
+            bumped = [token_guard.bump(cursor, member_id) for member_id in members]
+            bump_user_acl(cursor, members)
             cursor.execute("DELETE FROM group_members WHERE group_id=%s", (gid,))
             cursor.execute("DELETE FROM folder_permissions WHERE subject_id=%s AND subject_type='group'", (gid,))
             cursor.execute("DELETE FROM contract_permissions WHERE subject_id=%s AND subject_type='group'", (gid,))
@@ -442,6 +467,7 @@ def delete_group(gid):
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'DELETE_GROUP', %s, %s)", (request.current_user_id, f"删除用户组: {group_name}", get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(*bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -459,6 +485,8 @@ def toggle_user_status():
             target_name = target['username'] if target else str(uid)
 
             cursor.execute("UPDATE users SET is_active=%s WHERE id=%s", (1 if status else 0, uid))
+            # 禁用后已签发的 token 立即失效
+            bumped = token_guard.bump(cursor, uid, is_active=bool(status))
             
             # 🟢 中文日志
             action_desc = '启用用户' if status else '禁用用户'
@@ -466,6 +494,7 @@ def toggle_user_status():
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, %s, %s, %s)", (operator_id, 'ENABLE_USER' if status else 'DISABLE_USER', trace_info, get_beijing_time()))
             
             conn.commit()
+            token_guard.apply(bumped)
             return jsonify({"success": True})
     finally: conn.close()
 
@@ -523,18 +552,38 @@ def delete_backup(filename):
         if bm.delete_backup(filename):
             return jsonify({"success": True})
         return jsonify({"error": "File not found"}), 404
+    except BackupInUseError:
+        return jsonify({"error": "该备份被后续增量备份引用，无法单独删除"}), 409
     except ValueError:
         return jsonify({"error": "Invalid filename"}), 400
 
+@admin_bp.route('/api/admin/backups/<filename>/checksums', methods=['GET'])
+@admin_required
+def get_backup_checksums(filename):
+    """整体 / 分段 sha256 清单，供断点续传和多段并行下载后校验"""
+    bm = BackupManager(os.path.dirname(current_app.root_path))
+    info = bm.archive_checksums(filename)
+    if not info: return jsonify({"error": "File not found"}), 404
+    return jsonify(dict(info, filename=filename))
+
 @admin_bp.route('/api/admin/backups/download/<filename>', methods=['GET'])
 @admin_required
 def download_backup(filename):
+    """
+    支持 Range / If-Range 断点续传 (ETag 为归档 sha256)；?part=N 只下载第 N 段，
+    各段可并行拉取，再按 /checksums 中的分段 sha256 校验。
+    """
     user_id = request.current_user_id
     root_dir = os.path.dirname(current_app.root_path)
     bm = BackupManager(root_dir)
     path = bm.get_backup_path(filename)
-    if path:
-        # 🟢 中文日志 (手动连接 DB)
+    if not path: return jsonify({"error": "File not found"}), 404
+    info = bm.archive_checksums(filename)
+    part = request.args.get('part', type=int)
+
+    # 🟢 中文日志：续传 / 分段请求只在首段记一次
+    range_start = request.range.ranges[0][0] if request.range and request.range.ranges else 0
+    if range_start == 0 and not part:
         conn = get_db_connection()
         try:
             with conn.cursor() as cursor:
@@ -544,8 +593,21 @@ def download_backup(filename):
         except: pass
         finally: conn.close()
 
-        return send_file(path, as_attachment=True, download_name=filename)
-    return jsonify({"error": "File not found"}), 404
+    if part is None:
+        resp = send_file(path, as_attachment=True, download_name=filename, etag=info['sha256'], conditional=True)
+        resp.headers['X-Checksum-Sha256'] = info['sha256']
+        return resp
+
+    stream, meta = bm.open_part(filename, part)
+    if stream is None: return jsonify({"error": "Part out of range"}), 416
+    resp = Response(wrap_file(request.environ, stream), mimetype='application/octet-stream', direct_passthrough=True)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}.part{part:04d}"'
+    resp.content_length = meta['size']
+    resp.set_etag(meta['sha256'])
+    resp.headers['X-Checksum-Sha256'] = meta['sha256']
+    resp.headers['X-Part-Offset'] = str(meta['offset'])
+    resp.headers['X-Part-Count'] = str(len(info['parts']))
+    return resp.make_conditional(request, accept_ranges=True, complete_length=meta['size'])
 
 @admin_bp.route('/api/admin/backups/config', methods=['GET', 'POST'])
 @admin_required
@@ -579,10 +641,75 @@ def manage_backup_config():
 @admin_bp.route('/api/admin/backups/run_now', methods=['POST'])
 @admin_required
 def run_backup_manually():
-    root_dir = os.path.dirname(current_app.root_path)
-    bm = BackupManager(root_dir)
+    # 后台执行，进度通过 /api/admin/backups/status 查询
+    full = bool((request.get_json(silent=True) or {}).get('full'))
     try:
-        filename = bm.create_backup()
-        return jsonify({"success": True, "filename": filename})
+        job_id = backup_runner.start(trigger='manual', full=full)
+    except BackupBusyError:
+        return jsonify({"error": "已有备份任务正在运行"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'RUN_BACKUP', %s, %s)", (request.current_user_id, f"手动备份任务: {job_id}", get_beijing_time()))
+            conn.commit()
+    except: pass
+    finally: conn.close()
+    return jsonify({"success": True, "job_id": job_id}), 202
+
+@admin_bp.route('/api/admin/backups/status', methods=['GET'])
+@admin_required
+def get_backup_status():
+    return jsonify(backup_runner.status())
+
+@admin_bp.route('/api/admin/backups/cancel', methods=['POST'])
+@admin_required
+def cancel_backup():
+    if backup_runner.cancel(): return jsonify({"success": True})
+    return jsonify({"error": "当前没有运行中的备份任务"}), 404
+
+@admin_bp.route('/api/admin/sql/trace', methods=['GET', 'DELETE'])
+@admin_required
+def sql_trace_report():
+    """最近的慢查询与 N+1 请求 (参数已脱敏)；DELETE 清空缓冲"""
+    if request.method == 'DELETE':
+        sql_tracer.clear()
+        return jsonify({"success": True})
+    return jsonify(sql_tracer.report(limit=min(request.args.get('limit', 50, type=int), 500)))
+
+@admin_bp.route('/api/admin/profile', methods=['GET', 'POST'])
+@admin_required
+def profile_sessions():
+    """POST 对当前 worker 全部线程采样 N 秒；GET 列出最近的采样结果"""
+    if request.method == 'GET': return jsonify(profiler.list_profiles())
+    data = request.get_json(silent=True) or {}
+    try:
+        profile_id = profiler.start(data.get('seconds', 10), include_idle=bool(data.get('include_idle')),
+                                    meta={"pid": os.getpid(), "by": request.current_user_id})
+    except ProfilerBusyError:
+        return jsonify({"error": "当前 worker 已有采样在进行"}), 409
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid seconds"}), 400
+    return jsonify({"success": True, "profile_id": profile_id, "pid": os.getpid()}), 202
+
+@admin_bp.route('/api/admin/profile/token', methods=['POST'])
+@admin_required
+def profile_token():
+    """签发单请求采样令牌：请求携带该头时只对该请求采样，响应头 X-Profile-Id 为结果编号"""
+    ttl = (request.get_json(silent=True) or {}).get('ttl_minutes', 10)
+    if not isinstance(ttl, int): return jsonify({"error": "Invalid ttl_minutes"}), 400
+    ttl = min(max(ttl, 1), 60)
+    return jsonify({"header": PROFILE_HEADER, "token": profiler.make_token(ttl * 60), "ttl_minutes": ttl})
+
+@admin_bp.route('/api/admin/profile/<profile_id>', methods=['GET'])
+@admin_required
+def profile_result(profile_id):
+    """默认返回折叠栈文本 (flamegraph.pl / speedscope 可直接读取)，?format=json 返回原始数据"""
+    data = profiler.load(profile_id)
+    if data is None: return jsonify({"error": "Profile not found"}), 404
+    if data['running']: return jsonify({"running": True, "id": profile_id}), 202
+    if request.args.get('format') == 'json': return jsonify(data)
+    return Response(profiler.collapsed(data), mimetype='text/plain; charset=utf-8',
+                    headers={"Content-Disposition": f"attachment; filename={profile_id}.folded"})
@@ -4,8 +4,12 @@ from flask import Blueprint, jsonify, request, current_app
 from werkzeug.utils import secure_filename
 
 from app.db import get_db_connection
+from app.utils.common import get_beijing_time
+from app.utils.db_helpers import resolve_trace_ids
 from app.decorators import admin_required
 from app.utils.watermark import WatermarkEngine
+from app.utils.batch_verify import BatchVerifyError
+from app.extensions import batch_verifier
 
 audit_bp = Blueprint('audit', __name__)
 
@@ -23,11 +27,49 @@ def verify_watermark():
         file.save(temp_path)
         try:
             result = WatermarkEngine.extract_blind_watermark(temp_path)
+            # 反查审计记录，直接给出对应的用户 / 文件 / 时间
+            details = result.get('details') or {}
+            trace_id, prefix = details.get('trace_id'), details.get('trace_prefix')
+            if (trace_id and trace_id != 'N/A') or prefix:
+                conn = get_db_connection()
+                try:
+                    with conn.cursor() as cursor:
+                        found = resolve_trace_ids(cursor, [trace_id] if trace_id and trace_id != 'N/A' else [], [prefix] if prefix else [])
+                        record = found.get(trace_id) or found.get(prefix)
+                        if record:
+                            result['record'] = record
+                            result['info'] += f"\n审计记录: {record['user_name']} ({record['user_email']}) {record['action_type']} 《{record['file_name']}》 于 {record['created_at']}"
+                finally: conn.close()
             return jsonify({"success": True, "data": result})
         finally:
             if os.path.exists(temp_path): os.remove(temp_path)
     return jsonify({"error": "Upload failed"}), 500
 
+@audit_bp.route('/api/verify/batch', methods=['POST'])
+@admin_required
+def submit_batch_verify():
+    """批量验证：files 字段可多选，也可上传 zip / tar 压缩包；返回 job_id 后轮询报告"""
+    uploads = [f for f in request.files.getlist('files') + request.files.getlist('file') if f and f.filename]
+    if not uploads: return jsonify({"error": "No file"}), 400
+    try: job_id = batch_verifier.submit(uploads, request.current_user_id)
+    except BatchVerifyError as e: return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'BATCH_VERIFY', %s, %s)", (request.current_user_id, f"批量水印验证: {job_id}", get_beijing_time()))
+            conn.commit()
+    except: pass
+    finally: conn.close()
+    return jsonify({"success": True, "job_id": job_id}), 202
+
+@audit_bp.route('/api/verify/batch/<job_id>', methods=['GET'])
+@admin_required
+def get_batch_verify(job_id):
+    report = batch_verifier.get(job_id)
+    if not report: return jsonify({"error": "Job not found"}), 404
+    return jsonify(report)
+
 @audit_bp.route('/api/logs', methods=['GET'])
 @admin_required
 def get_audit_logs():
@@ -1,59 +1,43 @@
 # backend/app/routes/auth.py
-import time
-import uuid
-import random
-import string
+import io
+import math
 import jwt
 import datetime
 import pyotp
-import base64
-import requests
 import logging
-from flask import Blueprint, jsonify, request, current_app
-from captcha.image import ImageCaptcha
+from flask import Blueprint, jsonify, request, current_app, send_file
 
 from app.db import get_db_connection
-from app.extensions import limiter
+from app.extensions import limiter, captcha_pool, feishu_client, login_guard
 from app.utils.common import get_beijing_time
-from app.decorators import token_required
+from app.decorators import token_required, admin_required
 
 auth_bp = Blueprint('auth', __name__)
 # 配置日志记录器
 logger = logging.getLogger(__name__)
 
-# 内存中存储验证码 (生产环境建议用Redis)
-CAPTCHA_STORE = {} 
-
-def clean_captcha_store():
-    now = time.time()
-    to_delete = [k for k, v in CAPTCHA_STORE.items() if now > v['expire']]
-    for k in to_delete:
-        del CAPTCHA_STORE[k]
-
 def get_tenant_access_token():
-    """获取飞书 Tenant Access Token"""
-    try:
-        app_id = current_app.config['FEISHU_APP_ID']
-        app_secret = current_app.config['FEISHU_APP_SECRET']
-        resp = requests.post(
-            "https://open.feishu.cn/open-apis/auth/v3/app_access_token/internal", 
-            json={"app_id": app_id, "app_secret": app_secret}
-        )
-        return resp.json().get("tenant_access_token")
-    except Exception as e:
-        logger.error(f"Feishu Token Error: {e}")
-        return None
+    """获取飞书 Tenant Access Token (按 expire 缓存，临近过期提前刷新)"""
+    return feishu_client.get_tenant_access_token()
 
 @auth_bp.route('/api/captcha', methods=['GET'])
+@limiter.limit("30 per minute")
 def get_captcha():
-    image = ImageCaptcha(width=120, height=40)
-    code = ''.join(random.choices(string.digits, k=4))
-    token = uuid.uuid4().hex
-    clean_captcha_store()
-    CAPTCHA_STORE[token] = {'code': code, 'expire': time.time() + 300}
-    data = image.generate(code)
-    img_str = base64.b64encode(data.getvalue()).decode()
-    return jsonify({"token": token, "image": f"data:image/png;base64,{img_str}"})
+    # 从预渲染池中取出，图片通过 token URL 单独获取 (不再 base64 塞进 JSON)
+    token = captcha_pool.issue()
+    return jsonify({"token": token, "image": f"/api/captcha/{token}/image"})
+
+@auth_bp.route('/api/captcha/<token>/image', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_captcha_image(token):
+    png = captcha_pool.get_image(token)
+    if png is None: return jsonify({"error": "验证码已过期"}), 404
+    return send_file(io.BytesIO(png), mimetype='image/png')
+
+@auth_bp.route('/api/admin/captcha/stats', methods=['GET'])
+@admin_required
+def get_captcha_stats():
+    return jsonify(captcha_pool.snapshot())
 
 @auth_bp.route('/api/auth/verify', methods=['GET'])
 @token_required
@@ -84,14 +68,21 @@ def login_admin():
     if not captcha_token or not captcha_code:
         return jsonify({"error": "请输入验证码"}), 400
     
-    # 验证图形验证码
-    now = time.time()
-    clean_captcha_store()
-    stored = CAPTCHA_STORE.get(captcha_token)
-    if not stored or stored['code'].lower() != captcha_code.lower():
+    # 验证图形验证码 (一次性，校验后即作废)
+    if not captcha_pool.verify(captcha_token, captcha_code):
         logger.warning(f"Captcha failed for user: {username}")
         return jsonify({"error": "图形验证码错误"}), 400
-    del CAPTCHA_STORE[captcha_token]
+
+    # 内存中的锁定 / 退避检查，攻击流量在这里被挡下，不进数据库
+    client_ip = request.remote_addr
+    state, info = login_guard.check(username, client_ip)
+    if state == 'locked':
+        logger.warning(f"Login locked for user: {username}")
+        return jsonify({"error": f"账号已锁定，请在 {info} 后重试"}), 403
+    if state == 'throttled':
+        wait = math.ceil(info)
+        logger.warning(f"Login throttled for user: {username} from {client_ip}")
+        return jsonify({"error": f"尝试过于频繁，请 {wait} 秒后重试"}), 429, {'Retry-After': str(wait)}
 
     conn = get_db_connection()
     try:
@@ -100,35 +91,33 @@ def login_admin():
             user = cursor.fetchone()
             
             if not user:
+                login_guard.record_failure(cursor, None, username, client_ip)
                 logger.warning(f"Login failed: User {username} not found")
                 return jsonify({"error": "账号或密码错误"}), 401
             
             # 检查锁定状态
             if user.get('lockout_until') and user['lockout_until'] > get_beijing_time():
                 logger.warning(f"Login locked for user: {username}")
-                # 记录锁定日志
+                login_guard.mark_locked(username, user['lockout_until'])
+                # 记录锁定日志 (之后由内存拦截，每个进程只写一次)
                 cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'LOGIN_LOCKED', 'N/A', %s)", (user['id'], get_beijing_time()))
                 conn.commit()
                 return jsonify({"error": f"账号已锁定，请在 {user['lockout_until']} 后重试"}), 403
             
             # 密码验证失败
             if user['password'] != password:
-                fails = (user.get('failed_attempts') or 0) + 1
-                if fails >= 5:
-                    lock_until = get_beijing_time() + datetime.timedelta(minutes=15)
-                    cursor.execute("UPDATE users SET failed_attempts=%s, lockout_until=%s WHERE id=%s", (fails, lock_until, user['id']))
-                else:
-                    cursor.execute("UPDATE users SET failed_attempts=%s WHERE id=%s", (fails, user['id']))
+                # 仅在跨过阈值时写 lockout_until
+                fails = login_guard.record_failure(cursor, user, username, client_ip)
                 
                 # 记录失败日志
                 cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'LOGIN_FAILED', 'N/A', %s)", (user['id'], get_beijing_time()))
                 conn.commit()
                 
                 logger.warning(f"Password mismatch for user: {username}, fails: {fails}")
-                return jsonify({"error": f"密码错误，剩余次数: {5 - fails}"}), 401
+                return jsonify({"error": f"密码错误，剩余次数: {max(login_guard.threshold - fails, 0)}"}), 401
             
-            # 登录成功，清除失败记录
-            cursor.execute("UPDATE users SET failed_attempts=0, lockout_until=NULL WHERE id=%s", (user['id'],))
+            # 登录成功，清除失败记录 (库中无残留时不写)
+            login_guard.record_success(cursor, user, username)
             
             SECRET_KEY = current_app.config['SECRET_KEY']
 
@@ -141,6 +130,7 @@ def login_admin():
                     'username': user['username'], 
                     'name': user['name'],         
                     'mfa_enabled': bool(user.get('mfa_secret')), 
+                    'ep': user.get('token_epoch') or 0,
                     'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
                 }, SECRET_KEY, algorithm="HS256")
                 conn.commit()
@@ -175,6 +165,7 @@ def login_admin():
                 'role': user['role'], 
                 'name': user['name'], 
                 'email': user['email'], 
+                'ep': user.get('token_epoch') or 0,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
             }, SECRET_KEY, algorithm="HS256")
             
@@ -237,6 +228,7 @@ def verify_login_mfa():
                 'role': user['role'], 
                 'name': user['name'], 
                 'email': user['email'], 
+                'ep': user.get('token_epoch') or 0,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
             }, SECRET_KEY, algorithm="HS256")
             
@@ -266,14 +258,15 @@ def login_feishu():
             logger.error("Failed to get Feishu Tenant Token")
             return jsonify({"error": "飞书配置错误"}), 500
             
-        headers = {"Authorization": f"Bearer {t_token}"}
-        auth_resp = requests.post("https://open.feishu.cn/open-apis/authen/v1/oidc/access_token", json={"grant_type": "authorization_code", "code": code}, headers=headers).json()
+        auth_resp = feishu_client.exchange_code(code, t_token)
         
         if "data" not in auth_resp: 
             logger.error(f"Feishu Auth Failed: {auth_resp}")
+            # tenant token 可能已被飞书提前作废，下次重新获取
+            if auth_resp.get("code") in (99991663, 99991664): feishu_client.invalidate()
             return jsonify({"error": "Token失效"}), 400
         
-        u_info = requests.get("https://open.feishu.cn/open-apis/authen/v1/user_info", headers={"Authorization": f"Bearer {auth_resp['data']['access_token']}"}).json().get("data", {})
+        u_info = feishu_client.get_user_info(auth_resp['data']['access_token'])
         feishu_id = u_info.get("open_id")
         
         logger.info(f"Feishu user identified: {u_info.get('name')} ({feishu_id})")
@@ -300,7 +293,7 @@ def login_feishu():
                     cursor.execute("INSERT IGNORE INTO group_members (group_id, user_id) SELECT id, %s FROM user_groups WHERE name='默认组'", (user['id'],))
                     conn.commit()
                 
-                token = jwt.encode({'user_id': user['id'], 'role': user['role'], 'name': user['name'], 'email': user['email'], 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)}, SECRET_KEY, algorithm="HS256")
+                token = jwt.encode({'user_id': user['id'], 'role': user['role'], 'name': user['name'], 'email': user['email'], 'ep': user.get('token_epoch') or 0, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)}, SECRET_KEY, algorithm="HS256")
                 
                 cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'LOGIN_FEISHU', 'N/A', %s)", (user['id'], get_beijing_time()))
                 conn.commit()
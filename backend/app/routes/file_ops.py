@@ -2,17 +2,29 @@
 import os
 import uuid
 import time
+import logging
 from flask import Blueprint, jsonify, request, send_file, current_app
 from werkzeug.utils import secure_filename
 
 from app.db import get_db_connection
 from app.decorators import token_required, admin_required
-from app.utils.common import get_beijing_time, calculate_file_hash
+from app.utils.common import get_beijing_time, calculate_file_hash, parse_page_range
 from app.utils.watermark import WatermarkEngine
 from app.utils.db_helpers import get_user_group_ids, get_all_sub_file_ids
+from app.utils.thumbnails import SIZES as THUMB_SIZES
+from app.utils.log_pipeline import bind_trace_id
+from app.utils.listing_versions import listing_etag, not_modified, with_etag, bump_folder_chain, bump_contract_folder
+from app.extensions import thumbnail_service, metrics, profiler
+
+logger = logging.getLogger(__name__)
 
 file_bp = Blueprint('file_ops', __name__)
 
+# 列表 / 搜索只返回前端渲染用到的列 (不含存储路径 file_path、上传者等内部字段)
+CONTRACT_LIST_COLUMNS = "c.id, c.title, c.file_type, c.file_size, c.folder_id, c.created_at"
+FOLDER_LIST_COLUMNS = "id, name, parent_id"
+ROOT_FOLDER_NAME = '根目录'
+
 def _copy_parent_permissions(cursor, parent_id, new_folder_id):
     """复制父文件夹的权限到新文件夹"""
     if parent_id == 0: return 
@@ -40,6 +52,19 @@ def _propagate_folder_permissions(cursor, folder_id, subject_id, subject_type, c
         """
         cursor.executemany(stmt, values)
 
+def _get_contract_permission(cursor, cid, user_id):
+    """用户 (含所在组) 对文件的有效权限: {'v': 可预览, 'd': 可下载}"""
+    group_ids = get_user_group_ids(cursor, user_id) + [-1]
+    cursor.execute("""
+        SELECT MAX(can_view) as v, MAX(can_download) as d 
+        FROM contract_permissions 
+        WHERE contract_id=%s AND (
+            (subject_type='user' AND subject_id=%s) OR 
+            (subject_type='group' AND subject_id IN %s)
+        )
+    """, (cid, user_id, group_ids))
+    return cursor.fetchone()
+
 def ensure_folder_path(cursor, root_folder_id, relative_path, creator_id):
     """处理上传时的相对路径，自动创建文件夹"""
     if not relative_path or '/' not in relative_path: return root_folder_id
@@ -60,6 +85,7 @@ def ensure_folder_path(cursor, root_folder_id, relative_path, creator_id):
             _copy_parent_permissions(cursor, parent_id_for_new, current_parent_id)
     return current_parent_id
 
+@profiler.tag('acl.accessible_folders')
 def get_user_accessible_folder_ids(cursor, user_id):
     """计算用户有权限访问的所有文件夹ID"""
     group_ids = get_user_group_ids(cursor, user_id) + [-1]
@@ -76,6 +102,19 @@ def get_user_accessible_folder_ids(cursor, user_id):
     file_parent_ids = {row['folder_id'] for row in cursor.fetchall()}
     
     # 2. 直接授权的文件夹
+    direct_folder_ids = _direct_folder_ids(cursor, user_id, group_ids)
+    
+    seed_ids = file_parent_ids.union(direct_folder_ids)
+    if not seed_ids: return []
+
+    # 3. 向上追溯所有父级
+    cursor.execute("SELECT id, parent_id FROM folders")
+    all_folders = cursor.fetchall()
+    parent_map = {f['id']: f['parent_id'] for f in all_folders}
+    return list(_with_ancestors(seed_ids, parent_map))
+
+def _direct_folder_ids(cursor, user_id, group_ids):
+    """用户创建或被直接授权 (含所在组) 可查看的文件夹"""
     sql_folders = """
         SELECT DISTINCT f.id FROM folders f
         LEFT JOIN folder_permissions fp ON f.id = fp.folder_id
@@ -84,16 +123,10 @@ def get_user_accessible_folder_ids(cursor, user_id):
            OR (fp.subject_type='group' AND fp.subject_id IN %s AND fp.can_view=1)
     """
     cursor.execute(sql_folders, (user_id, user_id, group_ids))
-    direct_folder_ids = {row['id'] for row in cursor.fetchall()}
-    
-    seed_ids = file_parent_ids.union(direct_folder_ids)
-    if not seed_ids: return []
+    return {row['id'] for row in cursor.fetchall()}
 
-    # 3. 向上追溯所有父级
-    cursor.execute("SELECT id, parent_id FROM folders")
-    all_folders = cursor.fetchall()
-    parent_map = {f['id']: f['parent_id'] for f in all_folders}
-    
+def _with_ancestors(seed_ids, parent_map):
+    """种子文件夹及其所有父级 (不含根目录 0)"""
     visible_ids = set()
     for fid in seed_ids:
         curr = fid
@@ -101,8 +134,16 @@ def get_user_accessible_folder_ids(cursor, user_id):
             if curr in visible_ids: break 
             visible_ids.add(curr)
             curr = parent_map[curr]
-    return list(visible_ids)
+    return visible_ids
+
+def _purge_previews(file_path):
+    """合同删除 / 替换时清掉由源文件派生的预览缓存 (Office 转换结果为完整的未加水印副本、各页底图)"""
+    try:
+        WatermarkEngine.purge_converted(file_path)
+        thumbnail_service.purge(file_path)
+    except OSError as e: logger.warning(f"Failed to purge preview cache for {file_path}: {e}")
 
+@profiler.tag('folders.delete_recursive')
 def delete_folder_recursive(cursor, folder_id):
     """递归删除文件夹"""
     cursor.execute("SELECT file_path FROM contracts WHERE folder_id=%s", (folder_id,))
@@ -111,6 +152,7 @@ def delete_folder_recursive(cursor, folder_id):
         if os.path.exists(f['file_path']):
             try: os.remove(f['file_path'])
             except: pass
+        _purge_previews(f['file_path'])
     cursor.execute("DELETE FROM contracts WHERE folder_id=%s", (folder_id,))
     cursor.execute("DELETE FROM folder_permissions WHERE folder_id=%s", (folder_id,))
     cursor.execute("DELETE FROM contract_permissions WHERE contract_id IN (SELECT id FROM contracts WHERE folder_id=%s)", (folder_id,))
@@ -175,6 +217,7 @@ def upload_file():
                         if os.path.exists(old_path): 
                             try: os.remove(old_path)
                             except: pass
+                        _purge_previews(old_path)
                         cursor.execute("UPDATE contracts SET file_path=%s, file_size=%s, created_at=%s WHERE id=%s", (save_path, size, get_beijing_time(), existing['id']))
                         new_file_id = existing['id']
                         action_type = "UPLOAD_REPLACE"
@@ -198,7 +241,9 @@ def upload_file():
                 if perm_values:
                     stmt = "INSERT IGNORE INTO contract_permissions (contract_id, subject_id, subject_type, can_view, can_download) VALUES (%s, %s, %s, %s, %s)"
                     cursor.executemany(stmt, perm_values)
+                bump_folder_chain(cursor, final_folder_id)
                 trace_id = f"UPLOAD_{user_id}_{uuid.uuid4().hex[:8]}"
+                bind_trace_id(trace_id)
                 cursor.execute(
                     "INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, %s, 'UPLOAD', %s, %s)",
                     (user_id, new_file_id, trace_id, get_beijing_time())
@@ -206,6 +251,8 @@ def upload_file():
                 
                 conn.commit()
         finally: conn.close()
+        # 异步预生成缩略图
+        thumbnail_service.schedule(save_path, ext)
         return jsonify({"success": True})
     return jsonify({"error": "No file"}), 400
 
@@ -218,13 +265,16 @@ def get_contracts():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
+            etag = listing_etag(cursor, 'contracts', folder_id, user_id, role, CONTRACT_LIST_COLUMNS)
+            cached = not_modified(etag)
+            if cached: return cached
             if role == 'admin':
-                sql = "SELECT c.*, u.name as uploader, 1 as can_view, 1 as can_download FROM contracts c LEFT JOIN users u ON c.uploader_id = u.id WHERE c.folder_id = %s ORDER BY c.created_at DESC"
+                sql = f"SELECT {CONTRACT_LIST_COLUMNS}, 1 as can_view, 1 as can_download FROM contracts c WHERE c.folder_id = %s ORDER BY c.created_at DESC"
                 cursor.execute(sql, (folder_id,))
             else:
                 group_ids = get_user_group_ids(cursor, user_id) + [-1]
-                sql = """
-                    SELECT c.*, u.name as uploader, 
+                sql = f"""
+                    SELECT {CONTRACT_LIST_COLUMNS},
                            MAX(CASE 
                                WHEN cp.subject_type='user' AND cp.subject_id=%s THEN cp.can_view
                                WHEN cp.subject_type='group' AND cp.subject_id IN %s THEN cp.can_view
@@ -234,15 +284,14 @@ def get_contracts():
                                WHEN cp.subject_type='group' AND cp.subject_id IN %s THEN cp.can_download
                                ELSE 0 END) as can_download
                     FROM contracts c 
-                    LEFT JOIN users u ON c.uploader_id = u.id 
                     LEFT JOIN contract_permissions cp ON c.id = cp.contract_id
                     WHERE c.folder_id = %s 
                     GROUP BY c.id
-                    HAVING (c.uploader_id = %s OR can_view = 1)
+                    HAVING (MAX(c.uploader_id = %s) = 1 OR can_view = 1)
                     ORDER BY c.created_at DESC
                 """
                 cursor.execute(sql, (user_id, group_ids, user_id, group_ids, folder_id, user_id))
-            return jsonify(cursor.fetchall())
+            return with_etag(jsonify(cursor.fetchall()), etag)
     finally: conn.close()
 
 @file_bp.route('/api/download/<int:cid>', methods=['GET', 'POST'])
@@ -253,6 +302,12 @@ def secure_download(cid):
     user_id = request.current_user_id
     role = request.current_user_role
     user_info = {'id': user_id, 'name': request.current_user_name, 'email': request.current_user_email, 'role': role}
+
+    # 分页预览: ?pages=1-5，只加载并加水印这些页，总页数通过 X-Page-Count 返回
+    page_range = None
+    if is_preview and request.args.get('pages'):
+        page_range = parse_page_range(request.args.get('pages'))
+        if not page_range: return jsonify({"error": "Invalid page range"}), 400
     
     conn = get_db_connection()
     try:
@@ -264,30 +319,35 @@ def secure_download(cid):
             
             # 权限检查
             if role != 'admin' and str(contract['uploader_id']) != str(user_id):
-                group_ids = get_user_group_ids(cursor, user_id) + [-1]
-                cursor.execute("""
-                    SELECT MAX(can_view) as v, MAX(can_download) as d 
-                    FROM contract_permissions 
-                    WHERE contract_id=%s AND (
-                        (subject_type='user' AND subject_id=%s) OR 
-                        (subject_type='group' AND subject_id IN %s)
-                    )
-                """, (cid, user_id, group_ids))
-                perm = cursor.fetchone()
+                perm = _get_contract_permission(cursor, cid, user_id)
                 if is_preview:
                     if not perm or not perm['v']: return "无预览权限", 403
                 else:
                     if not perm or not perm['d']: return jsonify({"error": "无下载权限"}), 403
             
-            file_hash = calculate_file_hash(contract['file_path'])
+            with metrics.stage('hash', (contract.get('file_type') or '').lower()): file_hash = calculate_file_hash(contract['file_path'])
             trace_id = f"TRACE_{user_id}_{int(time.time())}_{file_hash}"
             action = 'PREVIEW' if is_preview else 'DOWNLOAD'
             
-            # 🟢 写入审计日志
+            # 🟢 写入审计日志 (trace_id 同时绑定到本请求的日志上下文)
             cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, %s, %s, %s, %s)", (user_id, cid, action, trace_id, get_beijing_time()))
             conn.commit()
+            bind_trace_id(trace_id)
+            logger.info(f"{action} contract {cid}")
             
             file_type = contract.get('file_type', 'pdf').lower()
+
+            if page_range:
+                try:
+                    out_stream, total_pages = WatermarkEngine.process_page_range(contract['file_path'], file_type, user_info, trace_id, page_range, add_watermark=(role != 'admin'))
+                except: return "预览生成失败", 500
+                if page_range[0] > total_pages:
+                    return jsonify({"error": "Page out of range", "page_count": total_pages}), 416, {'X-Page-Count': str(total_pages)}
+                end = min(page_range[1] or total_pages, total_pages)
+                response = send_file(out_stream, as_attachment=False, mimetype='application/pdf')
+                response.headers['X-Page-Count'] = str(total_pages)
+                response.headers['X-Page-Range'] = f"{page_range[0]}-{end}"
+                return response
             
             # 原文件返回逻辑
             if role == 'admin' or (not is_preview and file_type in ['doc', 'docx', 'xls', 'xlsx']):
@@ -306,6 +366,46 @@ def secure_download(cid):
             except: return "文件处理失败", 500
     finally: conn.close()
 
+@file_bp.route('/api/contracts/<int:cid>/thumbnail', methods=['GET'])
+@token_required
+def get_contract_thumbnail(cid):
+    """页面缩略图 / 栅格预览: ?page=1&size=thumb|preview，水印在返回时烧入缓存底图"""
+    user_id = request.current_user_id
+    role = request.current_user_role
+    size = request.args.get('size', 'thumb')
+    if size not in THUMB_SIZES: return jsonify({"error": "Invalid size"}), 400
+    try: page = max(int(request.args.get('page', 1)), 1)
+    except ValueError: return jsonify({"error": "Invalid page"}), 400
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, file_path, file_type, uploader_id FROM contracts WHERE id=%s", (cid,))
+            contract = cursor.fetchone()
+            if not contract or not os.path.exists(contract['file_path']):
+                return jsonify({"error": "File not found"}), 404
+            if role != 'admin' and str(contract['uploader_id']) != str(user_id):
+                perm = _get_contract_permission(cursor, cid, user_id)
+                if not perm or not perm['v']: return jsonify({"error": "无预览权限"}), 403
+            if size == 'preview':
+                # 栅格预览可直接阅读页面内容，与 secure_download 的预览一样记审计
+                trace_id = f"PREVIEW_{user_id}_{int(time.time())}_{uuid.uuid4().hex[:8]}_p{page}"
+                bind_trace_id(trace_id)
+                cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, %s, 'PREVIEW', %s, %s)", (user_id, cid, trace_id, get_beijing_time()))
+                conn.commit()
+    finally: conn.close()
+
+    file_type = (contract.get('file_type') or 'pdf').lower()
+    try: base_path = thumbnail_service.get_base(contract['file_path'], file_type, page, size)
+    except Exception: return jsonify({"error": "缩略图生成失败"}), 500
+    if not base_path: return jsonify({"error": "暂不支持该文件的缩略图"}), 404
+
+    watermark_text = None
+    if role != 'admin':
+        email_display = request.current_user_email or '未知用户'
+        watermark_text = f"{request.current_user_name} - {email_display} - {get_beijing_time().strftime('%Y-%m-%d')}"
+    return send_file(thumbnail_service.render(base_path, watermark_text), mimetype='image/jpeg')
+
 @file_bp.route('/api/folders', methods=['GET', 'POST'])
 @token_required
 def manage_folders():
@@ -323,6 +423,7 @@ def manage_folders():
                 cursor.execute("INSERT INTO folders (name, parent_id, creator_id, created_at) VALUES (%s, %s, %s, %s)", (req_name, req_parent_id, user_id, get_beijing_time()))
                 new_folder_id = cursor.lastrowid
                 _copy_parent_permissions(cursor, req_parent_id, new_folder_id)
+                bump_folder_chain(cursor, req_parent_id)
                 
                 # 🟢 中文日志
                 trace_info = f"新建文件夹: {req_name}"
@@ -331,18 +432,94 @@ def manage_folders():
                 conn.commit()
                 return jsonify({"success": True})
             else:
-                # GET 逻辑保持不变...
+                etag = listing_etag(cursor, 'folders', parent_id, user_id, role, FOLDER_LIST_COLUMNS)
+                cached = not_modified(etag)
+                if cached: return cached
                 if role == 'admin':
-                    cursor.execute("SELECT * FROM folders WHERE parent_id = %s ORDER BY created_at ASC", (parent_id,))
+                    cursor.execute(f"SELECT {FOLDER_LIST_COLUMNS} FROM folders WHERE parent_id = %s ORDER BY created_at ASC", (parent_id,))
                 else:
                     visible_ids = get_user_accessible_folder_ids(cursor, user_id)
-                    if not visible_ids: return jsonify([])
+                    if not visible_ids: return with_etag(jsonify([]), etag)
                     fmt = ','.join(['%s'] * len(visible_ids))
-                    sql = f"SELECT * FROM folders WHERE parent_id = %s AND id IN ({fmt}) ORDER BY created_at ASC"
+                    sql = f"SELECT {FOLDER_LIST_COLUMNS} FROM folders WHERE parent_id = %s AND id IN ({fmt}) ORDER BY created_at ASC"
                     cursor.execute(sql, (parent_id, *visible_ids))
-                return jsonify(cursor.fetchall())
+                return with_etag(jsonify(cursor.fetchall()), etag)
+    finally: conn.close()
+
+@file_bp.route('/api/folders/tree', methods=['GET'])
+@token_required
+def folder_tree():
+    """
+    一次返回可见目录树 (或从 root 起 depth 层的切片)，每个节点带可见子目录数与文件数，
+    供侧边栏与面包屑使用；未展开的节点 (无 children 字段) 由前端以 root=<id> 再次请求。
+    目录与可见性在内存中由一次性加载的父子表计算，不再逐层调用 get_user_accessible_folder_ids。
+    """
+    root_id = request.args.get('root', 0, type=int)
+    depth = request.args.get('depth', current_app.config['FOLDER_TREE_DEPTH'], type=int)
+    max_nodes = current_app.config['FOLDER_TREE_MAX_NODES']
+    user_id = request.current_user_id
+    role = request.current_user_role
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # 子树内任何变更都会沿父链更新到根目录 0 的版本，树的 ETag 以它为准 (面包屑名称同样被覆盖)
+            etag = listing_etag(cursor, f"tree:{root_id}:{depth}:{max_nodes}", 0, user_id, role, FOLDER_LIST_COLUMNS)
+            cached = not_modified(etag)
+            if cached: return cached
+
+            cursor.execute(f"SELECT {FOLDER_LIST_COLUMNS} FROM folders ORDER BY created_at ASC, id ASC")
+            folders = {f['id']: f for f in cursor.fetchall()}
+            parent_map = {fid: f['parent_id'] for fid, f in folders.items()}
+            if role == 'admin':
+                cursor.execute("SELECT folder_id, COUNT(*) AS n FROM contracts GROUP BY folder_id")
+                file_counts = {row['folder_id']: row['n'] for row in cursor.fetchall()}
+                visible = set(folders)
+            else:
+                group_ids = get_user_group_ids(cursor, user_id) + [-1]
+                cursor.execute("""
+                    SELECT c.folder_id, COUNT(DISTINCT c.id) AS n FROM contracts c
+                    LEFT JOIN contract_permissions cp ON c.id = cp.contract_id
+                    WHERE c.uploader_id = %s
+                       OR (cp.subject_type='user' AND cp.subject_id=%s AND cp.can_view=1)
+                       OR (cp.subject_type='group' AND cp.subject_id IN %s AND cp.can_view=1)
+                    GROUP BY c.folder_id
+                """, (user_id, user_id, group_ids))
+                file_counts = {row['folder_id']: row['n'] for row in cursor.fetchall()}
+                seed_ids = set(file_counts) | _direct_folder_ids(cursor, user_id, group_ids)
+                visible = _with_ancestors(seed_ids, parent_map)
     finally: conn.close()
 
+    if root_id != 0 and root_id not in visible: return jsonify({"error": "Not found"}), 404
+    children = {}
+    for fid, f in folders.items():
+        if fid in visible: children.setdefault(f['parent_id'], []).append(fid)
+
+    def node(fid):
+        f = folders.get(fid) or {"id": 0, "name": ROOT_FOLDER_NAME, "parent_id": None}
+        return {**f, "child_count": len(children.get(fid, [])), "file_count": file_counts.get(fid, 0)}
+
+    # 逐层展开：一个节点的子目录要么全部返回，要么都不返回 (child_count 提示可继续展开)
+    root = node(root_id)
+    level, frontier, count, truncated = 0, [root], 1, False
+    while frontier and (depth <= 0 or level < depth):
+        next_frontier = []
+        for parent in frontier:
+            kids = children.get(parent['id'], [])
+            if count + len(kids) > max_nodes:
+                truncated = True
+                continue
+            parent['children'] = [node(k) for k in kids]
+            count += len(kids)
+            next_frontier.extend(parent['children'])
+        frontier, level = next_frontier, level + 1
+
+    path, curr = [], root_id
+    while curr != 0 and curr in folders and len(path) <= len(folders):
+        path.append({"id": curr, "name": folders[curr]['name']})
+        curr = parent_map[curr]
+    path.append({"id": 0, "name": ROOT_FOLDER_NAME})
+    return with_etag(jsonify({"root": root, "path": path[::-1], "depth": depth, "truncated": truncated}), etag)
+
 @file_bp.route('/api/folders/<int:fid>', methods=['PUT', 'DELETE'])
 @admin_required
 def folder_ops(fid):
@@ -357,12 +534,15 @@ def folder_ops(fid):
             if request.method == 'PUT':
                 new_name = request.json.get('name')
                 cursor.execute("UPDATE folders SET name=%s WHERE id=%s", (new_name, fid))
+                bump_folder_chain(cursor, fid)
                 # 🟢 中文日志
                 trace_info = f"重命名文件夹: {folder_name} -> {new_name}"
                 cursor.execute("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, 0, 'RENAME_FOLDER', %s, %s)", (user_id, trace_info, get_beijing_time()))
                 
             elif request.method == 'DELETE':
                 if fid == 0: return jsonify({"error": "Root locked"}), 400
+                # 先沿父链更新版本 (删除后已查不到父目录)
+                bump_folder_chain(cursor, fid)
                 delete_folder_recursive(cursor, fid)
                 # 🟢 中文日志
                 trace_info = f"删除文件夹: {folder_name} (ID:{fid})"
@@ -389,6 +569,7 @@ def delete_contract(cid):
             if row and os.path.exists(row['file_path']):
                 try: os.remove(row['file_path'])
                 except: pass
+            _purge_previews(row['file_path'])
             
             # 🟢 中文日志 (记录在 trace_id 中，因为 contract_id 即将被删)
             trace_info = f"删除文件: {row['title']}"
@@ -397,6 +578,7 @@ def delete_contract(cid):
                 (request.current_user_id, trace_info, get_beijing_time())
             )
 
+            bump_contract_folder(cursor, cid)
             cursor.execute("DELETE FROM contracts WHERE id=%s", (cid,))
             cursor.execute("DELETE FROM contract_permissions WHERE contract_id=%s", (cid,))
             conn.commit()
@@ -416,6 +598,7 @@ def rename_contract(cid):
             new_title = request.json.get('title')
             
             cursor.execute("UPDATE contracts SET title=%s WHERE id=%s", (new_title, cid))
+            bump_contract_folder(cursor, cid)
             
             # 🟢 中文日志
             trace_info = f"文件重命名: {old_title} -> {new_title}"
@@ -437,16 +620,15 @@ def search_resources():
     try:
         with conn.cursor() as cursor:
             if role == 'admin':
-                cursor.execute("SELECT * FROM folders WHERE name LIKE %s", (search_term,))
+                cursor.execute(f"SELECT {FOLDER_LIST_COLUMNS} FROM folders WHERE name LIKE %s", (search_term,))
                 folders = cursor.fetchall()
-                cursor.execute("SELECT c.*, u.name as uploader FROM contracts c LEFT JOIN users u ON c.uploader_id = u.id WHERE c.title LIKE %s", (search_term,))
+                cursor.execute(f"SELECT {CONTRACT_LIST_COLUMNS} FROM contracts c WHERE c.title LIKE %s", (search_term,))
                 files = cursor.fetchall()
             else:
                 group_ids = get_user_group_ids(cursor, user_id) + [-1]
-                cursor.execute("""
-                    SELECT DISTINCT c.*, u.name as uploader 
+                cursor.execute(f"""
+                    SELECT DISTINCT {CONTRACT_LIST_COLUMNS}
                     FROM contracts c
-                    LEFT JOIN users u ON c.uploader_id = u.id
                     LEFT JOIN contract_permissions cp ON c.id = cp.contract_id
                     WHERE c.title LIKE %s 
                     AND (
@@ -459,7 +641,7 @@ def search_resources():
                 visible_ids = get_user_accessible_folder_ids(cursor, user_id)
                 if visible_ids:
                     fmt = ','.join(['%s'] * len(visible_ids))
-                    cursor.execute(f"SELECT * FROM folders WHERE name LIKE %s AND id IN ({fmt})", (search_term, *visible_ids))
+                    cursor.execute(f"SELECT {FOLDER_LIST_COLUMNS} FROM folders WHERE name LIKE %s AND id IN ({fmt})", (search_term, *visible_ids))
                     folders = cursor.fetchall()
                 else: folders = []
             return jsonify({'folders': folders, 'files': files})
@@ -0,0 +1,68 @@
+# backend/app/scheduler.py
+import json
+import logging
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.db import get_db_connection
+from app.extensions import backup_runner
+from app.utils.backup_jobs import BackupBusyError
+
+logger = logging.getLogger(__name__)
+
+scheduler = BackgroundScheduler(timezone='Asia/Shanghai')
+JOB_ID = 'auto_backup'
+SYNC_JOB_ID = 'backup_schedule_sync'
+DEFAULT_SCHEDULE = {"type": "daily", "time": "02:00"}
+# 本 worker 当前生效的备份计划
+_active = {}
+
+
+def _run_scheduled_backup():
+    try: backup_runner.run_sync(trigger='scheduled')
+    except BackupBusyError:
+        # 手动备份或其他 worker 的定时任务正在执行，本次跳过
+        logger.info("Scheduled backup skipped: another backup is running")
+
+
+def _load_schedule():
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT value FROM system_settings WHERE `key`='backup_schedule'")
+            row = cursor.fetchone()
+            return json.loads(row['value']) if row else dict(DEFAULT_SCHEDULE)
+    finally: conn.close()
+
+
+def update_backup_job(app, force=True):
+    """
+    按 system_settings.backup_schedule 重新注册定时备份任务。
+    保存设置的请求只落在一个 worker 上，其他 worker 由定期同步 (force=False) 发现变化后重新注册；计划未变时不动，
+    避免 interval 类型的计时被重置
+    """
+    with app.app_context():
+        try: config = _load_schedule()
+        except Exception as e:
+            logger.error(f"Load backup schedule failed: {e}")
+            if not force: return
+            config = dict(DEFAULT_SCHEDULE)
+
+    if not force and config == _active.get('config') and scheduler.get_job(JOB_ID): return
+    if scheduler.get_job(JOB_ID): scheduler.remove_job(JOB_ID)
+    hour, minute = (config.get('time') or '02:00').split(':')
+    if config.get('type') == 'interval':
+        scheduler.add_job(_run_scheduled_backup, 'interval', hours=int(config.get('hours', 24)), id=JOB_ID)
+    elif config.get('type') == 'weekly':
+        scheduler.add_job(_run_scheduled_backup, 'cron', day_of_week=config.get('weekday', 'sun'), hour=int(hour), minute=int(minute), id=JOB_ID)
+    else:
+        scheduler.add_job(_run_scheduled_backup, 'cron', hour=int(hour), minute=int(minute), id=JOB_ID)
+    _active['config'] = config
+    logger.info(f"Backup job scheduled: {config}")
+
+
+def init_scheduler(app):
+    if not scheduler.running: scheduler.start()
+    update_backup_job(app)
+    scheduler.add_job(update_backup_job, 'interval', seconds=app.config.get('BACKUP_SCHEDULE_SYNC_SECONDS', 60),
+                      args=(app,), kwargs={'force': False}, id=SYNC_JOB_ID, replace_existing=True)
@@ -0,0 +1,202 @@
+# backend/app/utils/asgi_bridge.py
+import os
+import sys
+import asyncio
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 路由分类：CPU 密集 (水印 / 转换 / 解码 / 大文件) 与外部 I/O (飞书)；其余为轻量接口
+HEAVY_PREFIXES = ('/api/download/', '/api/upload', '/api/verify', '/api/admin/backups/download/')
+HEAVY_SUFFIXES = ('/thumbnail',)
+IO_PREFIXES = ('/api/login_feishu',)
+
+
+class ClientDisconnected(Exception):
+    """客户端已断开，停止生成响应"""
+
+
+def classify(path):
+    if path.startswith(IO_PREFIXES): return 'io'
+    if path.startswith(HEAVY_PREFIXES) or path.endswith(HEAVY_SUFFIXES): return 'heavy'
+    return 'light'
+
+
+class _Pool:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"asgi-{name}")
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+
+
+class AsgiBridge:
+    """
+    ASGI 入口：连接的保持 / 慢客户端 / 空闲长连接由事件循环承担，不占线程；
+    Flask (WSGI) 视图按路由分到三个独立线程池执行：
+    - light: 目录 / 列表 / 搜索等，线程多且不会被下载占满，下载高峰时列表延迟保持平稳；
+    - heavy: 水印下载 / 预览 / 上传 / 验证，线程数约等于核数，超出的请求在事件循环中排队；
+    - io:    飞书登录等外部调用，阻塞在网络上，线程可以多开。
+    请求体先读入 SpooledTemporaryFile (超过阈值落盘)，响应体逐块回传，发送阻塞时形成自然背压。
+    读完请求体后继续监听 http.disconnect：客户端断开时下一次发送抛出 ClientDisconnected，停止迭代并关闭响应，
+    排队中的请求不再执行 (服务器在断开后会静默丢弃 send，不能依赖发送失败)。
+    用法: uvicorn asgi:app --workers 4 (见 backend/asgi.py)
+    """
+
+    def __init__(self, wsgi_app, light_workers=32, heavy_workers=None, io_workers=64, spool_bytes=1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.spool_bytes = spool_bytes
+        self.pools = {
+            'light': _Pool('light', light_workers),
+            'heavy': _Pool('heavy', heavy_workers or os.cpu_count() or 2),
+            'io': _Pool('io', io_workers),
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app):
+        cfg = app.config
+        return cls(app, cfg.get('ASGI_LIGHT_WORKERS', 32), cfg.get('ASGI_HEAVY_WORKERS'),
+                   cfg.get('ASGI_IO_WORKERS', 64), cfg.get('ASGI_SPOOL_MB', 1) * 1024 * 1024)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan': return await self._lifespan(receive, send)
+        if scope['type'] == 'websocket':
+            # 不支持 websocket：按协议先收到 connect，再拒绝握手 (服务器返回 403)
+            message = await receive()
+            if message['type'] == 'websocket.connect': await send({'type': 'websocket.close', 'code': 1000})
+            return
+        if scope['type'] != 'http': return
+        body = await self._read_body(receive)
+        if body is None: return  # 客户端在上传过程中断开
+        pool = self.pools[classify(scope['path'])]
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, disconnected))
+        with self._lock: pool.queued += 1
+        try: await loop.run_in_executor(pool.executor, self._run_wsgi, pool, scope, body, send, loop, disconnected)
+        finally:
+            watcher.cancel()
+            body.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for pool in self.pools.values(): pool.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'): break
+        body.seek(0)
+        return body
+
+    async def _watch_disconnect(self, receive, disconnected):
+        while (await receive())['type'] != 'http.disconnect': pass
+        disconnected.set()
+
+    def _environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            # 请求体已完整读入 (含 chunked 上传)，告诉 werkzeug 读到 EOF 为止，而不是按缺失的 Content-Length 当作空
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE': key = 'CONTENT_TYPE'
+            elif name == 'CONTENT_LENGTH': key = 'CONTENT_LENGTH'
+            else: key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run_wsgi(self, pool, scope, body, send, loop, disconnected):
+        """在线程池中执行 WSGI 应用，通过事件循环把响应发回客户端"""
+        with self._lock:
+            pool.queued -= 1
+            pool.active += 1
+        state = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state.get('started'): raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = int(status.split(' ', 1)[0])
+            state['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: None  # 不支持旧式 write()
+
+        def emit(message):
+            if disconnected.is_set(): raise ClientDisconnected()
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = None
+        try:
+            if disconnected.is_set(): raise ClientDisconnected()  # 排队期间客户端已离开
+            result = self.wsgi_app(self._environ(scope, body), start_response)
+            for chunk in result:
+                if not chunk: continue
+                if not state.get('started'):
+                    emit({'type': 'http.response.start', 'status': state['status'], 'headers': state['headers']})
+                    state['started'] = True
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not state.get('started'):
+                emit({'type': 'http.response.start', 'status': state['status'], 'headers': state['headers']})
+            emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except ClientDisconnected:
+            # 停止迭代，由 finally 关闭响应 (释放文件句柄 / 生成器)
+            logger.info(f"ASGI client disconnected: {scope.get('path')}")
+        except Exception as e:
+            # 视图异常或发送失败：尚未发出响应头时补一个 500
+            logger.warning(f"ASGI response aborted: {scope.get('path')}: {e}")
+            if not state.get('started'):
+                try:
+                    emit({'type': 'http.response.start', 'status': 500, 'headers': [(b'content-type', b'text/plain')]})
+                    emit({'type': 'http.response.body', 'body': b'Internal Server Error', 'more_body': False})
+                except Exception: pass
+        finally:
+            if hasattr(result, 'close'):
+                try: result.close()
+                except Exception: pass
+            with self._lock:
+                pool.active -= 1
+                pool.completed += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, p in self.pools.items():
+                result[f"{name}_workers"] = p.workers
+                result[f"{name}_active"] = p.active
+                result[f"{name}_queued"] = p.queued
+                result[f"{name}_completed"] = p.completed
+            return result
@@ -0,0 +1,144 @@
+# backend/app/utils/backup_jobs.py
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：退化为进程内锁
+    fcntl = None
+
+from app.utils.backup_service import BackupManager, BackupCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class BackupBusyError(Exception):
+    """已有备份任务在运行"""
+
+
+class BackupJobRunner:
+    """
+    备份后台任务：
+    - 文件锁 (backups/.backup.lock) 保证手动触发与定时任务、以及多个 gunicorn worker 之间不会重叠；
+    - 进度写入 backups/.backup_status.json (含当前阶段 files / database / archive)，任意 worker 都能查询；
+      查询不碰文件锁，只按状态中的 pid 判断任务进程是否还在，避免与并发的 start() 抢锁；
+    - 取消通过 backups/.backup_cancel 标记文件传递给正在运行的进程。
+    """
+
+    def __init__(self):
+        self._app = None
+        self._local_lock = threading.Lock()
+        self.backup_dir = None
+
+    def init_app(self, app):
+        self._app = app
+        self.backup_dir = app.config['BACKUP_FOLDER']
+
+    def _path(self, name):
+        return os.path.join(self.backup_dir, name)
+
+    # ---------- 锁 ----------
+    def _acquire(self):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        if fcntl is None:
+            if not self._local_lock.acquire(blocking=False): raise BackupBusyError()
+            return None
+        fd = open(self._path('.backup.lock'), 'a+')
+        try: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fd.close()
+            raise BackupBusyError()
+        return fd
+
+    def _release(self, fd):
+        if fd is None:
+            self._local_lock.release()
+            return
+        try: fcntl.flock(fd, fcntl.LOCK_UN)
+        finally: fd.close()
+
+    # ---------- 状态 ----------
+    def _write_status(self, status):
+        tmp = self._path(f'.backup_status.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(status, f)
+        os.replace(tmp, self._path('.backup_status.json'))
+
+    def _alive(self, pid):
+        if not pid: return False
+        if pid == os.getpid(): return self._local_lock.locked() if fcntl is None else True
+        try: os.kill(pid, 0)
+        except ProcessLookupError: return False
+        except PermissionError: return True
+        except OSError: return False
+        return True
+
+    def status(self):
+        try:
+            with open(self._path('.backup_status.json'), encoding='utf-8') as f: status = json.load(f)
+        except (OSError, ValueError): return {"state": "idle"}
+        # 进程异常退出时状态文件停留在 running
+        if status.get('state') == 'running' and not self._alive(status.get('pid')): status['state'] = 'interrupted'
+        return status
+
+    def cancel(self):
+        if self.status().get('state') != 'running': return False
+        open(self._path('.backup_cancel'), 'w').close()
+        return True
+
+    # ---------- 执行 ----------
+    def start(self, trigger='manual', full=False):
+        """在后台线程中启动备份，立即返回 job_id；已有任务运行时抛出 BackupBusyError"""
+        fd = self._acquire()
+        job_id = uuid.uuid4().hex[:12]
+        threading.Thread(target=self._run, args=(fd, job_id, trigger, full), name=f"backup-{job_id}", daemon=True).start()
+        return job_id
+
+    def run_sync(self, trigger='scheduled', full=False):
+        """在当前线程执行 (定时任务使用)；已有任务运行时抛出 BackupBusyError"""
+        fd = self._acquire()
+        return self._run(fd, uuid.uuid4().hex[:12], trigger, full)
+
+    def _run(self, fd, job_id, trigger, full):
+        cancel_flag = self._path('.backup_cancel')
+        if os.path.exists(cancel_flag): os.remove(cancel_flag)
+        started = time.time()
+        status = {"job_id": job_id, "trigger": trigger, "state": "running", "phase": "scan", "started_at": started,
+                  "bytes_done": 0, "bytes_total": 0, "rate_bytes_per_sec": 0, "eta_seconds": None,
+                  "filename": None, "error": None, "pid": os.getpid()}
+        last_write = [0]
+        phase_started = {}
+
+        def progress(done, total, phase='files'):
+            # 速率与剩余时间按阶段分别计算，切换阶段时立即写出
+            now = time.time()
+            elapsed = max(now - phase_started.setdefault(phase, now), 1e-6)
+            rate = done / elapsed
+            changed = status.get('phase') != phase
+            status.update(phase=phase, bytes_done=done, bytes_total=total, rate_bytes_per_sec=int(rate),
+                          eta_seconds=int(max(total - done, 0) / rate) if rate > 0 else None)
+            if changed or now - last_write[0] >= 0.5:
+                last_write[0] = now
+                self._write_status(status)
+
+        try:
+            self._write_status(status)
+            with self._app.app_context():
+                bm = BackupManager(os.path.dirname(self._app.root_path))
+                filename = bm.create_backup(full=full, progress=progress, should_cancel=lambda: os.path.exists(cancel_flag))
+            status.update(state="succeeded", phase="done", filename=filename, report=bm.last_report, eta_seconds=0)
+            return filename
+        except BackupCancelled:
+            status.update(state="cancelled")
+            logger.info(f"Backup job {job_id} cancelled")
+        except Exception as e:
+            status.update(state="failed", error=str(e))
+            logger.error(f"Backup job {job_id} failed: {e}")
+        finally:
+            status["finished_at"] = time.time()
+            self._write_status(status)
+            if os.path.exists(cancel_flag): os.remove(cancel_flag)
+            self._release(fd)
@@ -0,0 +1,536 @@
+# backend/app/utils/backup_service.py
+import os
+import re
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tarfile
+import tempfile
+import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+from flask import current_app
+
+from app.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+BACKUP_NAME_RE = re.compile(r'^backup_\d{8}_\d{6}_(full|inc)\.tar$')
+# 单个数据块压缩结果在内存中的上限，超过后落到备份目录下的临时文件 (写入 tar 后即删除)
+BLOB_SPOOL_BYTES = 16 * 1024 * 1024
+# 写归档时每累计多少字节做一次取消检查与限速
+GUARD_CHECK_BYTES = 1024 * 1024
+
+
+def _cfg(key, default):
+    try: return current_app.config.get(key, default)
+    except RuntimeError: return default
+
+
+class BackupInUseError(ValueError):
+    """备份被后续增量快照引用，不能单独删除"""
+
+
+class BackupCancelled(Exception):
+    """备份任务被取消"""
+
+
+class Throttle:
+    """多线程共享的简单限速器 (字节/秒)，rate 为 0 时不限速"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def consume(self, n):
+        if not self.rate: return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + n / float(self.rate)
+        if start > now: time.sleep(start - now)
+
+
+class ChecksumWriter:
+    """
+    写归档时顺带计算整体 sha256 以及按 part_size 切分的分段 sha256，
+    省去生成后再把几十 GB 的归档完整读一遍。
+    """
+
+    def __init__(self, fileobj, part_size):
+        self.fileobj = fileobj
+        self.part_size = part_size
+        self.sha = hashlib.sha256()
+        self.parts = []
+        self._part_sha = hashlib.sha256()
+        self._part_len = 0
+        self._pos = 0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.sha.update(data)
+        self._pos += len(data)
+        view = memoryview(data)
+        while len(view):
+            n = min(len(view), self.part_size - self._part_len)
+            self._part_sha.update(view[:n])
+            self._part_len += n
+            view = view[n:]
+            if self._part_len == self.part_size: self._close_part()
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def _close_part(self):
+        self.parts.append({"index": len(self.parts), "offset": len(self.parts) * self.part_size,
+                           "size": self._part_len, "sha256": self._part_sha.hexdigest()})
+        self._part_sha = hashlib.sha256()
+        self._part_len = 0
+
+    def result(self):
+        if self._part_len or not self.parts: self._close_part()
+        return {"size": self._pos, "sha256": self.sha.hexdigest(), "part_size": self.part_size, "parts": self.parts}
+
+
+class GuardedWriter:
+    """写归档的文件对象包装：每累计 GUARD_CHECK_BYTES 调用一次 guard(n) (取消检查 + 限速)"""
+
+    def __init__(self, fileobj, guard):
+        self.fileobj = fileobj
+        self.guard = guard
+        self._pending = 0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self._pending += len(data)
+        if self._pending >= GUARD_CHECK_BYTES:
+            n, self._pending = self._pending, 0
+            self.guard(n)
+        return len(data)
+
+    def tell(self):
+        return self.fileobj.tell()
+
+
+class FileSlice:
+    """只暴露文件 [offset, offset + size) 区间的只读文件对象，供分段下载 / Range 使用"""
+
+    def __init__(self, path, offset, size):
+        self._f = open(path, 'rb')
+        self.offset = offset
+        self.size = size
+        self._pos = 0
+        self._f.seek(offset)
+
+    def read(self, n=-1):
+        remaining = self.size - self._pos
+        if n is None or n < 0 or n > remaining: n = remaining
+        data = self._f.read(n)
+        self._pos += len(data)
+        return data
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=0):
+        if whence == 1: pos += self._pos
+        elif whence == 2: pos += self.size
+        self._pos = max(0, min(pos, self.size))
+        self._f.seek(self.offset + self._pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._f.close()
+
+
+class BackupManager:
+    """
+    增量备份：
+    - 每次运行生成一个 tar 归档，内含 manifest.json、db.sql.gz (流式导出) 以及本次新增/变更文件的 .gz 块；
+    - manifest 列出该时间点 contracts_storage 的完整文件清单，每个文件记录其数据块所在的归档，
+      并通过 parent 字段链接到上一次快照；未变更 (大小 + mtime 相同) 的文件直接沿用上一次的记录；
+    - 变更文件由线程池并行压缩，压缩结果按扫描顺序直接追加进 tar (同时在途的块数有上限)，
+      不再先整体落到暂存目录再拷贝一遍；扫描后被删除的文件跳过并记入 manifest 的 skipped；
+    - 数据库在扫描文件之前开启的一致性快照事务 (START TRANSACTION WITH CONSISTENT SNAPSHOT) 中导出，
+      各表处于同一时间点，且引用的文件都在本次扫描范围内；
+    - 超过 BACKUP_MAX_CHAIN 次增量后自动做一次全量。
+    """
+
+    def __init__(self, root_dir, workers=None):
+        self.root_dir = root_dir
+        self.storage_dir = _cfg('UPLOAD_FOLDER', None) or os.path.join(root_dir, 'contracts_storage')
+        self.backup_dir = _cfg('BACKUP_FOLDER', None) or os.path.join(root_dir, 'backups')
+        self.workers = workers or _cfg('BACKUP_WORKERS', 4)
+        self.max_chain = _cfg('BACKUP_MAX_CHAIN', 7)
+        self.compress_level = _cfg('BACKUP_COMPRESS_LEVEL', 6)
+        self.bandwidth = int(_cfg('BACKUP_BANDWIDTH_MB', 0) * 1024 * 1024)
+        self.part_size = int(_cfg('BACKUP_PART_SIZE_MB', 512)) * 1024 * 1024
+        self.last_report = None
+        # 运行期钩子：进度回调 (增量字节数) / 取消检查 / 限速，由 create_backup 设置
+        self._progress = None
+        self._should_cancel = None
+        self._throttle = None
+        self._snapshot = None
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+    # ---------- 基础 ----------
+    def _check_name(self, filename):
+        if not filename or not BACKUP_NAME_RE.match(filename): raise ValueError("Invalid backup filename")
+
+    def _manifest_path(self, filename):
+        return os.path.join(self.backup_dir, filename + '.manifest.json')
+
+    def load_manifest(self, filename):
+        self._check_name(filename)
+        path = self._manifest_path(filename)
+        if not os.path.exists(path): return None
+        with open(path, encoding='utf-8') as f: return json.load(f)
+
+    def _save_manifest(self, filename, manifest):
+        tmp = self._manifest_path(filename) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, self._manifest_path(filename))
+
+    def _backup_names(self):
+        return sorted(f for f in os.listdir(self.backup_dir) if BACKUP_NAME_RE.match(f))
+
+    def list_backups(self):
+        result = []
+        for name in reversed(self._backup_names()):
+            path = os.path.join(self.backup_dir, name)
+            manifest = self.load_manifest(name) or {}
+            result.append({
+                "filename": name,
+                "size": os.path.getsize(path),
+                "created_at": manifest.get('created_at'),
+                "type": manifest.get('type', 'full' if name.endswith('_full.tar') else 'inc'),
+                "parent": manifest.get('parent'),
+                "files": len(manifest.get('files', {})),
+                "report": manifest.get('report'),
+                "sha256": (manifest.get('archive') or {}).get('sha256'),
+            })
+        return result
+
+    def get_backup_path(self, filename):
+        try: self._check_name(filename)
+        except ValueError: return None
+        path = os.path.join(self.backup_dir, filename)
+        return path if os.path.exists(path) else None
+
+    def delete_backup(self, filename):
+        self._check_name(filename)
+        path = os.path.join(self.backup_dir, filename)
+        if not os.path.exists(path): return False
+        # 其他快照仍引用本归档中的数据块时拒绝删除，否则会破坏恢复链
+        for other in self._backup_names():
+            if other == filename: continue
+            m = self.load_manifest(other) or {}
+            if any(e.get('archive') == filename for e in m.get('files', {}).values()):
+                raise BackupInUseError(f"{filename} is referenced by {other}")
+        os.remove(path)
+        if os.path.exists(self._manifest_path(filename)): os.remove(self._manifest_path(filename))
+        return True
+
+    # ---------- 校验与分段 ----------
+    def archive_checksums(self, filename):
+        """
+        返回归档整体及各分段的 sha256 ({size, sha256, part_size, parts})。
+        新备份在写归档时已算好；旧备份或大小不符 (被替换) 时补算一次并写回 sidecar。
+        """
+        path = self.get_backup_path(filename)
+        if not path: return None
+        manifest = self.load_manifest(filename) or {"filename": filename}
+        info = manifest.get('archive')
+        if info and info.get('size') == os.path.getsize(path): return info
+
+        writer = ChecksumWriter(_NullWriter(), self.part_size)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''): writer.write(chunk)
+        manifest['archive'] = writer.result()
+        self._save_manifest(filename, manifest)
+        return manifest['archive']
+
+    def open_part(self, filename, index):
+        """打开第 index 个分段，返回 (FileSlice, part 信息)；越界时返回 (None, None)"""
+        info = self.archive_checksums(filename)
+        if not info or not (0 <= index < len(info['parts'])): return None, None
+        part = info['parts'][index]
+        return FileSlice(self.get_backup_path(filename), part['offset'], part['size']), part
+
+    # ---------- 创建 ----------
+    def _scan_storage(self):
+        for root, dirs, files in os.walk(self.storage_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for f in files:
+                if f.startswith('.'): continue
+                full = os.path.join(root, f)
+                try: st = os.stat(full)
+                except OSError: continue
+                yield os.path.relpath(full, self.storage_dir).replace(os.sep, '/'), full, st
+
+    def _guard(self, n):
+        """读文件、写归档、导出数据库共用的取消检查与限速"""
+        if self._should_cancel and self._should_cancel(): raise BackupCancelled()
+        if self._throttle: self._throttle.consume(n)
+
+    def _compress_file(self, src, dest):
+        """把单个文件压缩写入文件对象 dest 并计算原文 sha256，返回 (sha256, 原始字节数)；源文件不存在时抛出 FileNotFoundError"""
+        sha = hashlib.sha256()
+        raw = 0
+        with open(src, 'rb') as fin, gzip.GzipFile(fileobj=dest, mode='wb', compresslevel=self.compress_level) as fout:
+            for chunk in iter(lambda: fin.read(1024 * 1024), b''):
+                self._guard(len(chunk))
+                sha.update(chunk)
+                raw += len(chunk)
+                fout.write(chunk)
+                if self._progress: self._progress(len(chunk))
+        return sha.hexdigest(), raw
+
+    def _open_snapshot(self):
+        """开启一致性快照事务 (REPEATABLE READ)，所有表按同一时间点导出，与 mysqldump --single-transaction 相同"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _dump_database(self, dest, progress=None, conn=None):
+        """
+        逐表流式导出 (SSCursor)，分批写 INSERT，内存占用与表大小无关；返回写出的字节数。
+        conn 为 _open_snapshot() 打开的快照连接 (由调用方关闭)；不传时自行开启快照。
+        每批与读文件共用取消检查和限速；progress(done, estimate) 的总量按 information_schema 的 data_length 估算。
+        """
+        own = conn is None
+        if own: conn = self._open_snapshot()
+        written = 0
+        try:
+            with gzip.open(dest, 'wt', encoding='utf-8', compresslevel=self.compress_level) as out:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT COALESCE(SUM(data_length), 0) AS n FROM information_schema.TABLES WHERE table_schema = DATABASE()")
+                    estimate = int(cursor.fetchone()['n'])
+
+                    def emit(line):
+                        nonlocal written
+                        self._guard(len(line))
+                        out.write(line)
+                        written += len(line)
+                        if progress: progress(written, max(estimate, written))
+
+                    cursor.execute("SHOW TABLES")
+                    tables = [list(r.values())[0] for r in cursor.fetchall()]
+                    for table in tables:
+                        cursor.execute(f"SHOW CREATE TABLE `{table}`")
+                        ddl = cursor.fetchone()['Create Table']
+                        emit(f"DROP TABLE IF EXISTS `{table}`;\n{ddl};\n")
+                        with conn.cursor(pymysql.cursors.SSCursor) as ss:
+                            ss.execute(f"SELECT * FROM `{table}`")
+                            batch = []
+                            for row in ss:
+                                batch.append("(" + ",".join(conn.escape(v) for v in row) + ")")
+                                if len(batch) >= 500:
+                                    emit(f"INSERT INTO `{table}` VALUES {','.join(batch)};\n")
+                                    batch = []
+                            if batch: emit(f"INSERT INTO `{table}` VALUES {','.join(batch)};\n")
+        finally:
+            if own: conn.close()
+        return written
+
+    def _latest(self):
+        names = self._backup_names()
+        return (names[-1], self.load_manifest(names[-1])) if names else (None, None)
+
+    def create_backup(self, full=False, progress=None, should_cancel=None):
+        """
+        progress(done_bytes, total_bytes, phase)：进度回调，phase 依次为 files (读取变更文件) / database (导出数据库，
+        总量为估算值) / archive (数据库与 manifest 写入归档)；should_cancel()：返回 True 时中止并清理临时文件。
+        读文件、写归档、导出数据库共用 BACKUP_BANDWIDTH_MB 限速 (0 为不限)，避免与用户下载争抢磁盘。
+        """
+        # 数据库快照在扫描文件之前建立：导出的记录引用的文件在扫描时都已存在 (扫描后新上传的只多出未被引用的块)
+        self._snapshot = self._open_snapshot()
+        try: return self._create_backup(full, progress, should_cancel)
+        finally:
+            self._snapshot.close()
+            self._snapshot = None
+
+    def _create_backup(self, full, progress, should_cancel):
+        started = time.time()
+        now = datetime.datetime.utcnow() + datetime.timedelta(hours=8)
+        parent_name, parent = self._latest()
+        chain = (parent or {}).get('chain_length', 0)
+        if not parent or chain >= self.max_chain: full = True
+        kind = 'full' if full else 'inc'
+        filename = f"backup_{now.strftime('%Y%m%d_%H%M%S')}_{kind}.tar"
+        prev_files = {} if full else parent.get('files', {})
+
+        files, to_copy = {}, []
+        bytes_total = 0
+        for rel, full_path, st in self._scan_storage():
+            bytes_total += st.st_size
+            prev = prev_files.get(rel)
+            if prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns:
+                files[rel] = prev
+            else:
+                to_copy.append((rel, full_path, st))
+
+        bytes_to_copy = sum(st.st_size for _, _, st in to_copy)
+        done = [0]
+        done_lock = threading.Lock()
+
+        def on_chunk(n):
+            with done_lock:
+                done[0] += n
+                current = done[0]
+            if progress: progress(current, bytes_to_copy, 'files')
+
+        self._progress = on_chunk
+        self._should_cancel = should_cancel
+        self._throttle = Throttle(self.bandwidth) if self.bandwidth else None
+        if progress: progress(0, bytes_to_copy, 'files')
+
+        staging = tempfile.mkdtemp(prefix='.staging_', dir=self.backup_dir)
+        skipped = []
+        try:
+            manifest = {
+                "filename": filename,
+                "type": 'full' if full else 'incremental',
+                "parent": None if full else parent_name,
+                "chain_length": 0 if full else chain + 1,
+                "created_at": now.strftime('%Y-%m-%d %H:%M:%S'),
+                "files": files,
+            }
+
+            def work(item):
+                rel, full_path, st = item
+                spool = tempfile.SpooledTemporaryFile(max_size=BLOB_SPOOL_BYTES, dir=staging)
+                try: sha, raw = self._compress_file(full_path, spool)
+                except FileNotFoundError:
+                    # 扫描之后被删除的文件 (例如合同被删除)：跳过，不让整个备份失败
+                    spool.close()
+                    return rel, st, None, 0, None
+                except BaseException:
+                    spool.close()
+                    raise
+                return rel, st, sha, raw, spool
+
+            bytes_read = 0
+            tmp_tar = os.path.join(staging, filename)
+            with open(tmp_tar, 'wb') as raw_out:
+                checksum = ChecksumWriter(raw_out, self.part_size)
+                with tarfile.open(fileobj=GuardedWriter(checksum, self._guard), mode='w') as tar:
+                    # 变更文件并行压缩，按提交顺序逐个写入 tar；在途块数限制为 2 倍线程数，控制内存 / 临时文件占用
+                    with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                        items, pending = iter(to_copy), deque()
+
+                        def fill():
+                            while len(pending) < self.workers * 2:
+                                item = next(items, None)
+                                if item is None: return
+                                pending.append(pool.submit(work, item))
+
+                        fill()
+                        try:
+                            while pending:
+                                rel, st, sha, raw, spool = pending.popleft().result()
+                                fill()
+                                if spool is None:
+                                    skipped.append(rel)
+                                    continue
+                                try:
+                                    info = tarfile.TarInfo(f"blobs/{rel}.gz")
+                                    info.size, info.mtime, info.mode = spool.tell(), int(time.time()), 0o644
+                                    spool.seek(0)
+                                    tar.addfile(info, spool)
+                                finally: spool.close()
+                                bytes_read += raw
+                                files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha, "archive": filename}
+                        except BaseException:
+                            for f in pending: f.cancel()
+                            raise
+
+                    self._guard(0)
+                    db_path = os.path.join(staging, 'db.sql.gz')
+                    db_bytes = self._dump_database(db_path, progress=(lambda d, t: progress(d, t, 'database')) if progress else None, conn=self._snapshot)
+                    db_size = os.path.getsize(db_path)
+                    if progress: progress(0, db_size, 'archive')
+                    tar.add(db_path, arcname='db.sql.gz')
+                    if progress: progress(db_size, db_size, 'archive')
+
+                    manifest["skipped"] = sorted(skipped)
+                    manifest_path = os.path.join(staging, 'manifest.json')
+                    with open(manifest_path, 'w', encoding='utf-8') as f: json.dump(manifest, f, ensure_ascii=False)
+                    tar.add(manifest_path, arcname='manifest.json')
+            manifest["archive"] = checksum.result()
+
+            elapsed = max(time.time() - started, 1e-6)
+            archive_bytes = os.path.getsize(tmp_tar)
+            manifest["report"] = {
+                "files_total": len(files), "files_changed": len(to_copy) - len(skipped),
+                "files_reused": len(files) - len(to_copy) + len(skipped), "files_skipped": len(skipped),
+                "bytes_total": bytes_total, "bytes_read": bytes_read, "db_dump_bytes": db_bytes,
+                "archive_bytes": archive_bytes, "seconds": round(elapsed, 2),
+                "read_mb_per_sec": round(bytes_read / elapsed / 1024 / 1024, 2),
+            }
+            os.replace(tmp_tar, os.path.join(self.backup_dir, filename))
+            self._save_manifest(filename, manifest)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            self._progress = self._should_cancel = self._throttle = None
+
+        self.last_report = manifest["report"]
+        logger.info(f"Backup {filename} done: {self.last_report}")
+        return filename
+
+    # ---------- 恢复 ----------
+    def restore(self, filename, target_dir, with_db=True):
+        """
+        将指定快照时刻的 contracts_storage 还原到 target_dir：按 manifest 中记录的归档分组，
+        每个归档只打开一次并逐块解压校验；with_db 时同时解出该快照的 db.sql.gz。
+        """
+        manifest = self.load_manifest(filename)
+        if not manifest: raise ValueError("Manifest not found")
+        by_archive = {}
+        for rel, entry in manifest['files'].items():
+            by_archive.setdefault(entry['archive'], []).append((rel, entry))
+
+        os.makedirs(target_dir, exist_ok=True)
+        target_root = os.path.realpath(target_dir)
+        restored = 0
+        for archive, entries in by_archive.items():
+            path = self.get_backup_path(archive)
+            if not path: raise ValueError(f"Missing archive in chain: {archive}")
+            with tarfile.open(path, 'r') as tar:
+                for rel, entry in entries:
+                    dest = os.path.realpath(os.path.join(target_dir, rel))
+                    if not dest.startswith(target_root + os.sep): raise ValueError(f"Unsafe path in manifest: {rel}")
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    sha = hashlib.sha256()
+                    with gzip.GzipFile(fileobj=tar.extractfile(f"blobs/{rel}.gz")) as src, open(dest, 'wb') as out:
+                        for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                            sha.update(chunk)
+                            out.write(chunk)
+                    if sha.hexdigest() != entry['sha256']: raise ValueError(f"Checksum mismatch: {rel}")
+                    restored += 1
+
+        if with_db:
+            with tarfile.open(self.get_backup_path(filename), 'r') as tar, open(os.path.join(target_dir, 'db.sql.gz'), 'wb') as out:
+                shutil.copyfileobj(tar.extractfile('db.sql.gz'), out)
+        return restored
+
+
+class _NullWriter:
+    def write(self, data): return len(data)
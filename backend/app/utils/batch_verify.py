@@ -0,0 +1,200 @@
+# backend/app/utils/batch_verify.py
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tarfile
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+from app.db import get_db_connection
+from app.utils.db_helpers import resolve_trace_ids
+from app.utils.watermark import WatermarkEngine
+
+logger = logging.getLogger(__name__)
+
+# 可提取水印的文件类型
+VERIFY_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+
+class BatchVerifyError(ValueError):
+    """上传内容不合法 (文件过多 / 解压过大等)"""
+
+
+class BatchVerifier:
+    """
+    泄露排查批量验证：
+    - 接收多个文件或压缩包 (zip / tar)，解到任务临时目录；
+    - 线程池并行提取 TraceID，再用一次 IN 查询 (按 trace_id 索引) 反查 audit_logs 中的用户 / 文件 / 时间；
+    - 任务状态与报告写入 preview_cache/verify/<job_id>.json，多 worker 下均可查询，过期自动清理。
+    """
+
+    def __init__(self, workers=4, max_files=1000, max_bytes=2 * 1024 ** 3, report_ttl=86400):
+        self.workers = workers
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.report_ttl = report_ttl
+        self.job_dir = None
+        self._app = None
+
+    def init_app(self, app):
+        self._app = app
+        self.job_dir = os.path.join(app.config['PREVIEW_CACHE_FOLDER'], 'verify')
+        self.workers = app.config.get('VERIFY_WORKERS', self.workers)
+        self.max_files = app.config.get('VERIFY_MAX_FILES', self.max_files)
+        self.max_bytes = app.config.get('VERIFY_MAX_MB', self.max_bytes // 1024 ** 2) * 1024 ** 2
+
+    # ---------- 状态 ----------
+    def _report_path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write(self, job_id, report):
+        tmp = self._report_path(job_id) + f".{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(report, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._report_path(job_id))
+
+    def get(self, job_id):
+        if not job_id or not job_id.isalnum(): return None
+        try:
+            with open(self._report_path(job_id), encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def _cleanup(self):
+        now = time.time()
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.report_ttl:
+                    if os.path.isdir(path): shutil.rmtree(path, ignore_errors=True)
+                    else: os.remove(path)
+            except OSError: pass
+
+    # ---------- 收件 ----------
+    def _add(self, items, work_dir, name, src):
+        """把单个文件流写入工作目录；返回写入字节数"""
+        if len(items) >= self.max_files: raise BatchVerifyError(f"文件数超过上限 {self.max_files}")
+        ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        dest = os.path.join(work_dir, f"{len(items):05d}.{ext or 'bin'}")
+        with open(dest, 'wb') as out: shutil.copyfileobj(src, out, 1024 * 1024)
+        items.append({"name": name, "path": dest, "ext": ext})
+        return os.path.getsize(dest)
+
+    def _unpack(self, items, work_dir, upload, total):
+        name = upload.filename or ''
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or info.filename.startswith('__MACOSX/'): continue
+                    # 按声明大小预判，防止压缩炸弹
+                    if total + info.file_size > self.max_bytes: raise BatchVerifyError("解压后体积超过上限")
+                    with zf.open(info) as src: total += self._add(items, work_dir, info.filename, src)
+        else:
+            with tarfile.open(fileobj=upload.stream, mode='r:*') as tf:
+                for member in tf:
+                    if not member.isfile(): continue
+                    if total + member.size > self.max_bytes: raise BatchVerifyError("解压后体积超过上限")
+                    total += self._add(items, work_dir, member.name, tf.extractfile(member))
+        return total
+
+    def submit(self, uploads, user_id):
+        """保存上传内容并启动后台任务，返回 job_id；内容不合法时抛出 BatchVerifyError"""
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._cleanup()
+        job_id = uuid.uuid4().hex[:16]
+        work_dir = os.path.join(self.job_dir, job_id)
+        os.makedirs(work_dir)
+        items, total = [], 0
+        try:
+            for upload in uploads:
+                if (upload.filename or '').lower().endswith(ARCHIVE_SUFFIXES):
+                    total = self._unpack(items, work_dir, upload, total)
+                else:
+                    total += self._add(items, work_dir, secure_filename(upload.filename or 'file'), upload.stream)
+                if total > self.max_bytes: raise BatchVerifyError("上传体积超过上限")
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise BatchVerifyError(f"压缩包无法解析: {e}")
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        if not items:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise BatchVerifyError("没有可验证的文件")
+
+        report = {"job_id": job_id, "state": "running", "created_by": user_id, "created_at": time.time(),
+                  "total": len(items), "processed": 0}
+        self._write(job_id, report)
+        threading.Thread(target=self._run, args=(job_id, work_dir, items, report), name=f"verify-{job_id}", daemon=True).start()
+        return job_id
+
+    # ---------- 执行 ----------
+    def _extract(self, item):
+        if item['ext'] not in VERIFY_EXTENSIONS:
+            return {"name": item['name'], "status": "unsupported", "trace_id": None, "prefix": False}
+        try:
+            # extract_blind_watermark 按扩展名分派，工作文件名已保留扩展名；需要 app 上下文读取水印强度配置
+            with self._app.app_context(): result = WatermarkEngine.extract_blind_watermark(item['path'])
+        except Exception as e:
+            return {"name": item['name'], "status": "error", "trace_id": None, "prefix": False, "error": str(e)}
+        details = result.get('details') or {}
+        # PDF 元数据给出完整 TraceID，图片盲水印只能还原前缀
+        trace_id = details.get('trace_id') or details.get('trace_prefix')
+        if trace_id in (None, '', 'N/A'): trace_id = None
+        return {"name": item['name'], "status": "found" if trace_id else "not_found", "type": result.get('type'),
+                "trace_id": trace_id, "prefix": bool(details.get('trace_prefix')), "embedded": details}
+
+    def _resolve(self, results):
+        """按 trace_id 索引批量反查审计记录 (每批 500 个，完整 ID 走 IN，前缀走 LIKE)"""
+        keys = sorted({(r['trace_id'], r['prefix']) for r in results if r['trace_id']})
+        found = {}
+        if not keys: return found
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                for i in range(0, len(keys), 500):
+                    batch = keys[i:i + 500]
+                    found.update(resolve_trace_ids(cursor, [k for k, p in batch if not p], [k for k, p in batch if p]))
+        finally: conn.close()
+        return found
+
+    def _run(self, job_id, work_dir, items, report):
+        started = time.time()
+        try:
+            results = []
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"verify-{job_id[:6]}") as pool:
+                for res in pool.map(self._extract, items):
+                    results.append(res)
+                    report["processed"] = len(results)
+                    if len(results) % 50 == 0: self._write(job_id, report)
+
+            with self._app.app_context():
+                records = self._resolve(results)
+
+            by_user = {}
+            for r in results:
+                rec = records.get(r['trace_id']) if r['trace_id'] else None
+                r['record'] = rec
+                if r['trace_id'] and not rec: r['status'] = 'unknown_trace'
+                if rec:
+                    key = rec['user_id']
+                    u = by_user.setdefault(key, {"user_id": key, "user_name": rec['user_name'], "user_email": rec['user_email'], "files": 0, "contracts": set()})
+                    u['files'] += 1
+                    if rec['file_name']: u['contracts'].add(rec['file_name'])
+
+            counts = {}
+            for r in results: counts[r['status']] = counts.get(r['status'], 0) + 1
+            report.update(state="succeeded", results=results, counts=counts,
+                          suspects=sorted(({**u, "contracts": sorted(u['contracts'])} for u in by_user.values()), key=lambda u: -u['files']))
+        except Exception as e:
+            logger.error(f"Batch verify {job_id} failed: {e}")
+            report.update(state="failed", error=str(e))
+        finally:
+            report["seconds"] = round(time.time() - started, 2)
+            self._write(job_id, report)
+            shutil.rmtree(work_dir, ignore_errors=True)
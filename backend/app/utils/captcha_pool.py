@@ -0,0 +1,130 @@
+# backend/app/utils/captcha_pool.py
+import os
+import time
+import uuid
+import queue
+import random
+import string
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class CaptchaPool:
+    """
+    预生成验证码池：后台线程持续渲染 PNG 放入有界队列，
+    /api/captcha 只负责出队 + 分配 token，不再在请求线程里画图。
+    池子被掏空时才回退到同步渲染，并计入 depleted 指标。
+    已发出的验证码按发放顺序保存 (有效期相同，发放顺序即过期顺序)，清理只从头部弹出已过期的项；
+    总数超过 max_issued 时淘汰最早发出的，突发流量只会让旧验证码提前失效，内存有上限。
+    """
+
+    def __init__(self, size=200, ttl=300, width=120, height=40, max_issued=10000):
+        self.size = size
+        self.ttl = ttl
+        self.max_issued = max_issued
+        self.width = width
+        self.height = height
+        self._ready = queue.Queue(maxsize=size)
+        self._issued = OrderedDict()  # token -> {'code', 'png', 'expire'}，按发放顺序
+        self._issued_lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._image = None
+        self._worker = None
+        self._worker_pid = None
+        self._depleted_flag = False
+        self.stats = {"rendered": 0, "issued": 0, "pool_hits": 0, "depleted": 0, "verified": 0, "rejected": 0, "evicted": 0}
+
+    def init_app(self, app):
+        self.size = app.config.get('CAPTCHA_POOL_SIZE', self.size)
+        self.ttl = app.config.get('CAPTCHA_TTL', self.ttl)
+        self.max_issued = app.config.get('CAPTCHA_MAX_ISSUED', self.max_issued)
+        self._ready = queue.Queue(maxsize=self.size)
+
+    # ---------- 渲染 ----------
+    def _render(self):
+        code = ''.join(random.choices(string.digits, k=4))
+        with self._render_lock:
+            if self._image is None:
+                from captcha.image import ImageCaptcha
+                self._image = ImageCaptcha(width=self.width, height=self.height)
+            data = self._image.generate(code)
+        with self._issued_lock: self.stats["rendered"] += 1
+        return code, data.getvalue()
+
+    def _run(self):
+        while True:
+            try:
+                # 队列满时 put 会阻塞，天然限制了后台线程的 CPU 占用
+                self._ready.put(self._render())
+            except Exception as e:
+                logger.error(f"Captcha render failed: {e}")
+                time.sleep(1)
+
+    def _ensure_worker(self):
+        # gunicorn 预 fork 后父进程的线程不会被继承，按 pid 懒启动
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._issued_lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name="captcha-producer", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    # ---------- 对外接口 ----------
+    def issue(self):
+        """取出一个验证码并分配 token，返回 token"""
+        self._ensure_worker()
+        try:
+            code, png = self._ready.get_nowait()
+            with self._issued_lock: self.stats["pool_hits"] += 1
+            self._depleted_flag = False
+        except queue.Empty:
+            with self._issued_lock: self.stats["depleted"] += 1
+            if not self._depleted_flag:
+                self._depleted_flag = True
+                logger.warning("Captcha pool depleted, falling back to inline rendering")
+            code, png = self._render()
+
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._issued_lock:
+            self._purge(now)
+            self._issued[token] = {'code': code, 'png': png, 'expire': now + self.ttl}
+            while len(self._issued) > self.max_issued:
+                self._issued.popitem(last=False)
+                self.stats["evicted"] += 1
+            self.stats["issued"] += 1
+        return token
+
+    def get_image(self, token):
+        with self._issued_lock:
+            item = self._issued.get(token)
+        if not item or time.time() > item['expire']: return None
+        return item['png']
+
+    def verify(self, token, code):
+        """校验并作废 token (一次性)"""
+        if not token or not code: return False
+        with self._issued_lock:
+            self._purge(time.time())
+            item = self._issued.pop(token, None)
+            ok = bool(item) and item['code'].lower() == str(code).lower()
+            self.stats["verified" if ok else "rejected"] += 1
+        return ok
+
+    def snapshot(self):
+        with self._issued_lock:
+            outstanding = len(self._issued)
+            stats = dict(self.stats)
+        return dict(stats, pool_depth=self._ready.qsize(), pool_size=self.size, outstanding=outstanding)
+
+    def _purge(self, now):
+        # 调用方持有 self._issued_lock；只检查头部，均摊 O(1)
+        while self._issued:
+            token, item = next(iter(self._issued.items()))
+            if now <= item['expire']: break
+            del self._issued[token]
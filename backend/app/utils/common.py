@@ -19,4 +19,14 @@ def calculate_file_hash(file_path):
         with open(file_path, "rb") as f:
             for byte_block in iter(lambda: f.read(4096), b""): sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
-    except: return "unknown_hash"
\ No newline at end of file
+    except: return "unknown_hash"
+
+def parse_page_range(spec):
+    """解析 pages 参数: '1-5' / '3' / '4-'，返回 (start, end)，end 为 None 表示到末页；非法时返回 None"""
+    m = re.fullmatch(r'\s*(\d+)\s*(?:(-)\s*(\d*)\s*)?', spec or '')
+    if not m: return None
+    start = int(m.group(1))
+    if not m.group(2): end = start
+    else: end = int(m.group(3)) if m.group(3) else None
+    if start < 1 or (end is not None and end < start): return None
+    return start, end
\ No newline at end of file
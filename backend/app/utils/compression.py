@@ -0,0 +1,76 @@
+# backend/app/utils/compression.py
+import gzip
+import time
+import threading
+
+from flask import request
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/csv', 'image/svg+xml')
+
+
+class ResponseCompressor:
+    """
+    列表 / 搜索 / 审计等 JSON 响应在 after_request 中整体压缩：
+    - 只处理 200、非流式 (send_file / 分片下载等 direct_passthrough 响应不动)、尚未编码且不小于 COMPRESS_MIN_BYTES 的响应；
+    - 客户端声明支持 br 且安装了 brotli 时用 br，否则 gzip；
+    - 加 Vary: Accept-Encoding，避免代理把压缩后的内容发给不支持的客户端。
+    反向代理已统一压缩时可把阈值设大关闭。
+    """
+
+    def __init__(self):
+        self.min_bytes = 1024
+        self.gzip_level = 6
+        self.br_quality = 4
+        self.stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0, "encode_ms": 0.0}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.min_bytes = app.config.get('COMPRESS_MIN_BYTES', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.br_quality = app.config.get('COMPRESS_BR_QUALITY', 4)
+        app.after_request(self._after_request)
+
+    def _choose(self):
+        offered = ['br', 'gzip'] if HAS_BROTLI else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def _after_request(self, response):
+        if response.status_code != 200 or request.method == 'HEAD': return response
+        if response.direct_passthrough or response.is_streamed: return response
+        if response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers: return response
+        response.vary.add('Accept-Encoding')
+        if (response.content_length or 0) < self.min_bytes: return response
+        encoding = self._choose()
+        if not encoding: return response
+
+        start = time.perf_counter()
+        data = response.get_data()
+        if encoding == 'br': body = brotli.compress(data, quality=self.br_quality)
+        else: body = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # 强 ETag 对应具体字节，压缩后附加编码后缀 (列表接口比较时会去掉，见 utils/listing_versions.py)
+        etag, weak = response.get_etag()
+        if etag and not weak: response.set_etag(f"{etag}-{encoding}")
+        with self._lock:
+            self.stats["responses"] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(body)
+            self.stats["encode_ms"] += elapsed
+        return response
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+        result["encode_ms"] = round(result["encode_ms"], 1)
+        result["ratio"] = round(result["bytes_out"] / result["bytes_in"], 3) if result["bytes_in"] else None
+        result["brotli"] = HAS_BROTLI
+        return result
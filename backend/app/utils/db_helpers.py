@@ -17,4 +17,29 @@ def get_all_sub_file_ids(cursor, folder_id):
     if not folder_ids: return []
     fmt = ','.join(['%s'] * len(folder_ids))
     cursor.execute(f"SELECT id FROM contracts WHERE folder_id IN ({fmt})", tuple(folder_ids))
-    return [f['id'] for f in cursor.fetchall()]
\ No newline at end of file
+    return [f['id'] for f in cursor.fetchall()]
+
+def resolve_trace_ids(cursor, trace_ids=(), trace_prefixes=()):
+    """
+    把完整 TraceID 与 TraceID 前缀 (图片盲水印只能还原前缀) 一次性映射到审计记录。
+    前缀走 LIKE 'xxx%'，与 IN 一样命中 audit_logs.trace_id 索引；同一前缀多条时取最新一条。
+    """
+    trace_ids, trace_prefixes = list(set(trace_ids)), list(set(trace_prefixes))
+    if not trace_ids and not trace_prefixes: return {}
+    conds, params = [], []
+    if trace_ids:
+        conds.append(f"a.trace_id IN ({','.join(['%s'] * len(trace_ids))})")
+        params.extend(trace_ids)
+    for p in trace_prefixes:
+        conds.append("a.trace_id LIKE %s")
+        params.append(p.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    cursor.execute(
+        "SELECT a.trace_id, a.action_type, a.created_at, a.user_id, a.contract_id, u.name as user_name, u.email as user_email, c.title as file_name "
+        "FROM audit_logs a LEFT JOIN users u ON a.user_id = u.id LEFT JOIN contracts c ON a.contract_id = c.id "
+        f"WHERE {' OR '.join(conds)} ORDER BY a.id DESC", tuple(params))
+    found = {}
+    for row in cursor.fetchall():
+        if row['trace_id'] in trace_ids: found.setdefault(row['trace_id'], row)
+        for p in trace_prefixes:
+            if row['trace_id'].startswith(p): found.setdefault(p, row)
+    return found
@@ -0,0 +1,80 @@
+# backend/app/utils/disk_cache.py
+import os
+import shutil
+import hashlib
+import threading
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try: total += os.path.getsize(os.path.join(root, f))
+            except OSError: pass
+    return total
+
+
+class DiskLRU:
+    """
+    按总大小限制的磁盘缓存目录 (缩略图底图、Office 转换结果)：
+    - 每个源文件的缓存放在以源路径哈希命名的子目录下，源文件删除 / 替换时 purge() 整体删除，
+      不会在磁盘上留下已删除合同的未加水印副本；
+    - 写入后累加大小，超过上限时按 mtime (命中时 touch 刷新) 从旧到新淘汰到 80%。
+    目录可被多个 worker 共享；大小计数是进程内的估计，每次淘汰时重新扫描校正。
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def entry_dir(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+        return os.path.join(self.root, key)
+
+    def touch(self, path):
+        try: os.utime(path)
+        except OSError: pass
+
+    def added(self, path):
+        """新写入缓存文件后调用"""
+        try: size = os.path.getsize(path)
+        except OSError: return
+        with self._lock:
+            # 首次统计时扫描结果已包含这个文件
+            if self._size is None: self._size = _dir_size(self.root)
+            else: self._size += size
+            over = self._size > self.max_bytes
+        if over: self._evict()
+
+    def purge(self, file_path):
+        """删除某个源文件的全部缓存，返回释放的字节数"""
+        path = self.entry_dir(file_path)
+        if not os.path.isdir(path): return 0
+        removed = _dir_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            if self._size is not None: self._size = max(0, self._size - removed)
+        return removed
+
+    def _evict(self):
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for f in files:
+                if f.endswith('.tmp'): continue  # 其他线程 / worker 正在写入
+                p = os.path.join(root, f)
+                try:
+                    st = os.stat(p)
+                    entries.append((st.st_mtime, st.st_size, p))
+                except OSError: pass
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        target = int(self.max_bytes * 0.8)  # 一次淘汰到 80%，避免频繁扫描
+        for _, size, p in entries:
+            if total <= target: break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError: pass
+        with self._lock: self._size = total
@@ -0,0 +1,42 @@
+# backend/app/utils/fast_json.py
+import logging
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    orjson 序列化 (C 实现)，输出与默认 provider 相同的 JSON：键排序、紧凑分隔符、日期为 HTTP-date；
+    差别仅在于非 ASCII 字符直接输出 UTF-8 而不是 \\uXXXX 转义 (中文标题体积约减为 1/2)。
+    日期等非原生类型仍交给 Flask 的 default (PASSTHROUGH_DATETIME)；请求体解析沿用标准库。
+    调试模式或 compact=False 时交回标准库以保留缩进格式。
+    """
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if HAS_ORJSON else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is not None: return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False: return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # 直接生成 bytes，省去 str 中转与再编码
+        body = orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_app(app):
+    """按 JSON_ENCODER 替换 app.json；orjson 未安装时保留默认实现"""
+    if app.config.get('JSON_ENCODER', 'orjson') != 'orjson': return
+    if not HAS_ORJSON:
+        logger.warning("JSON_ENCODER=orjson but orjson is not installed, using the standard library encoder")
+        return
+    app.json = OrjsonProvider(app)
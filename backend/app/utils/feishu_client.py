@@ -0,0 +1,138 @@
+# backend/app/utils/feishu_client.py
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class FeishuClient:
+    """
+    飞书开放平台调用封装：
+    - 共享 requests.Session (连接池 + 超时 + 有限重试)；授权码一次性有效，换取 user token 的 POST
+      使用单独的 session，只在连接建立失败 (请求未发出) 时重试
+    - app/tenant access token 按 expire 缓存，临近过期时由单个线程提前刷新，
+      其余请求继续使用旧 token，不会同时打到飞书 token 接口；提前量不超过有效期的一半
+    """
+
+    def __init__(self, base_url="https://open.feishu.cn", timeout=(3, 10), refresh_ahead=300, pool_size=20):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.refresh_ahead = refresh_ahead
+        self.pool_size = pool_size
+        self.app_id = None
+        self.app_secret = None
+        self._token = None
+        self._expires_at = 0
+        self._refresh_at = 0
+        self._lock = threading.Lock()
+        self._session = None
+        self._exchange_session = None
+        self.stats = {"token_fetches": 0, "token_hits": 0, "token_errors": 0}
+
+    def init_app(self, app):
+        self.app_id = app.config['FEISHU_APP_ID']
+        self.app_secret = app.config['FEISHU_APP_SECRET']
+        self.base_url = app.config.get('FEISHU_BASE_URL', self.base_url).rstrip('/')
+        self.timeout = (app.config.get('FEISHU_CONNECT_TIMEOUT', 3), app.config.get('FEISHU_READ_TIMEOUT', 10))
+        self.refresh_ahead = app.config.get('FEISHU_TOKEN_REFRESH_AHEAD', self.refresh_ahead)
+        self._session = self._exchange_session = None
+        self.invalidate()
+
+    def _make_session(self, retry):
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        s.mount('https://', adapter)
+        s.mount('http://', adapter)
+        return s
+
+    @property
+    def session(self):
+        """GET 与幂等的 tenant token POST：连接失败和限流/网关类错误重试，读超时不重试"""
+        if self._session is None:
+            self._session = self._make_session(Retry(
+                total=3, connect=3, read=0, status=2, backoff_factor=0.2,
+                status_forcelist=(429, 502, 503, 504), allowed_methods=frozenset(['GET', 'POST'])))
+        return self._session
+
+    @property
+    def exchange_session(self):
+        """授权码换 token：只重试连接失败，不按状态码重试 (网关 5xx 时授权码可能已被消费)"""
+        if self._exchange_session is None:
+            self._exchange_session = self._make_session(Retry(
+                total=3, connect=3, read=0, other=0, status=0, backoff_factor=0.2))
+        return self._exchange_session
+
+    # ---------- token 缓存 ----------
+    def _fetch_token(self):
+        resp = self.session.post(
+            f"{self.base_url}/open-apis/auth/v3/app_access_token/internal",
+            json={"app_id": self.app_id, "app_secret": self.app_secret},
+            timeout=self.timeout
+        )
+        data = resp.json()
+        token = data.get("tenant_access_token")
+        if not token: raise ValueError(f"Feishu token response: {data}")
+        self.stats["token_fetches"] += 1
+        expire = int(data.get("expire", 7200))
+        # refresh_ahead >= expire 时不能每次调用都去刷新
+        ahead = min(self.refresh_ahead, expire // 2)
+        now = time.time()
+        self._token = token
+        self._expires_at = now + expire
+        self._refresh_at = now + expire - ahead
+        return token
+
+    def get_tenant_access_token(self):
+        now = time.time()
+        token, expires_at, refresh_at = self._token, self._expires_at, self._refresh_at
+        if token and now < refresh_at:
+            self.stats["token_hits"] += 1
+            return token
+
+        if token and now < expires_at:
+            # 提前刷新窗口：抢到锁的线程去刷新，其他线程继续用旧 token
+            if not self._lock.acquire(blocking=False):
+                self.stats["token_hits"] += 1
+                return token
+            try:
+                if time.time() < self._refresh_at: return self._token
+                return self._fetch_token()
+            except Exception as e:
+                self.stats["token_errors"] += 1
+                logger.error(f"Feishu Token Refresh Error: {e}")
+                return token
+            finally: self._lock.release()
+
+        # 已过期或尚未获取：单飞，其他线程等待结果
+        with self._lock:
+            if self._token and time.time() < self._expires_at: return self._token
+            try: return self._fetch_token()
+            except Exception as e:
+                self.stats["token_errors"] += 1
+                logger.error(f"Feishu Token Error: {e}")
+                return None
+
+    def invalidate(self):
+        self._token = None
+        self._expires_at = self._refresh_at = 0
+
+    # ---------- 业务接口 ----------
+    def exchange_code(self, code, tenant_token):
+        return self.exchange_session.post(
+            f"{self.base_url}/open-apis/authen/v1/oidc/access_token",
+            json={"grant_type": "authorization_code", "code": code},
+            headers={"Authorization": f"Bearer {tenant_token}"},
+            timeout=self.timeout
+        ).json()
+
+    def get_user_info(self, user_access_token):
+        return self.session.get(
+            f"{self.base_url}/open-apis/authen/v1/user_info",
+            headers={"Authorization": f"Bearer {user_access_token}"},
+            timeout=self.timeout
+        ).json().get("data", {})
@@ -0,0 +1,110 @@
+# backend/app/utils/listing_versions.py
+"""
+列表接口的条件请求 (ETag / If-None-Match)：
+
+- folder_versions 记录每个文件夹的变更版本。上传、重命名、删除、新建子目录、文件 / 文件夹授权变更时，
+  该文件夹及其所有祖先 +1：非管理员能看到哪些子目录取决于整棵子树内的文件与授权，
+  所以子树内的变化也要让上层目录的列表失效；
+- users.acl_version 为用户级授权版本，调整分组 / 删除分组时 +1；
+- ETag = hash(列表类型, 文件夹, 文件夹版本, 用户, 角色, 用户授权版本, 响应格式)，
+  计算只需一次主键查询，命中 If-None-Match 时直接 304，不执行权限联表查询。
+版本与业务写入在同一事务中提交，多个 worker 共享，不依赖进程内缓存。
+"""
+import hashlib
+
+from flask import request, current_app
+
+# 压缩时 ETag 会附加编码后缀 (见 utils/compression.py)，比较时去掉
+ENCODING_SUFFIXES = ('-gzip', '-br')
+LISTING_CACHE_CONTROL = 'private, no-cache'
+
+
+def _parent_map(cursor):
+    """一次查询载入整棵目录树 {id: parent_id}，避免逐层查询"""
+    cursor.execute("SELECT id, parent_id FROM folders")
+    return {r['id']: r['parent_id'] or 0 for r in cursor.fetchall()}
+
+
+def folder_ancestors(cursor, folder_id, parents=None):
+    """文件夹自身及所有祖先 (含根目录 0)"""
+    if parents is None: parents = _parent_map(cursor)
+    ids, curr = [], int(folder_id)
+    while curr not in ids:
+        ids.append(curr)
+        if curr == 0: break
+        curr = parents.get(curr, 0)
+    return ids
+
+
+def _subtree(parents, folder_id):
+    children = {}
+    for fid, pid in parents.items(): children.setdefault(pid, []).append(fid)
+    seen, stack = set(), [folder_id]
+    while stack:
+        curr = stack.pop()
+        if curr in seen: continue
+        seen.add(curr)
+        stack.extend(children.get(curr, []))
+    return list(seen)
+
+
+def bump_folders(cursor, folder_ids):
+    ids = sorted({int(f) for f in folder_ids})
+    if not ids: return
+    cursor.executemany("INSERT INTO folder_versions (folder_id, version) VALUES (%s, 1) ON DUPLICATE KEY UPDATE version = version + 1", [(f,) for f in ids])
+
+
+def bump_folder_chain(cursor, folder_id, subtree=False):
+    """文件夹及祖先 +1；subtree=True 时连同全部子目录 (文件夹授权会传播到子树内所有文件)"""
+    parents = _parent_map(cursor)
+    ids = folder_ancestors(cursor, folder_id, parents)
+    if subtree: ids += _subtree(parents, int(folder_id))
+    bump_folders(cursor, ids)
+
+
+def bump_contract_folder(cursor, contract_id):
+    cursor.execute("SELECT folder_id FROM contracts WHERE id=%s", (contract_id,))
+    row = cursor.fetchone()
+    if row: bump_folder_chain(cursor, row['folder_id'])
+
+
+def bump_user_acl(cursor, user_ids):
+    ids = sorted({int(u) for u in user_ids})
+    if not ids: return
+    cursor.execute("UPDATE users SET acl_version = acl_version + 1 WHERE id IN %s", (ids,))
+
+
+def listing_etag(cursor, kind, folder_id, user_id, role, shape=''):
+    """shape 为响应的列定义，改列后旧 ETag 自然失效"""
+    cursor.execute(
+        "SELECT (SELECT version FROM folder_versions WHERE folder_id=%s) AS folder_version, "
+        "(SELECT acl_version FROM users WHERE id=%s) AS acl_version", (folder_id, user_id))
+    row = cursor.fetchone() or {}
+    key = '|'.join(str(p) for p in (kind, folder_id, row.get('folder_version') or 0, user_id, role,
+                                     row.get('acl_version') or 0, shape, type(current_app.json).__name__))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+
+def _strip_encoding(tag):
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix): return tag[:-len(suffix)]
+    return tag
+
+
+def not_modified(etag):
+    """If-None-Match 命中时返回 304 响应，否则返回 None"""
+    if not request.if_none_match: return None
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if tag == etag or _strip_encoding(tag) == etag:
+            response = current_app.response_class(status=304)
+            response.set_etag(tag)
+            response.headers['Cache-Control'] = LISTING_CACHE_CONTROL
+            return response
+    return None
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # 允许浏览器保存并在每次使用前带 If-None-Match 重新验证 (覆盖 /api/ 默认的 no-store)
+    response.headers['Cache-Control'] = LISTING_CACHE_CONTROL
+    return response
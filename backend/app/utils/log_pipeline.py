@@ -0,0 +1,215 @@
+# backend/app/utils/log_pipeline.py
+import os
+import re
+import copy
+import glob
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import datetime
+import logging.handlers
+
+from flask import g, request, has_request_context
+
+BEIJING = datetime.timezone(datetime.timedelta(hours=8))
+REQUEST_ID_HEADER = 'X-Request-ID'
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{8,64}$')
+CONTEXT_FIELDS = ('request_id', 'trace_id', 'user_id', 'method', 'route', 'path')
+
+
+class ContextFilter(logging.Filter):
+    """在发起日志的线程上补充请求上下文 (入队之后监听线程已拿不到 flask.g)"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.trace_id = g.get('trace_id')
+            record.user_id = getattr(request, 'current_user_id', None)
+            record.method = request.method
+            # route 为路由模板 (与 metrics / sql_trace 一致，便于聚合)，path 为实际路径
+            record.route = request.url_rule.rule if request.url_rule else request.path
+            record.path = request.path
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一个 JSON 对象，时间为北京时间 ISO 格式"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.datetime.fromtimestamp(record.created, BEIJING).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None: data[key] = value
+        if record.exc_info and not record.exc_text: record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text: data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """开发环境可读格式，保留原 "时间 - 级别 - 消息" 样式并带上 request_id"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    def converter(self, timestamp):
+        return datetime.datetime.fromtimestamp(timestamp, BEIJING).timetuple()
+
+    def format(self, record):
+        if getattr(record, 'request_id', None) is None: record.request_id = '-'
+        return super().format(record)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃并计数，绝不阻塞请求线程"""
+
+    def __init__(self, log_queue, stats):
+        super().__init__(log_queue)
+        self.stats = stats
+
+    def prepare(self, record):
+        # 在请求线程里把消息与异常栈渲染成字符串，保留上下文字段，丢掉不可跨线程的 args / exc_info
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text: record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try: self.queue.put_nowait(record)
+        except queue.Full: self.stats["dropped"] += 1
+
+
+class JsonLineSocketHandler(logging.handlers.SocketHandler):
+    """以换行分隔的 JSON 发往 tools/log_aggregator.py (不用 pickle，聚合端无需信任发送方)"""
+
+    def makePickle(self, record):
+        return (self.format(record) + '\n').encode('utf-8')
+
+
+class LogPipeline:
+    """
+    日志管线：请求线程只做格式化前的准备并入有界队列，文件 / 网络 I/O 由 QueueListener 后台线程完成。
+    - LOG_SINK=file：每个 worker 写自己的 app.<pid>.log (LOG_PER_WORKER=0 时共用 app.log)，
+      按大小 (LOG_ROTATE=size) 或时间 (LOG_ROTATE=time) 轮转，启动时清理超过保留天数的旧文件；
+    - LOG_SINK=socket：发往 LOG_SOCKET 上的聚合进程，由它写单个轮转文件；
+    - LOG_STDOUT=1 时额外输出到控制台 (容器环境 / 聚合进程不可用时兜底)；
+    - 每个请求分配 request_id (沿用上游 X-Request-ID)，下载 / 上传时绑定审计 trace_id，写入每条日志。
+    gunicorn preload 时 fork 后在子进程中重建队列与输出目标。
+    """
+
+    def __init__(self):
+        self.settings = None
+        self.queue = None
+        self.handler = None
+        self.listener = None
+        self.stats = {"dropped": 0}
+        self._fork_hook = False
+
+    def configure(self, settings):
+        """settings 为 Config 类 (应用创建前即可调用)，返回根 logger"""
+        self.settings = settings
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, str(settings.LOG_LEVEL).upper(), logging.INFO))
+        for h in list(root.handlers): root.removeHandler(h)
+        self.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.handler = NonBlockingQueueHandler(self.queue, self.stats)
+        self.handler.addFilter(ContextFilter())
+        root.addHandler(self.handler)
+        self._start()
+        if not self._fork_hook:
+            self._fork_hook = True
+            atexit.register(self.stop)
+            if hasattr(os, 'register_at_fork'): os.register_at_fork(after_in_child=self._after_fork)
+        return root
+
+    def _formatter(self):
+        return TextFormatter() if self.settings.LOG_FORMAT == 'text' else JsonFormatter()
+
+    def _sinks(self):
+        s = self.settings
+        sinks = []
+        if s.LOG_SINK == 'socket':
+            host, _, port = s.LOG_SOCKET.rpartition(':')
+            # 聚合端按行解析 JSON，不受 LOG_FORMAT 影响
+            socket_sink = JsonLineSocketHandler(host or '127.0.0.1', int(port))
+            socket_sink.setFormatter(JsonFormatter())
+            sinks.append(socket_sink)
+        elif s.LOG_SINK == 'file':
+            os.makedirs(s.LOG_DIR, exist_ok=True)
+            self._purge_old(s)
+            name = f"app.{os.getpid()}.log" if s.LOG_PER_WORKER else 'app.log'
+            path = os.path.join(s.LOG_DIR, name)
+            if s.LOG_ROTATE == 'time':
+                sinks.append(logging.handlers.TimedRotatingFileHandler(path, when=s.LOG_ROTATE_WHEN, backupCount=s.LOG_BACKUPS, encoding='utf-8'))
+            else:
+                sinks.append(logging.handlers.RotatingFileHandler(path, maxBytes=s.LOG_MAX_MB * 1024 * 1024, backupCount=s.LOG_BACKUPS, encoding='utf-8'))
+        if s.LOG_STDOUT or not sinks: sinks.append(logging.StreamHandler())
+        for h in sinks:
+            if h.formatter is None: h.setFormatter(self._formatter())
+        return sinks
+
+    @staticmethod
+    def _purge_old(s):
+        # 按 pid 命名的文件在 worker 重启后不再写入，超过保留期删除
+        cutoff = time.time() - s.LOG_RETENTION_DAYS * 86400
+        for path in glob.glob(os.path.join(s.LOG_DIR, 'app.*.log*')):
+            try:
+                if os.path.getmtime(path) < cutoff: os.remove(path)
+            except OSError: pass
+
+    def _start(self):
+        self.listener = logging.handlers.QueueListener(self.queue, *self._sinks(), respect_handler_level=True)
+        self.listener.start()
+
+    def _after_fork(self):
+        # 父进程的监听线程不会被复制到子进程；队列可能在 fork 时被持锁，直接换新的
+        if self.handler is None: return
+        self.queue = queue.Queue(maxsize=self.settings.LOG_QUEUE_SIZE)
+        self.handler.queue = self.queue
+        self._start()
+
+    def stop(self):
+        if self.listener is None: return
+        try: self.listener.stop()
+        except Exception: pass
+        for h in self.listener.handlers:
+            try: h.close()
+            except Exception: pass
+        self.listener = None
+
+    # ---------- 请求关联 ID ----------
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _before_request():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex[:16]
+
+    @staticmethod
+    def _after_request(response):
+        request_id = g.get('request_id')
+        if request_id: response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def snapshot(self):
+        return {"queued": self.queue.qsize() if self.queue else 0, "dropped": self.stats["dropped"]}
+
+
+def bind_trace_id(trace_id):
+    """把审计 trace_id 绑定到当前请求，之后的日志都带上它"""
+    if has_request_context(): g.trace_id = trace_id
+
+
+log_pipeline = LogPipeline()
@@ -0,0 +1,139 @@
+# backend/app/utils/login_guard.py
+import time
+import datetime
+import threading
+from collections import deque
+
+from app.utils.common import get_beijing_time
+
+
+class SlidingWindow:
+    """按 key 记录窗口期内的失败时间戳"""
+
+    def __init__(self, window, max_keys=100000):
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = {}
+
+    def add(self, key, now):
+        q = self._hits.get(key)
+        if q is None:
+            if len(self._hits) >= self.max_keys: self.purge(now)
+            q = self._hits[key] = deque()
+        q.append(now)
+        self._trim(q, now)
+        return len(q)
+
+    def count(self, key, now):
+        q = self._hits.get(key)
+        if not q: return 0
+        self._trim(q, now)
+        return len(q)
+
+    def last(self, key):
+        q = self._hits.get(key)
+        return q[-1] if q else 0
+
+    def reset(self, key):
+        self._hits.pop(key, None)
+
+    def purge(self, now):
+        for k in [k for k, q in self._hits.items() if not q or now - q[-1] > self.window]:
+            del self._hits[k]
+
+    def _trim(self, q, now):
+        while q and now - q[0] > self.window: q.popleft()
+
+
+class LoginGuard:
+    """
+    登录防爆破：失败次数按 用户名 / IP 在内存滑动窗口中计数，
+    只有跨过锁定阈值时才写一次 users.lockout_until，成功登录时仅在库中确有残留状态时才清零。
+    - 用户名：连续失败后按指数退避要求冷却时间 (adaptive delay)，冷却期内的请求直接 429，不进数据库；
+    - IP：同一出口 IP 可能是整个办公网 (NAT) 或未配置 TRUSTED_PROXY_HOPS 时的反向代理，
+      只在窗口内失败数超过较高的 ip_threshold 后限制为每 ip_delay 秒一次尝试，不锁定、不指数增长。
+    计数是进程内的；锁定状态经数据库在多个 worker 间共享。
+    """
+
+    def __init__(self, threshold=5, ip_threshold=100, window=900, lockout_minutes=15, delay_base=1.0, delay_max=30.0, ip_delay=2.0):
+        self.threshold = threshold
+        self.ip_threshold = ip_threshold
+        self.ip_delay = ip_delay
+        self.window = window
+        self.lockout_minutes = lockout_minutes
+        self.delay_base = delay_base
+        self.delay_max = delay_max
+        self._users = SlidingWindow(window)
+        self._ips = SlidingWindow(window)
+        self._locked = {}  # username -> lockout_until (北京时间)
+        self._lock = threading.Lock()
+        self.stats = {"throttled": 0, "locked_rejects": 0, "failures": 0, "db_writes": 0}
+
+    def init_app(self, app):
+        self.threshold = app.config.get('LOGIN_FAIL_THRESHOLD', self.threshold)
+        self.ip_threshold = app.config.get('LOGIN_IP_FAIL_THRESHOLD', self.ip_threshold)
+        self.window = app.config.get('LOGIN_FAIL_WINDOW', self.window)
+        self.lockout_minutes = app.config.get('LOGIN_LOCKOUT_MINUTES', self.lockout_minutes)
+        self.delay_base = app.config.get('LOGIN_DELAY_BASE', self.delay_base)
+        self.delay_max = app.config.get('LOGIN_DELAY_MAX', self.delay_max)
+        self.ip_delay = app.config.get('LOGIN_IP_DELAY', self.ip_delay)
+        self._users = SlidingWindow(self.window)
+        self._ips = SlidingWindow(self.window)
+
+    def _delay(self, counter, key, now):
+        fails = counter.count(key, now)
+        if fails == 0: return 0
+        wait = min(self.delay_base * (2 ** (fails - 1)), self.delay_max)
+        return max(0, counter.last(key) + wait - now)
+
+    def _ip_delay(self, ip, now):
+        if self._ips.count(ip, now) < self.ip_threshold: return 0
+        return max(0, self._ips.last(ip) + self.ip_delay - now)
+
+    def check(self, username, ip):
+        """返回 (state, info)：('locked', lockout_until) / ('throttled', 秒数) / (None, 0)"""
+        now = time.time()
+        with self._lock:
+            until = self._locked.get(username)
+            if until is not None:
+                if until > get_beijing_time():
+                    self.stats["locked_rejects"] += 1
+                    return 'locked', until
+                del self._locked[username]
+            delay = max(self._delay(self._users, username, now), self._ip_delay(ip, now))
+            if delay > 0:
+                self.stats["throttled"] += 1
+                return 'throttled', delay
+        return None, 0
+
+    def mark_locked(self, username, until):
+        """数据库中已处于锁定状态 (例如其他 worker 写入)，同步到内存，后续请求不再查库"""
+        with self._lock: self._locked[username] = until
+
+    def record_failure(self, cursor, user, username, ip):
+        """记录一次失败，返回窗口内失败次数；仅在首次跨过阈值时写库"""
+        now = time.time()
+        with self._lock:
+            fails = self._users.add(username, now)
+            self._ips.add(ip, now)
+            self.stats["failures"] += 1
+            newly_locked = fails >= self.threshold and username not in self._locked
+            if newly_locked:
+                until = get_beijing_time() + datetime.timedelta(minutes=self.lockout_minutes)
+                self._locked[username] = until
+        if newly_locked and user:
+            cursor.execute("UPDATE users SET failed_attempts=%s, lockout_until=%s WHERE id=%s", (fails, until, user['id']))
+            with self._lock: self.stats["db_writes"] += 1
+        return fails
+
+    def record_success(self, cursor, user, username):
+        with self._lock:
+            self._users.reset(username)
+            self._locked.pop(username, None)
+        if user.get('failed_attempts') or user.get('lockout_until'):
+            cursor.execute("UPDATE users SET failed_attempts=0, lockout_until=NULL WHERE id=%s", (user['id'],))
+            with self._lock: self.stats["db_writes"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, locked_users=len(self._locked))
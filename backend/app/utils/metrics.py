@@ -0,0 +1,192 @@
+# backend/app/utils/metrics.py
+import os
+import sys
+import time
+import bisect
+import logging
+import resource
+import ipaddress
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context, Response
+
+# 延迟类直方图桶 (秒)；计数类直方图桶 (次)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_networks(value):
+    """逗号分隔的 IP / CIDR 列表；无法解析的项记日志后忽略"""
+    networks = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item: continue
+        try: networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError: logger.warning(f"Ignoring invalid METRICS_ALLOW entry: {item}")
+    return networks
+
+
+class Histogram:
+    """按标签组合分组的累计直方图 (Prometheus 语义)"""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+
+    def observe(self, value, labels=()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total, n) in sorted(self._series.items()):
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = ',' if base else ''
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                out.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            out.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {n}')
+            out.append(f"{self.name}_sum{{{base}}} {total:.6f}" if base else f"{self.name}_sum {total:.6f}")
+            out.append(f"{self.name}_count{{{base}}} {n}" if base else f"{self.name}_count {n}")
+
+
+def _escape(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    进程内指标 (每个 gunicorn worker 各自一份，Prometheus 需按实例分别抓取)：
+    - 按路由规则 (而非原始 URL，避免标签爆炸) 统计请求延迟，及每个请求的 SQL 条数 / 耗时；
+    - 水印流水线分阶段耗时 (hash / load / convert / embed / overlay / merge / write)；
+    - 进程内存 / CPU / 线程数，以及各组件 snapshot() 暴露的计数器。
+    所有写入只在一把锁内做几次整数累加，对请求延迟的影响可以忽略。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = {}
+        self.started = time.time()
+        self.token = None
+        self.allow = []
+        self.request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency by route',
+                                         label_names=('route', 'method', 'status'))
+        self.request_queries = Histogram('http_request_db_queries', 'SQL statements issued per request',
+                                         COUNT_BUCKETS, label_names=('route',))
+        self.request_db_time = Histogram('http_request_db_seconds', 'Time spent in SQL per request',
+                                         label_names=('route',))
+        self.query_latency = Histogram('db_query_duration_seconds', 'Latency of individual SQL statements')
+        self.stage_latency = Histogram('watermark_stage_seconds', 'Watermark pipeline stage timings',
+                                       label_names=('stage', 'file_type'))
+
+    def init_app(self, app):
+        self.token = app.config.get('METRICS_TOKEN') or None
+        self.allow = parse_networks(app.config.get('METRICS_ALLOW', '127.0.0.1,::1'))
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self._endpoint)
+
+    def register_collector(self, name, fn):
+        """fn() 返回 {指标名: 数值}，抓取时以 app_<name>_<key> gauge 输出"""
+        self._collectors[name] = fn
+
+    # ---------- 记录 ----------
+    def _before_request(self):
+        g._metrics = [time.perf_counter(), 0, 0.0]  # 开始时间, SQL 条数, SQL 耗时
+
+    def _after_request(self, response):
+        state = g.pop('_metrics', None)
+        if state is None: return response
+        elapsed = time.perf_counter() - state[0]
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        with self._lock:
+            self.request_latency.observe(elapsed, (route, request.method, str(response.status_code)))
+            self.request_queries.observe(state[1], (route,))
+            self.request_db_time.observe(state[2], (route,))
+        return response
+
+    def record_query(self, elapsed):
+        """由 db.InstrumentedCursor 在每条 SQL 执行后调用"""
+        if has_request_context():
+            state = g.get('_metrics')
+            if state is not None:
+                state[1] += 1
+                state[2] += elapsed
+        with self._lock: self.query_latency.observe(elapsed)
+
+    def observe_stage(self, stage, elapsed, file_type=''):
+        with self._lock: self.stage_latency.observe(elapsed, (stage, file_type))
+
+    @contextmanager
+    def stage(self, stage, file_type=''):
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe_stage(stage, time.perf_counter() - start, file_type)
+
+    # ---------- 输出 ----------
+    def _process_lines(self, out):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss: Linux 为 KB，macOS 为字节
+        max_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        rss = None
+        try:
+            with open('/proc/self/statm') as f: rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError): pass
+        gauges = [
+            ('process_resident_memory_bytes', 'Resident memory size', rss),
+            ('process_max_resident_memory_bytes', 'Peak resident memory size', max_rss),
+            ('process_cpu_seconds_total', 'User + system CPU time', usage.ru_utime + usage.ru_stime),
+            ('process_threads', 'Live Python threads', threading.active_count()),
+            ('process_start_time_seconds', 'Process start time (unix)', self.started),
+        ]
+        for name, help_text, value in gauges:
+            if value is None: continue
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            out.append(f"{name} {value}")
+
+    def render(self):
+        out = []
+        with self._lock:
+            for h in (self.request_latency, self.request_queries, self.request_db_time, self.query_latency, self.stage_latency):
+                h.render(out)
+        self._process_lines(out)
+        for name, fn in self._collectors.items():
+            try: values = fn() or {}
+            except Exception: continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)): continue
+                out.append(f"# TYPE app_{name}_{key} gauge")
+                out.append(f"app_{name}_{key} {value}")
+        return '\n'.join(out) + '\n'
+
+    def _allowed_address(self):
+        # 经反向代理转发的请求来源地址是代理本身，不按地址放行
+        if request.headers.get('X-Forwarded-For'): return False
+        try: addr = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError: return False
+        return any(addr in net for net in self.allow)
+
+    def _endpoint(self):
+        # 配置了 METRICS_TOKEN 时要求 Bearer 认证；未配置时只允许 METRICS_ALLOW 中的地址直连
+        if self.token:
+            if request.headers.get('Authorization') != f"Bearer {self.token}":
+                return Response("Unauthorized\n", status=401, mimetype='text/plain')
+        elif not self._allowed_address():
+            return Response("Forbidden\n", status=403, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+metrics = Metrics()
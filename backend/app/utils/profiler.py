@@ -0,0 +1,310 @@
+# backend/app/utils/profiler.py
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from contextlib import ContextDecorator
+from functools import lru_cache
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 线程阻塞等待时的叶子帧 (空闲的线程池 / 后台线程)，整进程采样时默认丢弃
+IDLE_LEAVES = {('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('selectors.py', 'select'),
+               ('queue.py', 'get'), ('socket.py', 'accept'), ('socketserver.py', 'serve_forever')}
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+@lru_cache(maxsize=8192)
+def _frame_label(code):
+    """func (文件:定义行)，项目内文件用相对路径，第三方库只保留包内路径"""
+    path = code.co_filename
+    if path.startswith(BACKEND_DIR): path = os.path.relpath(path, BACKEND_DIR)
+    elif 'site-packages' in path: path = path.split('site-packages' + os.sep, 1)[1]
+    else: path = os.path.basename(path)
+    # ; 是折叠栈的分隔符，空格保留 (flamegraph.pl / speedscope 以最后一个空格分隔计数)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ',')
+
+
+class _Session:
+    def __init__(self, kind, threads=None, seconds=None, include_idle=False, meta=None):
+        self.id = f"{time.strftime('%Y%m%d_%H%M%S')}_{kind}_{uuid.uuid4().hex[:8]}"
+        self.kind = kind
+        self.threads = threads  # None 表示整进程
+        self.include_idle = include_idle
+        self.started = time.time()
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.meta = meta or {}
+        self.samples = 0
+        self.stacks = {}
+
+
+class _Tag(ContextDecorator):
+    """把当前线程之后的采样归到 tag:<name> 下；状态存在 profiler 的按线程字典里，同一实例可被多线程复用"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = f"tag:{name}"
+
+    def __enter__(self):
+        self.profiler._tags.setdefault(threading.get_ident(), []).append(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        ident = threading.get_ident()
+        stack = self.profiler._tags.get(ident)
+        if stack: stack.pop()
+        # 栈空时删除条目，否则每个用过 tag 的线程 (线程池换线程、请求线程退出) 都会留下一项
+        if not stack: self.profiler._tags.pop(ident, None)
+        return False
+
+
+class _Carried:
+    """在另一线程中恢复 capture() 时的 tag 栈，并把该线程加入捕获线程所在的单请求采样会话"""
+
+    def __init__(self, profiler, parent, tags):
+        self.profiler = profiler
+        self.parent = parent
+        self.tags = tags
+        self._sessions = []
+
+    def __enter__(self):
+        ident = threading.get_ident()
+        if self.tags: self.profiler._tags[ident] = list(self.tags) + self.profiler._tags.get(ident, [])
+        with self.profiler._lock:
+            for s in self.profiler._sessions.values():
+                if s.threads and self.parent in s.threads and ident not in s.threads:
+                    s.threads = s.threads + (ident,)
+                    self._sessions.append(s)
+        return self
+
+    def __exit__(self, *exc):
+        ident = threading.get_ident()
+        with self.profiler._lock:
+            for s in self._sessions: s.threads = tuple(t for t in s.threads if t != ident)
+        self._sessions = []
+        stack = self.profiler._tags.get(ident)
+        if stack is not None and self.tags:
+            del stack[:len(self.tags)]
+            if not stack: self.profiler._tags.pop(ident, None)
+        return False
+
+
+class SamplingProfiler:
+    """
+    进程内采样分析器 (只依赖 sys._current_frames，未开启时除 tag 的一次 list append/pop 外无开销)：
+    - 管理员触发：对当前 worker 的所有线程采样 N 秒；
+    - 单请求：携带管理员签发的 X-Profile-Token 头的请求只对处理该请求的线程采样，
+      响应头 X-Profile-Id 返回结果编号；
+    - 结果为 flamegraph.pl / speedscope 可直接读取的折叠栈 (collapsed stacks)，
+      保存在 PROFILE_FOLDER 下，任一 worker 都能读取；
+    - tag(name) 可作装饰器 / with 语句，采样栈以 tag:<name> 开头，便于按热点路径聚合；
+      提交到线程池的任务用 capture() 带上提交线程的 tag 与单请求采样会话。
+    gunicorn 多 worker 时，管理员触发的采样只覆盖收到该请求的 worker。
+    """
+
+    def __init__(self, interval_ms=10, max_seconds=120, keep=50):
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.folder = None
+        self.secret = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._thread = None
+        self._tags = {}
+        self.stats = {"sessions": 0, "request_sessions": 0, "samples": 0, "rejected_tokens": 0}
+
+    def init_app(self, app):
+        self.interval = app.config.get('PROFILE_INTERVAL_MS', self.interval * 1000) / 1000.0
+        self.max_seconds = app.config.get('PROFILE_MAX_SECONDS', self.max_seconds)
+        self.folder = app.config.get('PROFILE_FOLDER')
+        self.secret = app.config['SECRET_KEY']
+        if self.folder: os.makedirs(self.folder, exist_ok=True)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def tag(self, name):
+        return _Tag(self, name)
+
+    def capture(self):
+        """在提交线程中调用，返回的对象在任务线程中用 with 恢复 tag 与单请求采样"""
+        parent = threading.get_ident()
+        return _Carried(self, parent, tuple(self._tags.get(parent, ())))
+
+    # ---------- 会话 ----------
+    def start(self, seconds, include_idle=False, meta=None):
+        """管理员触发的整进程采样，返回结果编号；同一 worker 同时只允许一个"""
+        seconds = max(1, min(int(seconds), self.max_seconds))
+        with self._lock:
+            if any(s.threads is None for s in self._sessions.values()): raise ProfilerBusyError()
+            session = _Session('process', seconds=seconds, include_idle=include_idle, meta=meta)
+            self._add(session)
+        self._save(session, running=True)
+        return session.id
+
+    def _add(self, session):
+        # 调用方持有 self._lock
+        self._sessions[session.id] = session
+        self.stats["sessions"] += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def _finish(self, session_id, **meta):
+        with self._lock: session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.meta.update(meta)
+            self._save(session)
+        return session
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._thread = None
+                    return
+            now = time.monotonic()
+            frames = sys._current_frames()
+            for s in sessions:
+                if s.deadline and now >= s.deadline:
+                    self._finish(s.id)
+                    continue
+                for ident in (s.threads or frames.keys()):
+                    if ident == me: continue
+                    frame = frames.get(ident)
+                    if frame is None: continue
+                    stack = self._collapse(ident, frame, s.include_idle)
+                    if stack is None: continue
+                    s.stacks[stack] = s.stacks.get(stack, 0) + 1
+                    s.samples += 1
+            del frames
+            self.stats["samples"] += 1
+            time.sleep(self.interval)
+
+    def _collapse(self, ident, frame, include_idle):
+        code = frame.f_code
+        if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES: return None
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        tags = self._tags.get(ident)
+        if tags:
+            # 递归函数 (如 delete_folder_recursive) 的重复 tag 只保留一层
+            prefix = [t for i, t in enumerate(tags) if i == 0 or t != tags[i - 1]]
+            labels = prefix + labels
+        return ';'.join(labels)
+
+    # ---------- 单请求 ----------
+    def make_token(self, ttl_seconds):
+        """签发单请求采样令牌 (到期时间 + HMAC)，放在 X-Profile-Token 头中"""
+        expires = int(time.time()) + int(ttl_seconds)
+        return f"{expires}.{self._sign(expires)}"
+
+    def _sign(self, expires):
+        return hmac.new(self.secret.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _valid_token(self, token):
+        try: expires, sig = token.split('.', 1)
+        except ValueError: return False
+        if not expires.isdigit() or int(expires) < time.time(): return False
+        return hmac.compare_digest(sig.encode('latin-1'), self._sign(int(expires)).encode())
+
+    def _before_request(self):
+        token = request.headers.get(PROFILE_HEADER)
+        if not token: return
+        if not self._valid_token(token):
+            self.stats["rejected_tokens"] += 1
+            return
+        session = _Session('request', threads=(threading.get_ident(),), seconds=self.max_seconds,
+                           include_idle=True, meta={"method": request.method, "path": request.path})
+        with self._lock:
+            self._add(session)
+            self.stats["request_sessions"] += 1
+        g._profile_id = session.id
+
+    def _after_request(self, response):
+        session_id = g.pop('_profile_id', None)
+        if session_id is None: return response
+        session = self._finish(session_id, status=response.status_code)
+        if session is not None: response.headers['X-Profile-Id'] = session.id
+        return response
+
+    def _teardown_request(self, exc):
+        # 视图抛异常时 after_request 不执行，这里兜底结束采样
+        session_id = g.pop('_profile_id', None)
+        if session_id is not None: self._finish(session_id)
+
+    # ---------- 结果 ----------
+    def _path(self, session_id):
+        if not self.folder or not session_id.replace('_', '').isalnum(): return None
+        return os.path.join(self.folder, f"{session_id}.json")
+
+    def _save(self, session, running=False):
+        path = self._path(session.id)
+        if path is None: return
+        data = {
+            "id": session.id, "kind": session.kind, "running": running, "started": session.started,
+            "duration": round(time.time() - session.started, 3), "samples": session.samples,
+            "interval_ms": round(self.interval * 1000, 1), "meta": session.meta,
+            "stacks": {} if running else session.stacks,
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Failed to save profile {session.id}: {e}")
+            return
+        if not running: self._prune()
+
+    def _prune(self):
+        try:
+            files = sorted((f for f in os.listdir(self.folder) if f.endswith('.json')), reverse=True)
+            for name in files[self.keep:]: os.remove(os.path.join(self.folder, name))
+        except OSError: pass
+
+    def load(self, session_id):
+        path = self._path(session_id)
+        if path is None or not os.path.exists(path): return None
+        with open(path, encoding='utf-8') as f: return json.load(f)
+
+    def list_profiles(self):
+        if not self.folder or not os.path.isdir(self.folder): return []
+        result = []
+        for name in sorted(os.listdir(self.folder), reverse=True):
+            if not name.endswith('.json'): continue
+            data = self.load(name[:-5])
+            if data:
+                data.pop('stacks', None)
+                result.append(data)
+        return result
+
+    @staticmethod
+    def collapsed(data):
+        """折叠栈文本：每行 "frame;frame;... count"，按次数降序"""
+        return ''.join(f"{stack} {n}\n" for stack, n in sorted(data['stacks'].items(), key=lambda kv: -kv[1]))
+
+    def snapshot(self):
+        with self._lock: active = len(self._sessions)
+        return dict(self.stats, active=active)
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,121 @@
+# backend/app/utils/sql_trace.py
+import re
+import json
+import time
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+
+from flask import g, request, has_request_context
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r'\s+')
+_PLACEHOLDER_LIST_RE = re.compile(r'%s(\s*,\s*%s)+')
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+\b")
+
+
+@lru_cache(maxsize=4096)
+def statement_shape(query):
+    """语句"形状"：压缩空白、字面量替换为 ?、IN 列表折叠，同一处代码反复执行得到同一形状"""
+    shape = _WS_RE.sub(' ', query).strip()
+    shape = _LITERAL_RE.sub('?', shape)
+    return _PLACEHOLDER_LIST_RE.sub('%s…', shape)
+
+
+def redact(args):
+    """只保留参数类型与长度，不记录取值 (密码、TraceID、邮箱等)"""
+    if args is None: return None
+    if isinstance(args, dict): return {k: redact(v) for k, v in args.items()}
+    if isinstance(args, (list, tuple)):
+        if len(args) > 20: return [redact(a) for a in args[:20]] + [f"<+{len(args) - 20} more>"]
+        return [redact(a) for a in args]
+    if isinstance(args, (str, bytes)): return f"<{type(args).__name__}:{len(args)}>"
+    return f"<{type(args).__name__}>"
+
+
+class SqlTracer:
+    """
+    逐请求 SQL 追踪 (由 db.InstrumentedCursor 喂数据)：
+    - 每个请求按语句形状计数；同一形状超过 n_plus_one 次视为 N+1，整请求记录一条结构化日志；
+    - 单条超过 slow_ms 的语句进入慢查询环形缓冲，参数只保留类型 / 长度；
+    - 最近的慢查询与 N+1 请求通过 /api/admin/sql/trace 查看。
+    """
+
+    def __init__(self, slow_ms=200, n_plus_one=10, buffer_size=200):
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self._lock = threading.Lock()
+        self.slow = deque(maxlen=buffer_size)
+        self.flagged = deque(maxlen=buffer_size)
+        self.stats = {"statements": 0, "slow": 0, "flagged_requests": 0}
+
+    def init_app(self, app):
+        self.slow_ms = app.config.get('SQL_SLOW_MS', self.slow_ms)
+        self.n_plus_one = app.config.get('SQL_N_PLUS_ONE', self.n_plus_one)
+        size = app.config.get('SQL_TRACE_BUFFER', self.slow.maxlen)
+        self.slow = deque(maxlen=size)
+        self.flagged = deque(maxlen=size)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g._sql_trace = {}
+
+    def record(self, query, args, elapsed):
+        shape = statement_shape(query if isinstance(query, str) else query.decode('utf-8', 'replace'))
+        route = None
+        if has_request_context():
+            trace = g.get('_sql_trace')
+            if trace is not None:
+                entry = trace.get(shape)
+                if entry is None: trace[shape] = [1, elapsed]
+                else:
+                    entry[0] += 1
+                    entry[1] += elapsed
+            route = request.url_rule.rule if request.url_rule else request.path
+        with self._lock: self.stats["statements"] += 1
+        if elapsed * 1000 < self.slow_ms: return
+
+        item = {"at": time.time(), "ms": round(elapsed * 1000, 1), "route": route, "sql": shape, "params": redact(args)}
+        with self._lock:
+            self.slow.append(item)
+            self.stats["slow"] += 1
+        logger.warning(json.dumps(dict(item, event="sql_slow"), ensure_ascii=False, default=str))
+
+    def _after_request(self, response):
+        trace = g.pop('_sql_trace', None)
+        if not trace: return response
+        repeated = [{"sql": s, "count": c, "ms": round(t * 1000, 1)} for s, (c, t) in trace.items() if c > self.n_plus_one]
+        if repeated:
+            item = {
+                "at": time.time(),
+                "route": request.url_rule.rule if request.url_rule else request.path,
+                "method": request.method,
+                "statements": sum(c for c, _ in trace.values()),
+                "db_ms": round(sum(t for _, t in trace.values()) * 1000, 1),
+                "repeated": sorted(repeated, key=lambda r: -r['count']),
+            }
+            with self._lock:
+                self.flagged.append(item)
+                self.stats["flagged_requests"] += 1
+            logger.warning(json.dumps(dict(item, event="sql_n_plus_one"), ensure_ascii=False, default=str))
+        return response
+
+    def report(self, limit=50):
+        with self._lock:
+            return {
+                "config": {"slow_ms": self.slow_ms, "n_plus_one": self.n_plus_one},
+                "stats": dict(self.stats),
+                "slow": list(self.slow)[-limit:][::-1],
+                "n_plus_one": list(self.flagged)[-limit:][::-1],
+            }
+
+    def clear(self):
+        with self._lock:
+            self.slow.clear()
+            self.flagged.clear()
+
+
+sql_tracer = SqlTracer()
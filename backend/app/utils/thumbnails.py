@@ -0,0 +1,187 @@
+# backend/app/utils/thumbnails.py
+import io
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.utils.watermark import WatermarkEngine
+from app.utils.disk_cache import DiskLRU
+
+# PDF 栅格化依赖 PyMuPDF，可选
+try:
+    import fitz
+    HAS_RASTERIZER = True
+except ImportError:
+    HAS_RASTERIZER = False
+
+logger = logging.getLogger(__name__)
+
+# 不同用途的目标宽度 (像素)
+SIZES = {'thumb': 240, 'preview': 1024}
+
+
+class ThumbnailService:
+    """
+    页面缩略图 / 栅格预览：
+    - 每页的"底图" (无水印 PNG) 在上传时由线程池预生成 (或首次请求时懒生成)，
+      缓存在 preview_cache/thumbs/<源文件> 下，总大小超限时按最近访问时间淘汰，合同删除 / 替换时 purge()。
+    - 返回给用户前再把水印烧进底图；水印层按 (文字, 尺寸) 在内存中缓存。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, workers=2, pregenerate_pages=1):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.pregenerate_pages = pregenerate_pages
+        self.cache_dir = None
+        self._app = None
+        self._executor = None
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._cache = None
+        self._overlays = OrderedDict()
+
+    def init_app(self, app):
+        self._app = app
+        self.cache_dir = os.path.join(app.config['PREVIEW_CACHE_FOLDER'], 'thumbs')
+        self.max_bytes = app.config.get('THUMB_CACHE_MAX_MB', 512) * 1024 * 1024
+        self.workers = app.config.get('THUMB_WORKERS', self.workers)
+        self.pregenerate_pages = app.config.get('THUMB_PREGENERATE_PAGES', self.pregenerate_pages)
+        self._cache = None
+
+    @property
+    def cache(self):
+        if self._cache is None: self._cache = DiskLRU(self.cache_dir, self.max_bytes)
+        return self._cache
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbs")
+        return self._executor
+
+    # ---------- 底图 ----------
+    def _base_path(self, file_path, page, size):
+        st = os.stat(file_path)
+        key = hashlib.sha1(f"{file_path}:{st.st_mtime_ns}:{st.st_size}:{page}:{size}".encode()).hexdigest()
+        return os.path.join(self.cache.entry_dir(file_path), f"{key}.png")
+
+    def _source_pdf_path(self, file_path, file_type):
+        if file_type == 'pdf': return file_path
+        # Office 文件复用分页预览的转换缓存
+        WatermarkEngine.convert_office_to_pdf(file_path, file_type)
+        return WatermarkEngine.converted_cache_path(file_path)
+
+    def _render_base(self, file_path, file_type, page, size):
+        width = SIZES[size]
+        if file_type in ['png', 'jpg', 'jpeg']:
+            if page != 1: return None
+            img = Image.open(file_path)
+            img.draft('RGB', (width, width * 4))  # JPEG 可直接按比例解码，省去全尺寸解码
+            img = img.convert('RGB')
+            img.thumbnail((width, width * 4))
+            return img
+        if not HAS_RASTERIZER: return None
+        doc = fitz.open(self._source_pdf_path(file_path, file_type))
+        try:
+            if page > doc.page_count: return None
+            pdf_page = doc.load_page(page - 1)
+            zoom = width / float(pdf_page.rect.width or width)
+            pix = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        finally: doc.close()
+
+    def get_base(self, file_path, file_type, page=1, size='thumb'):
+        """返回底图缓存文件路径；无法生成时返回 None"""
+        path = self._base_path(file_path, page, size)
+        if os.path.exists(path):
+            self.cache.touch(path)  # 刷新访问时间，供 LRU 淘汰参考
+            return path
+
+        # 同一底图只生成一次，其他请求等待结果
+        with self._lock: key_lock = self._key_locks.setdefault(path, threading.Lock())
+        try:
+            with key_lock:
+                if not os.path.exists(path):
+                    img = self._render_base(file_path, file_type, page, size)
+                    if img is None: return None
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{threading.get_ident()}.tmp"
+                    img.save(tmp, format='PNG', optimize=True)
+                    os.replace(tmp, path)
+                    self.cache.added(path)
+        finally:
+            # 无法生成 / 渲染异常时同样释放，避免每个路径残留一把锁
+            with self._lock: self._key_locks.pop(path, None)
+        return path
+
+    def purge(self, file_path):
+        """删除某个合同的全部底图 (合同删除 / 替换时调用)"""
+        if self.cache_dir: self.cache.purge(file_path)
+
+    def schedule(self, file_path, file_type):
+        """上传后异步预生成前几页缩略图"""
+        if self._app is None: return
+
+        def job():
+            with self._app.app_context():
+                for page in range(1, self.pregenerate_pages + 1):
+                    try:
+                        if not self.get_base(file_path, file_type, page, 'thumb'): break
+                    except Exception as e:
+                        logger.warning(f"Thumbnail pregeneration failed for {file_path}: {e}")
+                        break
+        self.executor.submit(job)
+
+    # ---------- 水印 ----------
+    def _overlay(self, text, size):
+        key = (text, size)
+        with self._lock:
+            layer = self._overlays.get(key)
+            if layer is not None:
+                self._overlays.move_to_end(key)
+                return layer
+
+        layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        font_size = max(10, size[0] // 24)
+        font = _load_font(font_size)
+        tile = Image.new('RGBA', (font_size * 16, font_size * 6), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(tile)
+        for i, line in enumerate(text.split(' - ')):
+            draw.text((font_size, font_size + i * int(font_size * 1.3)), line, font=font, fill=(128, 128, 128, 60))
+        tile = tile.rotate(20, expand=True)
+        for x in range(0, size[0], tile.width):
+            for y in range(0, size[1], tile.height):
+                layer.alpha_composite(tile, (x, y))
+
+        with self._lock:
+            self._overlays[key] = layer
+            while len(self._overlays) > 256: self._overlays.popitem(last=False)
+        return layer
+
+    def render(self, base_path, watermark_text=None, fmt='JPEG'):
+        """读取底图并烧入水印，返回图片字节流"""
+        img = Image.open(base_path).convert('RGB')
+        if watermark_text:
+            img = img.convert('RGBA')
+            img.alpha_composite(self._overlay(watermark_text, img.size))
+            img = img.convert('RGB')
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=80)
+        out.seek(0)
+        return out
+
+
+def _load_font(size):
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for path in [os.path.join(base_dir, 'SimHei.ttf'), 'SimHei.ttf', 'simhei.ttf']:
+        if os.path.exists(path):
+            try: return ImageFont.truetype(path, size)
+            except OSError: pass
+    return ImageFont.load_default()
@@ -0,0 +1,159 @@
+# backend/app/utils/token_guard.py
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+# 数据库中不存在的 user_id 短暂缓存 (秒)，避免每个请求都回源；下次全量同步时清空
+MISSING_USER_TTL = 5
+
+
+class TokenGuard:
+    """
+    JWT 校验快速通道 + 吊销机制：
+    - 每个用户有一个 token_epoch (存于 users 表)，签发 JWT 时写入 'ep' 声明；
+      禁用、重置密码、调整分组时 epoch +1，旧 token 立即失效。
+    - 内存中维护 {user_id: (epoch, is_active)}，后台线程定期从数据库同步 (按 epoch 取较大者合并，
+      不会被同步开始前读到的旧快照覆盖)，请求路径上不访问数据库。
+    - bump() 只在事务中写 epoch，调用方提交后再用 apply() 更新本进程内存，回滚时内存不受影响。
+    - 已验签的 token 放入 LRU，同一个 Bearer token 重复请求时跳过 HMAC 计算。
+    """
+
+    def __init__(self, sync_interval=10, cache_size=4096):
+        self.sync_interval = sync_interval
+        self.cache_size = cache_size
+        self._app = None
+        self._states = {}  # user_id -> (epoch, is_active)
+        self._missing = {}  # user_id -> 过期时间
+        self._decoded = OrderedDict()  # token -> payload
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._synced_at = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.sync_interval = app.config.get('TOKEN_EPOCH_SYNC_INTERVAL', self.sync_interval)
+        self.cache_size = app.config.get('TOKEN_CACHE_SIZE', self.cache_size)
+
+    # ---------- 验签 (带 LRU) ----------
+    def decode(self, token, secret_key):
+        """返回 payload；签名无效或过期时抛出 jwt.InvalidTokenError"""
+        with self._lock:
+            payload = self._decoded.get(token)
+            if payload is not None: self._decoded.move_to_end(token)
+        if payload is not None:
+            if payload.get('exp') and payload['exp'] < time.time():
+                with self._lock: self._decoded.pop(token, None)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            return payload
+
+        payload = jwt.decode(token, secret_key, algorithms=["HS256"])
+        with self._lock:
+            self._decoded[token] = payload
+            while len(self._decoded) > self.cache_size: self._decoded.popitem(last=False)
+        return payload
+
+    # ---------- 吊销检查 ----------
+    def is_current(self, payload):
+        """token 的 epoch 与用户当前 epoch 一致且账号未禁用"""
+        self._ensure_worker()
+        uid = payload.get('user_id')
+        state = self._states.get(uid)
+        if state is None:
+            # 同步之后新建的用户：单次回源并缓存；不存在的用户短暂记为缺失
+            if self._missing.get(uid, 0) > time.time(): return False
+            state = self._load_user(uid)
+            if state is None: return False
+        epoch, is_active = state
+        return bool(is_active) and (payload.get('ep') or 0) >= epoch
+
+    def bump(self, cursor, user_id, is_active=None):
+        """
+        在当前事务中将用户 epoch +1，返回待生效的状态；调用方 commit 之后交给 apply() 更新本进程内存，
+        其他进程在下次同步时生效
+        """
+        cursor.execute("UPDATE users SET token_epoch = token_epoch + 1 WHERE id=%s", (user_id,))
+        cursor.execute("SELECT token_epoch, is_active FROM users WHERE id=%s", (user_id,))
+        row = cursor.fetchone()
+        if not row: return None
+        active = row['is_active'] if is_active is None else is_active
+        return int(user_id), row['token_epoch'] or 0, bool(active)
+
+    def apply(self, *bumps):
+        """事务提交后应用 bump() 的结果"""
+        with self._lock:
+            for bumped in bumps:
+                if bumped is None: continue
+                uid, epoch, active = bumped
+                self._states[uid] = (epoch, active)
+                # 同一用户的已解码 token 也一并清掉
+                stale = [t for t, p in self._decoded.items() if p.get('user_id') == uid]
+                for t in stale: del self._decoded[t]
+
+    # ---------- 后台同步 ----------
+    def _load_user(self, uid):
+        if self._app is None or uid is None: return None
+        from app.db import get_db_connection
+        try:
+            with self._app.app_context():
+                conn = get_db_connection()
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT token_epoch, is_active FROM users WHERE id=%s", (uid,))
+                        row = cursor.fetchone()
+                finally: conn.close()
+        except Exception as e:
+            logger.error(f"Token epoch lookup failed: {e}")
+            return None
+        if not row:
+            with self._lock: self._missing[uid] = time.time() + MISSING_USER_TTL
+            return None
+        state = (row['token_epoch'] or 0, bool(row['is_active']))
+        with self._lock:
+            # 期间已经 apply 了更新的 epoch 时保留内存中的值
+            current = self._states.get(uid)
+            if current is None or current[0] <= state[0]: self._states[uid] = state
+            else: state = current
+        return state
+
+    def sync(self):
+        from app.db import get_db_connection
+        with self._app.app_context():
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id, token_epoch, is_active FROM users")
+                    rows = cursor.fetchall()
+            finally: conn.close()
+        states = {r['id']: (r['token_epoch'] or 0, bool(r['is_active'])) for r in rows}
+        with self._lock:
+            # 查询期间本进程 apply 的更新 epoch 更大，不能被旧快照覆盖；数据库中已删除的用户随之移除
+            for uid, state in states.items():
+                current = self._states.get(uid)
+                if current is not None and current[0] > state[0]: states[uid] = current
+            self._states = states
+            self._missing = {}
+        self._synced_at = time.time()
+
+    def _run(self):
+        while True:
+            try: self.sync()
+            except Exception as e: logger.error(f"Token epoch sync failed: {e}")
+            time.sleep(self.sync_interval)
+
+    def _ensure_worker(self):
+        if self._app is None: return
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name="token-epoch-sync", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
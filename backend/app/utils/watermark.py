@@ -2,31 +2,101 @@ import io
 import os
 import time
 import uuid
+import hashlib
+import datetime
+import tempfile
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import docx
 import openpyxl
 from PIL import Image
 from pypdf import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.lib.colors import Color
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import simpleSplit
-from flask import current_app
+from flask import current_app, has_app_context
 
-# 尝试导入隐形水印库
+from app.utils.metrics import metrics
+from app.utils.profiler import profiler
+from app.utils.disk_cache import DiskLRU
+
+# 图片盲水印依赖 OpenCV + NumPy (编解码见 blind_watermark.py)
 try:
-    from invisible_watermark import DwtDctSvdProcessor, embed_msg
     import cv2
-    import numpy as np
+    from app.utils import blind_watermark
     HAS_INVISIBLE_WATERMARK = True
 except ImportError:
     HAS_INVISIBLE_WATERMARK = False
 
+logger = logging.getLogger(__name__)
+
+_embed_executor = None
+_embed_executor_lock = threading.Lock()
+_convert_caches = {}  # CONVERT_CACHE_FOLDER -> DiskLRU
+
+def _cfg(key, default):
+    try: return current_app.config.get(key, default)
+    except RuntimeError: return default
+
+def _get_convert_cache():
+    """Office 转换缓存 (总大小受 CONVERT_CACHE_MAX_MB 限制)，未配置缓存目录时返回 None"""
+    cache_dir = _cfg('CONVERT_CACHE_FOLDER', None)
+    if not cache_dir: return None
+    cache = _convert_caches.get(cache_dir)
+    if cache is None:
+        cache = _convert_caches.setdefault(cache_dir, DiskLRU(cache_dir, _cfg('CONVERT_CACHE_MAX_MB', 2048) * 1024 * 1024))
+    return cache
+
+@lru_cache(maxsize=65536)
+def _string_width(text, font_name, font_size):
+    """字符串宽度测量缓存 (表格渲染中同样的单元格文本大量重复)"""
+    return pdfmetrics.stringWidth(text, font_name, font_size)
+
+def _fit_text(text, max_w, font_name, font_size):
+    """截断到列宽内，超出部分以 … 结尾"""
+    # 任何字符宽度都不超过 1em，短文本无需测量
+    if len(text) * font_size <= max_w or _string_width(text, font_name, font_size) <= max_w: return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _string_width(text[:mid] + '…', font_name, font_size) <= max_w: lo = mid
+        else: hi = mid - 1
+    return text[:lo] + '…' if lo else ''
+
+def _get_embed_executor():
+    """图片盲水印在独立线程池中执行，限制同时进行的 CPU 密集任务数"""
+    global _embed_executor
+    if _embed_executor is None:
+        with _embed_executor_lock:
+            if _embed_executor is None:
+                workers = _cfg('WATERMARK_WORKERS', os.cpu_count() or 2)
+                _embed_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wm-embed")
+    return _embed_executor
+
+def _submit_embed(fn, *args):
+    """
+    提交到嵌入线程池；池中线程没有应用上下文，带上当前 app，任务内读取的配置与请求线程一致；
+    同时带上请求线程的 profiler tag 与单请求采样，嵌入耗时计入该请求的火焰图
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+    carried = profiler.capture()
+    def run():
+        with carried:
+            if app is None: return fn(*args)
+            with app.app_context(): return fn(*args)
+    return _get_embed_executor().submit(run)
+
 class WatermarkEngine:
     @staticmethod
     def register_chinese_font():
         """注册中文字体，确保解决乱码"""
+        # 已注册过则直接复用，避免每次重新解析 TTF
+        if 'CustomChinese' in pdfmetrics.getRegisteredFontNames(): return 'CustomChinese'
         # 🟢 修复：准确寻找 backend 根目录下的 SimHei.ttf
         # current_app.root_path 通常指向 app/ 文件夹，所以要往上一级找
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -79,58 +149,275 @@ class WatermarkEngine:
         return PdfReader(packet)
     
     @staticmethod
+    def converted_cache_path(file_path):
+        """Office 转换结果的缓存路径 (源文件所属子目录下，以路径 + mtime + 大小为键)，无缓存目录时返回 None"""
+        cache = _get_convert_cache()
+        if cache is None: return None
+        st = os.stat(file_path)
+        key = hashlib.sha1(f"{file_path}:{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()
+        return os.path.join(cache.entry_dir(file_path), f"{key}.pdf")
+
+    @staticmethod
+    def purge_converted(file_path):
+        """合同删除 / 替换时删除其转换缓存 (完整的未加水印副本)"""
+        cache = _get_convert_cache()
+        if cache is not None: cache.purge(file_path)
+
+    @staticmethod
+    @profiler.tag('watermark.convert_office_to_pdf')
     def convert_office_to_pdf(file_path, file_type):
-        packet = io.BytesIO()
-        c = canvas.Canvas(packet, pagesize=A4)
-        width, height = A4
-        font_name = WatermarkEngine.register_chinese_font()
-        c.setFont(font_name, 10)
-        text_lines = []
+        """转换为 PDF，结果落盘缓存；分页预览 / 重复下载直接读取缓存文件"""
+        cache_path = None
+        try: cache_path = WatermarkEngine.converted_cache_path(file_path)
+        except OSError: pass
+        if cache_path is None:
+            # 无缓存目录时写入 SpooledTemporaryFile，超过阈值自动落到临时文件
+            packet = tempfile.SpooledTemporaryFile(max_size=_cfg('OFFICE_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+            with metrics.stage('convert', file_type): WatermarkEngine.render_office_pdf(file_path, file_type, packet)
+            packet.seek(0)
+            return PdfReader(packet)
+
+        cache = _get_convert_cache()
+        if os.path.exists(cache_path): cache.touch(cache_path)
+        else:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f, metrics.stage('convert', file_type): WatermarkEngine.render_office_pdf(file_path, file_type, f)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+            cache.added(cache_path)
+        return PdfReader(cache_path)
+
+    @staticmethod
+    def iter_office_lines(file_path, file_type, max_rows=None):
+        """惰性逐行读取 docx 段落 / xlsx 行，超过 max_rows 时输出截断提示后停止"""
+        count = 0
+        wb = None
         try:
             if file_type == 'docx':
                 doc = docx.Document(file_path)
                 for para in doc.paragraphs:
-                    if para.text.strip(): text_lines.append(para.text)
+                    if not para.text.strip(): continue
+                    count += 1
+                    if max_rows and count > max_rows:
+                        yield f"...... 内容过长，仅显示前 {max_rows} 段 ......"
+                        return
+                    yield para.text
             elif file_type == 'xlsx':
                 wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
                 for sheet in wb.worksheets:
-                    text_lines.append(f"--- Sheet: {sheet.title} ---")
+                    yield f"--- Sheet: {sheet.title} ---"
                     for row in sheet.iter_rows(values_only=True):
                         line = " | ".join([str(cell) for cell in row if cell is not None])
-                        if line: text_lines.append(line)
-        except Exception as e: text_lines.append(f"Error reading file: {str(e)}")
+                        if not line: continue
+                        count += 1
+                        if max_rows and count > max_rows:
+                            yield f"...... 数据过多，仅显示前 {max_rows} 行 ......"
+                            return
+                        yield line
+        except Exception as e: yield f"Error reading file: {str(e)}"
+        finally:
+            if wb is not None: wb.close()
+
+    @staticmethod
+    def render_office_pdf(file_path, file_type, packet):
+        """边读边排版，逐页输出 (页内容流压缩)；行数 / 页数达到上限时追加截断提示"""
+        if file_type == 'xlsx':
+            try: return WatermarkEngine.render_xlsx_table(file_path, packet)
+            except Exception:
+                # 表格渲染失败时回退到逐行文本
+                packet.seek(0)
+                packet.truncate()
+        max_rows = _cfg('OFFICE_MAX_ROWS', 100000)
+        max_pages = _cfg('OFFICE_MAX_PAGES', 2000)
+        c = canvas.Canvas(packet, pagesize=A4, pageCompression=1)
+        width, height = A4
+        font_name = WatermarkEngine.register_chinese_font()
+        c.setFont(font_name, 10)
 
         y = height - 40
         margin = 40
-        for line in text_lines:
-            if y < 40:
-                c.showPage()
-                c.setFont(font_name, 10)
-                y = height - 40
-            wrapped_lines = simpleSplit(line, font_name, 10, width - 2*margin)
-            for w_line in wrapped_lines:
-                c.drawString(margin, y, w_line)
-                y -= 14
-                if y < 40:
-                    c.showPage()
-                    c.setFont(font_name, 10)
-                    y = height - 40
+        pages = 1
+        lines = WatermarkEngine.iter_office_lines(file_path, file_type, max_rows)
+        truncated = False
+        try:
+            for line in lines:
+                for w_line in simpleSplit(line, font_name, 10, width - 2*margin):
+                    if y < 40:
+                        if max_pages and pages >= max_pages:
+                            c.drawString(margin, 20, f"...... 文档过长，仅显示前 {max_pages} 页 ......")
+                            truncated = True
+                            break
+                        c.showPage()
+                        c.setFont(font_name, 10)
+                        y = height - 40
+                        pages += 1
+                    c.drawString(margin, y, w_line)
+                    y -= 14
+                if truncated: break
+        finally: lines.close()
         c.save()
-        packet.seek(0)
-        return PdfReader(packet)
     
     @staticmethod
-    def embed_blind_watermark(image_path, trace_id):
-        if not HAS_INVISIBLE_WATERMARK: return image_path
+    def render_xlsx_table(file_path, packet):
+        """
+        xlsx 表格渲染：每个工作表按前 N 行采样一次性算出列宽，单元格按网格绘制并截断到列宽；
+        每页的文字和网格线各自合并为一次绘制调用，表头在每页重复。
+        """
+        max_rows = _cfg('OFFICE_MAX_ROWS', 100000)
+        max_pages = _cfg('OFFICE_MAX_PAGES', 2000)
+        sample_size = _cfg('XLSX_SAMPLE_ROWS', 200)
+        font_name = WatermarkEngine.register_chinese_font()
+        font_size, row_h, pad = 8, 12, 3
+        min_col_w, max_col_w = 24, 200
+        margin = 30
+
+        c = canvas.Canvas(packet, pagesize=A4, pageCompression=1)
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        state = {'pages': 0, 'rows': 0, 'truncated': False}
         try:
-            processor = DwtDctSvdProcessor()
-            img_bgr = cv2.imread(image_path)
-            if img_bgr is None: return image_path
-            encoded_img = embed_msg(processor, img_bgr, trace_id, mode='str')
-            temp_path = image_path + f".{uuid.uuid4().hex[:4]}.wm.png"
-            cv2.imwrite(temp_path, encoded_img)
-            return temp_path
-        except: return image_path
+            for sheet in wb.worksheets:
+                if state['truncated']: break
+                rows = sheet.iter_rows(values_only=True)
+                sample = []
+                for row in rows:
+                    sample.append(['' if v is None else str(v) for v in row])
+                    if len(sample) >= sample_size: break
+                n_cols = max((len(r) for r in sample), default=0)
+
+                # 列宽：采样行中的最大文本宽度，限制在 [min, max]
+                widths = [min_col_w] * n_cols
+                for r in sample:
+                    for i, v in enumerate(r):
+                        if v: widths[i] = max(widths[i], min(_string_width(v, font_name, font_size) + 2 * pad, max_col_w))
+
+                page_size = A4 if sum(widths) <= A4[0] - 2 * margin else landscape(A4)
+                avail = page_size[0] - 2 * margin
+                total = sum(widths)
+                if total > avail:
+                    scale = avail / total
+                    widths = [max(w * scale, min_col_w) for w in widths]
+                # 缩放后仍放不下的列舍去
+                shown, acc = 0, 0
+                for w in widths:
+                    if acc + w > avail: break
+                    acc += w
+                    shown += 1
+                widths = widths[:shown]
+                xs = [margin]
+                for w in widths: xs.append(xs[-1] + w)
+
+                title = f"--- Sheet: {sheet.title} ---" + (f" (仅显示前 {shown}/{n_cols} 列)" if shown < n_cols else "")
+                header = sample[0] if sample else []
+                body = iter(sample[1:])
+
+                def body_rows():
+                    yield from body
+                    for row in rows:
+                        yield ['' if v is None else str(v) for v in row]
+
+                WatermarkEngine._draw_table_pages(c, page_size, font_name, font_size, row_h, pad, margin,
+                                                  xs, widths, title, header, body_rows(), state, max_rows, max_pages)
+        finally: wb.close()
+        if state['pages'] == 0:
+            c.setFont(font_name, 10)
+            c.drawString(margin, A4[1] - 40, "(空工作簿)")
+        c.save()
+
+    @staticmethod
+    def _draw_table_pages(c, page_size, font_name, font_size, row_h, pad, margin,
+                          xs, widths, title, header, rows, state, max_rows, max_pages):
+        width, height = page_size
+        top, bottom = height - margin, margin
+        n = len(widths)
+        fit = lambda v, i: _fit_text(v, widths[i] - 2 * pad, font_name, font_size) if v else ''
+        fitted_header = [fit(header[i] if i < len(header) else '', i) for i in range(n)]
+        rows_per_page = max(int((top - 16 - bottom) // row_h) - 1, 1)
+
+        def emit_page(page_rows, first):
+            """一页内容：表头底色 + 按列输出文字 (每列一次 setTextOrigin，逐行 textLine) + 一次性画网格线"""
+            if state['pages']: c.showPage()
+            c.setPageSize(page_size)
+            state['pages'] += 1
+            c.setFont(font_name, 10)
+            c.drawString(margin, top, title if first else f"{title} (续)")
+            y_top = top - 16
+            if not n: return
+            c.setFillColorRGB(0.93, 0.93, 0.93)
+            c.rect(xs[0], y_top - row_h, xs[-1] - xs[0], row_h, stroke=0, fill=1)
+            c.setFillColorRGB(0, 0, 0)
+
+            text = c.beginText()
+            text.setFont(font_name, font_size, leading=row_h)
+            for i in range(n):
+                text.setTextOrigin(xs[i] + pad, y_top - row_h + 3)
+                text.textLine(fitted_header[i])
+                for r in page_rows: text.textLine(r[i])
+            c.drawText(text)
+
+            y_end = y_top - row_h * (len(page_rows) + 1)
+            grid = [(xs[0], y_top - k * row_h, xs[-1], y_top - k * row_h) for k in range(len(page_rows) + 2)]
+            grid += [(x, y_top, x, y_end) for x in xs]
+            c.setStrokeColorRGB(0.75, 0.75, 0.75)
+            c.setLineWidth(0.3)
+            c.lines(grid)
+            return y_end
+
+        page_rows, first = [], True
+        for row in rows:
+            if not any(row): continue
+            state['rows'] += 1
+            if max_rows and state['rows'] > max_rows:
+                y_end = emit_page(page_rows, first)
+                c.drawString(margin, max((y_end or top) - row_h, bottom - 14), f"...... 数据过多，仅显示前 {max_rows} 行 ......")
+                state['truncated'] = True
+                return
+            page_rows.append([fit(row[i] if i < len(row) else '', i) for i in range(n)])
+            if len(page_rows) >= rows_per_page:
+                emit_page(page_rows, first)
+                page_rows, first = [], False
+                if max_pages and state['pages'] >= max_pages:
+                    c.drawString(margin, bottom - 14, f"...... 文档过长，仅显示前 {max_pages} 页 ......")
+                    state['truncated'] = True
+                    return
+        if page_rows or first: emit_page(page_rows, first)
+
+    @staticmethod
+    def embed_blind_watermark(img_bgr, trace_id, strength=None):
+        """
+        在内存中的 BGR 数组上嵌入盲水印，返回新数组 (保持原分辨率)。
+        strength 须与解码端一致，由请求线程读取配置后传入；嵌入失败时抛出异常 (不输出无盲水印的原图)。
+        """
+        if not HAS_INVISIBLE_WATERMARK or img_bgr is None: return img_bgr
+        if strength is None: strength = _cfg('WATERMARK_STRENGTH', blind_watermark.DEFAULT_STRENGTH)
+        try: return blind_watermark.embed(img_bgr, trace_id, strength)
+        except Exception as e:
+            logger.error(f"Blind watermark embed failed for {trace_id}: {e}")
+            raise
+
+    @staticmethod
+    def image_to_pdf(file_path, trace_id=None):
+        """图片 -> 单页 PDF 流；给出 trace_id 时先嵌入盲水印。全程内存处理，只解码一次；无法嵌入时抛出异常"""
+        img_byte_arr = io.BytesIO()
+        if trace_id and HAS_INVISIBLE_WATERMARK:
+            img_bgr = cv2.imread(file_path, cv2.IMREAD_COLOR)
+            if img_bgr is None:
+                logger.error(f"Blind watermark skipped, image not decodable: {file_path}")
+                raise ValueError("image not decodable")
+            strength = _cfg('WATERMARK_STRENGTH', blind_watermark.DEFAULT_STRENGTH)
+            future = _submit_embed(WatermarkEngine.embed_blind_watermark, img_bgr, trace_id, strength)
+            with metrics.stage('embed', 'image'): encoded = future.result()
+            img = Image.fromarray(cv2.cvtColor(encoded, cv2.COLOR_BGR2RGB))
+            img.save(img_byte_arr, format='PDF')
+            img_byte_arr.seek(0)
+            return img_byte_arr
+        img = Image.open(file_path)
+        if img.mode not in ('RGB', 'L', 'CMYK'): img = img.convert('RGB')
+        img.save(img_byte_arr, format='PDF')
+        img_byte_arr.seek(0)
+        return img_byte_arr
 
     @staticmethod
     def extract_blind_watermark(file_path):
@@ -170,61 +457,97 @@ class WatermarkEngine:
                 }
             except Exception as e: result["info"] = f"PDF解析失败: {e}"
         elif ext in ['png', 'jpg', 'jpeg'] and HAS_INVISIBLE_WATERMARK:
-            try: 
-                # 图片盲水印解码复杂，这里假设可以解码出 TraceID
-                result = {"type": "图片频域盲水印", "info": "检测到隐形水印信号", "details": {}}
+            try:
+                img_bgr = cv2.imread(file_path, cv2.IMREAD_COLOR)
+                if img_bgr is None: raise ValueError("无法解码图片")
+                decoded, confidence = blind_watermark.decode(img_bgr, _cfg('WATERMARK_STRENGTH', blind_watermark.DEFAULT_STRENGTH))
+                if decoded:
+                    download_time = datetime.datetime.utcfromtimestamp(decoded['timestamp'] + 8 * 3600).strftime('%Y-%m-%d %H:%M:%S')
+                    result = {
+                        "type": "图片频域盲水印",
+                        "info": f"检测到隐形水印\nTraceID 前缀: {decoded['trace_prefix']}\n用户ID: {decoded['user_id']}\n下载时间: {download_time}\n置信度: {confidence:.2f}",
+                        "details": {
+                            "user_id": decoded['user_id'],
+                            "time": download_time,
+                            # 图片载荷只含 TraceID 前缀，需按前缀匹配审计记录
+                            "trace_prefix": decoded['trace_prefix'],
+                            "confidence": round(confidence, 3)
+                        }
+                    }
+                else: result["details"] = {"confidence": round(confidence, 3)}
             except Exception as e: result["info"] = f"图片解析失败: {e}"
         return result
     
     @staticmethod
+    def load_source_pdf(file_path, file_type, trace_id=None, add_watermark=True):
+        """按文件类型得到源 PdfReader (PDF 页面按需解析，Office 读取转换缓存)"""
+        if file_type in ['png', 'jpg', 'jpeg']:
+            return PdfReader(WatermarkEngine.image_to_pdf(file_path, trace_id if add_watermark else None))
+        elif file_type in ['doc', 'docx', 'xls', 'xlsx']:
+            return WatermarkEngine.convert_office_to_pdf(file_path, file_type)
+        elif file_type == 'pdf':
+            return PdfReader(file_path)
+        return None
+
+    @staticmethod
+    @profiler.tag('watermark.process_file')
     def process_file(file_path, file_type, user_info, trace_id, add_watermark=True):
+        stream, _ = WatermarkEngine.process_page_range(file_path, file_type, user_info, trace_id, None, add_watermark)
+        return stream
+
+    @staticmethod
+    @profiler.tag('watermark.process_page_range')
+    def process_page_range(file_path, file_type, user_info, trace_id, page_range=None, add_watermark=True):
+        """
+        只加载并处理 page_range=(start, end) 内的页面 (1 起始，闭区间，end 为 None 表示到末页)。
+        返回 (PDF 流, 源文档总页数)。
+        """
         output = PdfWriter()
         email_display = user_info.get('email') or user_info.get('feishu_open_id') or '未知用户'
         download_time = time.strftime('%Y-%m-%d %H:%M:%S')
         watermark_text = f"{user_info['name']} - {email_display} - {download_time}"
         
-        input_pdf = None
-        working_img_path = None
+        # 分阶段计时 (/metrics 中的 watermark_stage_seconds)；load 含 Office 转换 / 图片嵌入，它们另有单独阶段
+        with metrics.stage('load', file_type):
+            input_pdf = WatermarkEngine.load_source_pdf(file_path, file_type, trace_id, add_watermark)
+            total_pages = len(input_pdf.pages) if input_pdf else 0
 
-        try:
-            if file_type in ['png', 'jpg', 'jpeg']:
-                working_img_path = file_path
-                if add_watermark and HAS_INVISIBLE_WATERMARK:
-                    working_img_path = WatermarkEngine.embed_blind_watermark(file_path, trace_id)
-                img = Image.open(working_img_path)
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='PDF')
-                img_byte_arr.seek(0)
-                input_pdf = PdfReader(img_byte_arr)
-            elif file_type in ['doc', 'docx', 'xls', 'xlsx']:
-                input_pdf = WatermarkEngine.convert_office_to_pdf(file_path, file_type)
-            elif file_type == 'pdf':
-                input_pdf = PdfReader(file_path)
-            
-            keep_alive_refs = []
-            if input_pdf:
-                for page in input_pdf.pages:
-                    try: w = float(page.mediabox.width); h = float(page.mediabox.height)
-                    except: w, h = 595.27, 841.89
-                    if add_watermark:
-                        watermark_pdf = WatermarkEngine.create_watermark_layer(watermark_text, w, h)
-                        keep_alive_refs.append(watermark_pdf)
-                        page.merge_page(watermark_pdf.pages[0])
-                    output.add_page(page)
-            
-            # 🟢 修复：添加详细元数据
-            output.add_metadata({
-                '/TraceID': trace_id, 
-                '/User': str(user_info['id']), 
-                '/UserInfo': f"{user_info['name']}_{email_display}",
-                '/DownloadTime': download_time
-            })
-            
-            output_stream = io.BytesIO()
-            output.write(output_stream)
-            output_stream.seek(0)
-            return output_stream
-        finally:
-            if working_img_path and working_img_path != file_path and os.path.exists(working_img_path):
-                try: os.remove(working_img_path)
-                except: pass
\ No newline at end of file
+        start, end = 1, total_pages
+        if page_range:
+            start = max(page_range[0], 1)
+            end = min(page_range[1] or total_pages, total_pages)
+        
+        # 同尺寸页面共用一个水印层
+        layers = {}
+        overlay_time = merge_time = 0.0
+        if input_pdf:
+            for idx in range(start - 1, end):
+                page = input_pdf.pages[idx]
+                try: w = float(page.mediabox.width); h = float(page.mediabox.height)
+                except: w, h = 595.27, 841.89
+                if add_watermark:
+                    layer = layers.get((w, h))
+                    if layer is None:
+                        t0 = time.perf_counter()
+                        layer = layers[(w, h)] = WatermarkEngine.create_watermark_layer(watermark_text, w, h)
+                        overlay_time += time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    page.merge_page(layer.pages[0])
+                    merge_time += time.perf_counter() - t0
+                output.add_page(page)
+        if add_watermark:
+            metrics.observe_stage('overlay', overlay_time, file_type)
+            metrics.observe_stage('merge', merge_time, file_type)
+        
+        # 🟢 修复：添加详细元数据
+        output.add_metadata({
+            '/TraceID': trace_id, 
+            '/User': str(user_info['id']), 
+            '/UserInfo': f"{user_info['name']}_{email_display}",
+            '/DownloadTime': download_time
+        })
+        
+        output_stream = io.BytesIO()
+        with metrics.stage('write', file_type): output.write(output_stream)
+        output_stream.seek(0)
+        return output_stream, total_pages
@@ -0,0 +1,11 @@
+from app import create_app
+from app.extensions import metrics
+from app.utils.asgi_bridge import AsgiBridge
+
+flask_app = create_app()
+app = AsgiBridge.from_app(flask_app)
+metrics.register_collector('asgi', app.snapshot)
+
+# 异步模式 (长下载 / 慢飞书调用不再阻塞列表类接口):
+#   uvicorn asgi:app --host 127.0.0.1 --port 5000 --workers 4
+#   gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:app
@@ -0,0 +1,118 @@
+# backend/tools/bench_json.py
+"""
+列表接口负载基准：用合成的文件列表行 (中文标题、北京时间、ACL 标志) 对比
+- 旧查询 (c.* + 上传者，含 file_path 等内部列) 与投影后的列 (file_ops.CONTRACT_LIST_COLUMNS)；
+- Flask 默认 JSON provider 与 orjson provider (app/utils/fast_json.py)；
+- 原始 / gzip / br (需安装 brotli) 的传输字节数与压缩耗时。
+编码走 app.json.response()，与视图中 jsonify 的路径一致。
+
+用法:
+    python tools/bench_json.py --rows 50 500 5000 --repeat 20
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app.utils import fast_json  # noqa: E402
+from app.utils.compression import HAS_BROTLI  # noqa: E402
+from app.routes.file_ops import CONTRACT_LIST_COLUMNS  # noqa: E402
+
+if HAS_BROTLI: import brotli  # noqa: E402
+
+TITLE_WORDS = ['采购', '租赁', '服务', '保密', '框架', '劳动', '技术开发', '代理', '合作', '补充协议']
+
+
+def make_rows(n, rng):
+    """c.* 形状的行 (与 migrations 中 contracts 表一致) + uploader + ACL 标志"""
+    base = datetime.datetime(2024, 1, 1, 9, 0, 0)
+    rows = []
+    for i in range(n):
+        ext = rng.choice(['pdf', 'docx', 'xlsx', 'jpg'])
+        rows.append({
+            "id": 10000 + i,
+            "title": f"{rng.choice(TITLE_WORDS)}{rng.choice(TITLE_WORDS)}合同_{2024 + i % 3}_{i:05d}.{ext}",
+            "file_path": f"/data/contract_system/uploads/{rng.getrandbits(128):032x}.{ext}",
+            "file_type": ext,
+            "security_level": rng.choice(['公开', '内部', '机密']),
+            "file_size": f"{rng.uniform(0.1, 30):.2f} MB",
+            "uploader_id": rng.randint(1, 500),
+            "folder_id": 42,
+            "created_at": base + datetime.timedelta(minutes=i * 7),
+            "uploader": rng.choice(['张三', '李四', '王五', '赵六']),
+            "can_view": 1,
+            "can_download": rng.randint(0, 1),
+        })
+    return rows
+
+
+def project(rows):
+    keys = [c.strip().split('.')[-1] for c in CONTRACT_LIST_COLUMNS.split(',')] + ['can_view', 'can_download']
+    return [{k: r[k] for k in keys} for r in rows]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def measure(app, rows, repeat):
+    with app.app_context():
+        resp, encode_ms = timed(lambda: app.json.response(rows), repeat)
+    body = resp.get_data()
+    result = {"bytes": len(body), "encode_ms": round(encode_ms, 3)}
+    gz, gz_ms = timed(lambda: gzip.compress(body, compresslevel=6, mtime=0), repeat)
+    result.update({"gzip_bytes": len(gz), "gzip_ms": round(gz_ms, 3)})
+    if HAS_BROTLI:
+        br, br_ms = timed(lambda: brotli.compress(body, quality=4), repeat)
+        result.update({"br_bytes": len(br), "br_ms": round(br_ms, 3)})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare listing payload size and JSON encode time")
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    std_app = Flask('bench_std')
+    std_app.json = DefaultJSONProvider(std_app)
+    fast_app = Flask('bench_fast')
+    fast_app.config['JSON_ENCODER'] = 'orjson'
+    fast_json.init_app(fast_app)
+    encoders = {"std": std_app}
+    if isinstance(fast_app.json, fast_json.OrjsonProvider): encoders["orjson"] = fast_app
+    else: print("orjson not installed, only measuring the standard encoder", file=sys.stderr)
+
+    report = {"brotli": HAS_BROTLI, "results": []}
+    for n in args.rows:
+        full = make_rows(n, random.Random(args.seed))
+        shapes = {"c.*": full, "projected": project(full)}
+        for shape, rows in shapes.items():
+            for name, app in encoders.items():
+                entry = {"rows": n, "columns": shape, "encoder": name}
+                entry.update(measure(app, rows, args.repeat))
+                report["results"].append(entry)
+                print(f"{n:>6} rows  {shape:<9} {name:<6} {entry['bytes']:>9} B  encode {entry['encode_ms']:>8.3f} ms  "
+                      f"gzip {entry['gzip_bytes']:>8} B ({entry['gzip_ms']:.3f} ms)"
+                      + (f"  br {entry['br_bytes']:>8} B ({entry['br_ms']:.3f} ms)" if HAS_BROTLI else ""), file=sys.stderr)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
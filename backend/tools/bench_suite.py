@@ -0,0 +1,402 @@
+# backend/tools/bench_suite.py
+"""
+可复现的端到端基准：在独立的 MySQL 库中按指定规模生成合成数据 (用户 / 组 / 深层目录树 / 带 ACL 的文件 / 审计日志)，
+并生成 PDF / docx / xlsx / 大图样本，通过 Flask test client 计时主要接口：
+目录与文件列表、搜索、下载 (水印)、分页预览、目录权限更新、递归删除、管理员权限弹窗、审计日志。
+
+结果为 JSON (含 git 版本、规模、数据量、每个操作的 min/p50/p95 及每请求 SQL 条数)，
+--compare 与基线对比，状态码分布不同、p50 变慢超过阈值或 SQL 条数增加时返回非 0，可用于版本间回归检查。
+
+应用 SQL 依赖 MySQL 语法 (ON DUPLICATE KEY / IN %s / information_schema)，因此不提供 SQLite 模式；
+请指向一个可随意清空的 MySQL / MariaDB 库 (默认 contract_bench，拒绝使用 contract_system)。
+
+用法:
+    python tools/bench_suite.py --scale small --output bench_small.json
+    python tools/bench_suite.py --scale medium --reuse --compare bench_baseline.json --threshold 0.2
+    python tools/bench_suite.py --scale large --only download_pdf,search_user --repeat 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import platform
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 规模预设：顶层目录数 / 每层子目录数 / 深度 / 每目录文件数 / 每顶层目录授权主体数
+SCALES = {
+    "small": {"users": 50, "groups": 5, "top": 5, "fanout": 3, "depth": 4, "files_per_folder": 5, "acl_subjects": 3, "audit_rows": 20_000},
+    "medium": {"users": 500, "groups": 20, "top": 10, "fanout": 4, "depth": 5, "files_per_folder": 10, "acl_subjects": 4, "audit_rows": 500_000},
+    "large": {"users": 5000, "groups": 100, "top": 20, "fanout": 5, "depth": 6, "files_per_folder": 5, "acl_subjects": 5, "audit_rows": 5_000_000},
+}
+CORPUS_KINDS = ('pdf', 'docx', 'xlsx', 'jpg', 'png')
+CHUNK = 5000
+TITLE_WORDS = ['采购', '租赁', '服务', '保密', '框架', '劳动', '技术开发', '代理', '合作', '补充协议']
+
+
+# ---------- 样本文件 ----------
+def build_corpus(folder, rng, pdf_pages, image_mp):
+    """生成各类型样本文件 (已存在则复用)，返回 {类型: 路径}"""
+    os.makedirs(folder, exist_ok=True)
+    paths = {kind: os.path.join(folder, f"sample_{pdf_pages}p_{image_mp}mp.{kind}") for kind in CORPUS_KINDS}
+    lines = [f"第 {i} 条 {rng.choice(TITLE_WORDS)}条款：甲方与乙方就本合同项下事项达成如下约定，双方应按期履行。" for i in range(60)]
+
+    if not os.path.exists(paths['pdf']):
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import A4
+        c = canvas.Canvas(paths['pdf'], pagesize=A4)
+        for page in range(pdf_pages):
+            y = 800
+            c.drawString(50, y, f"Synthetic contract - page {page + 1}")
+            for i, _ in enumerate(lines[:45]):
+                y -= 16
+                c.drawString(50, y, f"Clause {page + 1}.{i + 1}: the parties agree to the terms set out herein.")
+            c.showPage()
+        c.save()
+
+    if not os.path.exists(paths['docx']):
+        import docx
+        doc = docx.Document()
+        doc.add_heading('合成合同样本', 0)
+        for line in lines * 3: doc.add_paragraph(line)
+        table = doc.add_table(rows=20, cols=4)
+        for r, row in enumerate(table.rows):
+            for c_idx, cell in enumerate(row.cells): cell.text = f"R{r}C{c_idx}"
+        doc.save(paths['docx'])
+
+    if not os.path.exists(paths['xlsx']):
+        import openpyxl
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(['编号', '合同名称', '甲方', '乙方', '金额', '签署日期', '到期日期', '状态'])
+        for i in range(5000):
+            ws.append([i, f"{rng.choice(TITLE_WORDS)}合同", f"甲方{i % 97}", f"乙方{i % 89}",
+                       round(rng.uniform(1e3, 1e7), 2), f"2024-{i % 12 + 1:02d}-01", f"2026-{i % 12 + 1:02d}-01", '生效'])
+        wb.save(paths['xlsx'])
+
+    if not os.path.exists(paths['jpg']) or not os.path.exists(paths['png']):
+        from PIL import Image, ImageDraw
+        w = int((image_mp * 1_000_000 * 3 / 4) ** 0.5)
+        h = int(image_mp * 1_000_000 / w)
+        img = Image.new('RGB', (w, h), (250, 250, 248))
+        draw = ImageDraw.Draw(img)
+        step = max(h // 120, 12)
+        for y in range(step * 2, h - step, step):
+            draw.text((w // 20, y), "Party A agrees to the terms and conditions set out in clause 12.3 " * 3, fill=(30, 30, 30))
+        img.save(paths['jpg'], quality=90)
+        img.save(paths['png'], optimize=False)
+    return paths
+
+
+# ---------- 合成数据 ----------
+def _insert(cursor, sql, rows):
+    for i in range(0, len(rows), CHUNK): cursor.executemany(sql, rows[i:i + CHUNK])
+
+
+def _root_of(parent_of, fid):
+    while parent_of.get(fid, 0) != 0: fid = parent_of[fid]
+    return fid
+
+
+def seed(conn, scale, corpus, rng, delete_pool, pool_dir):
+    """写入合成数据 (显式 id，保证同一 seed 下结果一致)，返回基准所需的各类 id"""
+    now = datetime.datetime(2025, 1, 1)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id FROM users WHERE username='admin'")
+        admin_id = cursor.fetchone()['id']
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS m FROM users")
+        uid0 = cursor.fetchone()['m'] + 1
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS m FROM user_groups")
+        gid0 = cursor.fetchone()['m'] + 1
+
+        user_ids = list(range(uid0, uid0 + scale['users']))
+        group_ids = list(range(gid0, gid0 + scale['groups']))
+        bench_user = user_ids[0]
+        _insert(cursor, "INSERT INTO users (id, username, password, name, email, role) VALUES (%s, %s, %s, %s, %s, 'user')",
+                [(u, f"bench_{u}", 'x', f"用户{u}", f"bench_{u}@example.com") for u in user_ids])
+        _insert(cursor, "INSERT INTO user_groups (id, name) VALUES (%s, %s)", [(g, f"基准组{g}") for g in group_ids])
+        members = {(rng.choice(group_ids), u) for u in user_ids for _ in range(rng.randint(1, 3))}
+        members.update((g, bench_user) for g in group_ids[:2])
+        _insert(cursor, "INSERT INTO group_members (group_id, user_id) VALUES (%s, %s)", sorted(members))
+
+        # 目录树：top 个顶层目录，每层 fanout 个子目录，共 depth 层；另有样本目录与待删除子树
+        folders, top_ids, next_id = [], [], [1]
+
+        def add_folder(name, parent, level, depth, fanout):
+            fid = next_id[0]
+            next_id[0] += 1
+            folders.append((fid, name, parent, admin_id, now + datetime.timedelta(seconds=fid)))
+            if level < depth:
+                for i in range(fanout): add_folder(f"{name}-{i + 1}", fid, level + 1, depth, fanout)
+            return fid
+
+        for t in range(scale['top']): top_ids.append(add_folder(f"项目{t + 1}", 0, 1, scale['depth'], scale['fanout']))
+        sample_folder = add_folder("基准样本", 0, 1, 1, 0)
+        pool_root = add_folder("待删除", 0, 1, 1, 0)
+        pool_ids = [add_folder(f"删除子树{i + 1}", pool_root, 1, 3, 3) for i in range(delete_pool)]
+        _insert(cursor, "INSERT INTO folders (id, name, parent_id, creator_id, created_at) VALUES (%s, %s, %s, %s, %s)", folders)
+
+        # 每个目录 files_per_folder 个文件，文件路径轮流指向样本文件
+        parent_of = {f[0]: f[2] for f in folders}
+        pool_folders = {f[0] for f in folders if _root_of(parent_of, f[0]) == pool_root}
+        os.makedirs(pool_dir, exist_ok=True)
+        contracts, cid = [], 1
+        for fid, _, _, _, created in folders:
+            if fid in (sample_folder, pool_root): continue
+            for _ in range(scale['files_per_folder']):
+                kind = CORPUS_KINDS[cid % len(CORPUS_KINDS)]
+                title = f"{rng.choice(TITLE_WORDS)}合同_{cid}.{kind}"
+                path = corpus[kind]
+                if fid in pool_folders:
+                    # 递归删除会删掉磁盘文件，待删除子树使用独立的占位文件
+                    path = os.path.join(pool_dir, f"{cid}.{kind}")
+                    with open(path, 'wb') as f: f.write(b'0' * 1024)
+                contracts.append((cid, title, path, kind, '内部', '1 MB', rng.choice(user_ids), fid, created))
+                cid += 1
+        sample_ids = {}
+        for kind in CORPUS_KINDS:
+            contracts.append((cid, f"样本.{kind}", corpus[kind], kind, '内部', '1 MB', admin_id, sample_folder, now))
+            sample_ids[kind] = cid
+            cid += 1
+        _insert(cursor, "INSERT INTO contracts (id, title, file_path, file_type, security_level, file_size, uploader_id, folder_id, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", contracts)
+
+        # ACL：顶层目录授权给若干组 / 用户并下传到子目录与文件 (与 _propagate_folder_permissions 的结果一致)
+        top_acl = {}
+        for i, t in enumerate(top_ids):
+            subjects = [('group', g) for g in rng.sample(group_ids, min(scale['acl_subjects'], len(group_ids)))]
+            subjects += [('user', u) for u in rng.sample(user_ids, scale['acl_subjects'])]
+            # bench 用户所在组可见前半部分顶层目录
+            if i < len(top_ids) // 2 + 1: subjects.append(('group', group_ids[0]))
+            top_acl[t] = sorted(set(subjects))
+        folder_perms, contract_perms = [], []
+        for fid, *_ in folders:
+            acl = top_acl.get(_root_of(parent_of, fid))
+            if acl: folder_perms += [(fid, sid, stype, 1, 1) for stype, sid in acl]
+        for c in contracts:
+            acl = top_acl.get(_root_of(parent_of, c[7]))
+            if acl: contract_perms += [(c[0], sid, stype, 1, 1) for stype, sid in acl]
+        contract_perms += [(c_id, bench_user, 'user', 1, 1) for c_id in sample_ids.values()]
+        _insert(cursor, "INSERT INTO folder_permissions (folder_id, subject_id, subject_type, can_view, can_download) VALUES (%s, %s, %s, %s, %s)", folder_perms)
+        _insert(cursor, "INSERT INTO contract_permissions (contract_id, subject_id, subject_type, can_view, can_download) VALUES (%s, %s, %s, %s, %s)", contract_perms)
+
+        actions = ['PREVIEW', 'DOWNLOAD', 'UPLOAD', 'UPDATE_FILE_PERM']
+        for start in range(0, scale['audit_rows'], CHUNK):
+            rows = []
+            for _ in range(min(CHUNK, scale['audit_rows'] - start)):
+                u, c_id = rng.choice(user_ids), rng.randint(1, cid - 1)
+                ts = now + datetime.timedelta(seconds=rng.randint(0, 365 * 86400))
+                trace = f"TRACE_{u}_{int(ts.timestamp())}_{hashlib.md5(str(c_id).encode()).hexdigest()}"
+                rows.append((u, c_id, rng.choice(actions), trace, ts))
+            cursor.executemany("INSERT INTO audit_logs (user_id, contract_id, action_type, trace_id, created_at) VALUES (%s, %s, %s, %s, %s)", rows)
+
+        ids = {"admin": admin_id, "user": bench_user, "top": top_ids, "deep": folders[scale['depth'] - 1][0],
+               "samples": sample_ids, "sample_folder": sample_folder, "delete_pool": pool_ids,
+               "contract": contracts[0][0]}
+        value = json.dumps({"scale": scale, "ids": ids})
+        cursor.execute("INSERT INTO system_settings (`key`, `value`) VALUES ('bench_seed', %s) ON DUPLICATE KEY UPDATE `value`=%s", (value, value))
+    conn.commit()
+    return ids
+
+
+def table_counts(conn):
+    counts = {}
+    with conn.cursor() as cursor:
+        for table in ('users', 'user_groups', 'group_members', 'folders', 'contracts', 'folder_permissions', 'contract_permissions', 'audit_logs'):
+            cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+            counts[table] = cursor.fetchone()['n']
+    return counts
+
+
+# ---------- 计时 ----------
+def percentile(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))]
+
+
+def operations(ids):
+    """(名称, 身份, 方法, URL 或 callable(i), JSON 体, 预热次数)"""
+    top, samples = ids['top'], ids['samples']
+    acl_body = [{"subject_id": ids['user'], "subject_type": "user", "can_view": 1, "can_download": 1}]
+    return [
+        ("list_root_admin", 'admin', 'GET', "/api/folders?parent_id=0", None, 1),
+        ("list_root_user", 'user', 'GET', "/api/folders?parent_id=0", None, 1),
+        ("list_subfolders_user", 'user', 'GET', f"/api/folders?parent_id={top[0]}", None, 1),
+        ("list_files_user", 'user', 'GET', f"/api/contracts?folder_id={ids['deep']}", None, 1),
+        ("list_files_admin", 'admin', 'GET', f"/api/contracts?folder_id={ids['deep']}", None, 1),
+        ("search_user", 'user', 'GET', "/api/search?q=合同_1", None, 1),
+        ("search_admin", 'admin', 'GET', "/api/search?q=合同_1", None, 1),
+        *[(f"download_{kind}", 'user', 'POST', f"/api/download/{cid}", None, 1) for kind, cid in samples.items()],
+        ("preview_pdf_pages", 'user', 'GET', f"/api/download/{samples['pdf']}?pages=1-3", None, 1),
+        ("folder_permission_update", 'admin', 'POST', f"/api/permissions/folder/{top[-1]}", acl_body, 1),
+        ("file_permission_dialog", 'admin', 'GET', f"/api/permissions/{ids['contract']}", None, 1),
+        ("folder_permission_dialog", 'admin', 'GET', f"/api/permissions/folder/{top[0]}", None, 1),
+        ("users_with_groups", 'admin', 'GET', "/api/admin/users_with_groups", None, 1),
+        ("audit_logs", 'admin', 'GET', "/api/logs", None, 1),
+        # 每次删除一棵预先生成的子树，不预热
+        ("recursive_delete", 'admin', 'DELETE', lambda i: f"/api/folders/{ids['delete_pool'][i]}", None, 0),
+    ]
+
+
+def run_op(client, headers, sql_stats, op, repeat):
+    name, who, method, url, body, warmup = op
+    samples, statuses, sizes, queries = [], {}, 0, 0
+    for i in range(warmup + repeat):
+        path = url(i) if callable(url) else url
+        before = sql_stats['statements']
+        t0 = time.perf_counter()
+        resp = client.open(path, method=method, headers=headers[who], json=body)
+        data = resp.get_data()
+        elapsed = time.perf_counter() - t0
+        if i < warmup: continue
+        samples.append(elapsed * 1000)
+        queries += sql_stats['statements'] - before
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        sizes += len(data)
+    return {
+        "min_ms": round(min(samples), 2), "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2), "mean_ms": round(sum(samples) / len(samples), 2),
+        "queries": round(queries / repeat, 1), "bytes": sizes // repeat,
+        "status": {str(k): v for k, v in statuses.items()}, "n": repeat,
+    }
+
+
+def status_mix(result):
+    """各状态码占比，repeat 不同的两次结果也能比较"""
+    n = sum(result.get('status', {}).values()) or 1
+    return {code: round(count / n, 3) for code, count in result.get('status', {}).items()}
+
+
+def compare(results, baseline, threshold, noise_ms):
+    """返回回归列表：状态码分布与基线不同 (如 200 变 403/500，计时已不可比)、p50 变慢超过阈值 (且超过噪声下限) 或每请求 SQL 条数增加"""
+    regressions = []
+    for name, cur in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old: continue
+        if status_mix(cur) != status_mix(old):
+            regressions.append({"op": name, "metric": "status", "baseline": old.get('status'), "current": cur.get('status')})
+        if cur['p50_ms'] > old['p50_ms'] * (1 + threshold) and cur['p50_ms'] - old['p50_ms'] > noise_ms:
+            regressions.append({"op": name, "metric": "p50_ms", "baseline": old['p50_ms'], "current": cur['p50_ms']})
+        if cur['queries'] > old['queries']:
+            regressions.append({"op": name, "metric": "queries", "baseline": old['queries'], "current": cur['queries']})
+    return regressions
+
+
+def git_revision():
+    try: return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible end-to-end benchmark on a synthetic corpus")
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--db', default='contract_bench', help="基准专用库名，会被清空重建")
+    parser.add_argument('--reuse', action='store_true', help="复用已生成的同规模数据，不重建库")
+    parser.add_argument('--workdir', default=os.path.join(BACKEND_DIR, 'bench_data'), help="样本文件与预览缓存目录")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pdf-pages', type=int, default=20)
+    parser.add_argument('--image-mp', type=float, default=12, help="大图样本的像素数 (百万)")
+    parser.add_argument('--only', help="只运行指定操作，逗号分隔")
+    parser.add_argument('--output', help="结果 JSON 路径，默认输出到 stdout")
+    parser.add_argument('--compare', help="基线结果 JSON")
+    parser.add_argument('--threshold', type=float, default=0.2, help="p50 允许的相对变慢比例")
+    parser.add_argument('--noise-ms', type=float, default=2.0, help="低于该绝对差值的变化视为噪声")
+    args = parser.parse_args()
+
+    if args.db == 'contract_system': sys.exit("❌ 拒绝在业务库 contract_system 上运行基准，请使用独立库名")
+    os.environ['DB_NAME'] = args.db
+    os.environ.setdefault('PREVIEW_CACHE_FOLDER', os.path.join(args.workdir, 'cache'))
+    os.environ.setdefault('BACKUP_FOLDER', os.path.join(args.workdir, 'backups'))
+
+    import pymysql
+    from app.config import Config
+
+    scale = SCALES[args.scale]
+    server = pymysql.connect(host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASS)
+    try:
+        with server.cursor() as cursor:
+            if not args.reuse: cursor.execute(f"DROP DATABASE IF EXISTS `{args.db}`")
+    finally: server.close()
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    corpus = build_corpus(os.path.join(args.workdir, 'corpus'), rng, args.pdf_pages, args.image_mp)
+    corpus_s = time.perf_counter() - t0
+
+    # create_app 内的 init_db 负责建库与迁移
+    from app import create_app
+    from app.extensions import limiter, sql_tracer
+    import jwt
+    app = create_app()
+    limiter.enabled = False
+
+    conn = pymysql.connect(host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASS,
+                           database=args.db, cursorclass=pymysql.cursors.DictCursor)
+    try:
+        ids = None
+        if args.reuse:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT `value` FROM system_settings WHERE `key`='bench_seed'")
+                row = cursor.fetchone()
+            saved = json.loads(row['value']) if row else None
+            if saved and saved['scale'] == scale: ids = saved['ids']
+            elif saved: sys.exit("❌ 已有数据的规模与 --scale 不一致，去掉 --reuse 重建")
+        t0 = time.perf_counter()
+        if ids is None: ids = seed(conn, scale, corpus, rng, args.repeat, os.path.join(args.workdir, 'pool'))
+        seed_s = time.perf_counter() - t0
+        counts = table_counts(conn)
+        # 复用时之前的运行已删掉部分子树，只保留仍存在的
+        if ids['delete_pool']:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT id FROM folders WHERE id IN ({','.join(['%s'] * len(ids['delete_pool']))})", ids['delete_pool'])
+                alive = {r['id'] for r in cursor.fetchall()}
+            ids['delete_pool'] = [f for f in ids['delete_pool'] if f in alive]
+    finally: conn.close()
+    only = set(args.only.split(',')) if args.only else None
+    if (not only or 'recursive_delete' in only) and len(ids['delete_pool']) < args.repeat:
+        sys.exit("❌ 待删除子树不足 (已被之前的运行用掉)，去掉 --reuse 重建或用 --only 跳过 recursive_delete")
+
+    def token(user_id, role, username):
+        payload = {'user_id': user_id, 'role': role, 'name': username, 'email': f"{username}@example.com", 'username': username,
+                   'ep': 0, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=2)}
+        return {'Authorization': f"Bearer {jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')}"}
+
+    headers = {'admin': token(ids['admin'], 'admin', 'admin'), 'user': token(ids['user'], 'user', f"bench_{ids['user']}")}
+    client = app.test_client()
+    results = {}
+    for op in operations(ids):
+        if only and op[0] not in only: continue
+        results[op[0]] = run_op(client, headers, sql_tracer.stats, op, args.repeat)
+        print(f"{op[0]:<28} p50={results[op[0]]['p50_ms']:>9.2f} ms  queries={results[op[0]]['queries']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "revision": git_revision(), "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "scale": args.scale, "scale_params": scale, "seed": args.seed,
+            "repeat": args.repeat, "counts": counts, "corpus_s": round(corpus_s, 2), "seed_s": round(seed_s, 2),
+            "at": datetime.datetime.now().isoformat(timespec='seconds'),
+        },
+        "results": results,
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.noise_ms)
+        report["compare"] = {"baseline": baseline.get('meta', {}).get('revision'), "threshold": args.threshold, "regressions": regressions}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(text)
+    else: print(text)
+    for r in regressions: print(f"❌ {r['op']}: {r['metric']} {r['baseline']} -> {r['current']}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# backend/tools/check_query_plans.py
+"""
+查询计划回归检查：对主要查询执行 EXPLAIN，确认仍能命中 app/migrations.py 中定义的索引。
+索引被删、或查询被改成无法利用索引的写法 (函数包裹列、前导通配符等) 时返回非 0，可放进 CI / 发布前检查。
+
+小表上优化器可能直接选全表扫描，因此默认只要求索引出现在 possible_keys 中；
+--strict 要求实际使用 (key) 且不出现全表扫描，适合在有生产量级数据的预发库上运行。
+
+用法:
+    python tools/check_query_plans.py
+    python tools/check_query_plans.py --strict --json
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql  # noqa: E402
+
+from app.config import Config  # noqa: E402
+from app.migrations import LATEST_VERSION, current_version  # noqa: E402
+
+# (名称, SQL, 参数, 需检查的表别名, 期望索引)
+CHECKS = [
+    ("账号登录", "SELECT * FROM users WHERE username=%s", ('admin',), 'users', 'idx_users_username'),
+    ("飞书登录", "SELECT * FROM users WHERE feishu_open_id=%s", ('ou_x',), 'users', 'idx_users_feishu'),
+    ("用户所在组", "SELECT group_id FROM group_members WHERE user_id = %s", (1,), 'group_members', 'idx_group_members_user'),
+    ("子目录列表", "SELECT * FROM folders WHERE parent_id = %s ORDER BY created_at ASC", (0,), 'folders', 'idx_folders_parent'),
+    ("目录文件列表", "SELECT c.*, u.name as uploader FROM contracts c LEFT JOIN users u ON c.uploader_id = u.id WHERE c.folder_id = %s ORDER BY c.created_at DESC", (0,), 'c', 'idx_contracts_folder'),
+    ("同名文件检查", "SELECT id, file_path FROM contracts WHERE folder_id=%s AND title=%s", (0, 'a.pdf'), 'contracts', 'idx_contracts_folder_title'),
+    ("文件权限", "SELECT MAX(can_view) as v, MAX(can_download) as d FROM contract_permissions WHERE contract_id=%s AND ((subject_type='user' AND subject_id=%s) OR (subject_type='group' AND subject_id IN %s))", (1, 1, [1, -1]), 'contract_permissions', 'unique_perm'),
+    ("按用户清理文件授权", "DELETE FROM contract_permissions WHERE subject_type='user' AND subject_id=%s", (0,), 'contract_permissions', 'idx_cp_subject'),
+    ("按用户清理目录授权", "DELETE FROM folder_permissions WHERE subject_type='user' AND subject_id=%s", (0,), 'folder_permissions', 'idx_fp_subject'),
+    ("审计日志分页", "SELECT a.id, a.action_type, a.trace_id, a.created_at FROM audit_logs a ORDER BY a.created_at DESC LIMIT 200", (), 'a', 'idx_audit_created'),
+    ("水印溯源", "SELECT a.trace_id FROM audit_logs a WHERE a.trace_id IN (%s) OR a.trace_id LIKE %s", ('TRACE_1_1_x', 'TRACE\\_1\\_1700000000\\_ab%'), 'a', 'idx_audit_trace'),
+]
+
+
+def check(cursor, name, sql, params, table, index, strict):
+    cursor.execute("EXPLAIN " + sql, params)
+    rows = [r for r in cursor.fetchall() if r.get('table') == table]
+    if not rows: return {"name": name, "ok": False, "reason": f"EXPLAIN 中没有表 {table}"}
+    row = rows[0]
+    possible = (row.get('possible_keys') or '').split(',')
+    used = row.get('key')
+    extra = row.get('Extra') or ''
+    if strict: ok = used == index and row.get('type') != 'ALL'
+    # ORDER BY ... LIMIT 依靠索引顺序扫描时 possible_keys 为空，此时看实际 key / 是否需要 filesort
+    else: ok = index in possible or used == index or ('ORDER BY' in sql and 'LIMIT' in sql and 'filesort' not in extra)
+    return {"name": name, "ok": ok, "expected": index, "key": used, "possible_keys": row.get('possible_keys'),
+            "type": row.get('type'), "rows": row.get('rows'), "extra": extra}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-based query plan regression check")
+    parser.add_argument('--strict', action='store_true', help="要求实际使用期望索引且不出现全表扫描")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    conn = pymysql.connect(host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASS,
+                           database=Config.DB_NAME, cursorclass=pymysql.cursors.DictCursor)
+    try:
+        with conn.cursor() as cursor:
+            version = current_version(cursor)
+            if version < LATEST_VERSION:
+                sys.exit(f"❌ schema 版本 {version} 落后于 {LATEST_VERSION}，请先启动应用或执行 reset_db_full.py 完成迁移")
+            results = [check(cursor, *c, strict=args.strict) for c in CHECKS]
+        conn.rollback()
+    finally: conn.close()
+
+    if args.json: print(json.dumps(results, ensure_ascii=False, indent=2, default=str))
+    else:
+        for r in results:
+            mark = '✅' if r['ok'] else '❌'
+            print(f"{mark} {r['name']}: key={r.get('key')} type={r.get('type')} rows={r.get('rows')} 期望 {r.get('expected')} {r.get('reason', '')}")
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
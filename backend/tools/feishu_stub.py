@@ -0,0 +1,85 @@
+# backend/tools/feishu_stub.py
+"""
+本地飞书开放平台 stub，用于联调 / 压测 login_feishu，不依赖外网。
+
+用法:
+    python tools/feishu_stub.py --port 18080 --expire 7200 --latency 0.05
+    FEISHU_BASE_URL=http://127.0.0.1:18080 python run.py
+
+授权码 code 原样映射为用户 open_id (ou_<code>)，便于构造任意数量的用户。
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS = {"token": 0, "oidc": 0, "user_info": 0}
+_stats_lock = threading.Lock()
+
+
+def _make_handler(expire, latency):
+    class FeishuStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args): pass
+
+        def _json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _count(self, key):
+            with _stats_lock: STATS[key] += 1
+            if latency: time.sleep(latency)
+
+        def do_POST(self):
+            if self.path == '/open-apis/auth/v3/app_access_token/internal':
+                self._count("token")
+                data = self._body()
+                return self._json({"code": 0, "msg": "ok", "expire": expire,
+                                   "app_access_token": f"a-{data.get('app_id')}-{int(time.time())}",
+                                   "tenant_access_token": f"t-{data.get('app_id')}-{int(time.time())}"})
+            if self.path == '/open-apis/authen/v1/oidc/access_token':
+                self._count("oidc")
+                code = self._body().get('code')
+                if not code: return self._json({"code": 20003, "msg": "invalid code"}, 400)
+                return self._json({"code": 0, "data": {"access_token": f"u-{code}", "expires_in": 7200}})
+            self._json({"code": 404, "msg": "not found"}, 404)
+
+        def do_GET(self):
+            if self.path == '/open-apis/authen/v1/user_info':
+                self._count("user_info")
+                auth = self.headers.get('Authorization', '')
+                code = auth.split('u-', 1)[1] if 'u-' in auth else 'anonymous'
+                return self._json({"code": 0, "data": {"open_id": f"ou_{code}", "name": f"stub_{code}",
+                                                       "email": f"{code}@stub.local"}})
+            if self.path == '/_stats':
+                with _stats_lock: return self._json(dict(STATS))
+            self._json({"code": 404, "msg": "not found"}, 404)
+
+    return FeishuStubHandler
+
+
+def start_stub(port=0, expire=7200, latency=0.0):
+    """在后台线程启动 stub，返回 server (server.server_address[1] 为实际端口)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(expire, latency))
+    threading.Thread(target=server.serve_forever, name="feishu-stub", daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local Feishu OpenAPI stub")
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--expire', type=int, default=7200)
+    parser.add_argument('--latency', type=float, default=0.0, help="每次调用的模拟延迟(秒)")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), _make_handler(args.expire, args.latency))
+    print(f"Feishu stub listening on http://127.0.0.1:{args.port}")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
@@ -0,0 +1,359 @@
+# backend/tools/loadtest_scenarios.py
+"""
+场景化压测：在本进程内启动真实 HTTP 服务 (werkzeug 多线程，完整走路由 / 中间件 / MySQL)，
+由 N 个虚拟用户按权重循环执行真实业务流程，用于评估单节点可承载的并发预览人数，
+以及 gunicorn worker 数与水印线程池的配置。
+
+场景 (权重可调):
+    browse_preview  账号登录 (验证码 + MFA) -> 目录 -> 子目录 -> 文件列表 -> 分页预览 PDF -> 预览图片
+    search_download 账号登录 -> 搜索 -> 下载 (水印) 一个样本文件
+    upload          管理员登录 -> 上传 PDF -> 刷新文件列表
+    feishu_browse   飞书登录 (本地 stub) -> 目录 -> 搜索
+
+- 数据来自 tools/bench_suite.py 生成的基准库 (需先运行一次，默认库名 contract_bench)；
+  本工具只额外创建 load_user_* / load_admin_* 账号 (已知密码与 MFA 密钥) 并复制 bench 用户的组与样本授权；
+- 验证码答案直接从本进程的 captcha_pool 读出，MFA 用已知密钥计算 TOTP，飞书走 tools/feishu_stub.py；
+- 限流在压测进程内关闭；上传文件写入 --workdir，不进 contracts_storage。
+
+输出 JSON：每个场景步骤的吞吐、p50/p90/p95/p99、错误率，整体 RPS，服务端 CPU 秒 / 请求，
+以及水印流水线各阶段耗时 (来自 /metrics 的同一份数据)。结果只代表单个进程，
+多 worker 部署按 CPU 秒 / 请求 与核数估算。
+
+用法:
+    python tools/loadtest_scenarios.py --users 20 --duration 60
+    python tools/loadtest_scenarios.py --users 50 --duration 120 --mix browse_preview=8,search_download=2 --think-ms 500
+"""
+import os
+import sys
+import io
+import json
+import time
+import random
+import resource
+import argparse
+import datetime
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+
+from feishu_stub import start_stub  # noqa: E402
+
+PASSWORD = 'Load#Test2024'
+DEFAULT_MIX = "browse_preview=6,search_download=3,upload=1,feishu_browse=2"
+SEARCH_TERMS = ['合同', '采购', '租赁', '服务', '合同_1', '框架', '保密']
+
+
+# ---------- 统计 ----------
+class Recorder:
+    """按 场景.步骤 汇总延迟样本与错误"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.sessions = {}
+        self.failed_sessions = {}
+
+    def record(self, name, elapsed, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if not ok: self.errors[name] = self.errors.get(name, 0) + 1
+
+    def session(self, scenario, ok):
+        with self._lock:
+            self.sessions[scenario] = self.sessions.get(scenario, 0) + 1
+            if not ok: self.failed_sessions[scenario] = self.failed_sessions.get(scenario, 0) + 1
+
+
+def percentile(sorted_samples, p):
+    return sorted_samples[min(len(sorted_samples) - 1, int(round(p / 100.0 * (len(sorted_samples) - 1))))]
+
+
+class StepFailed(Exception):
+    pass
+
+
+# ---------- 虚拟用户 ----------
+class VirtualUser:
+    def __init__(self, vu_id, base_url, ids, accounts, recorder, rng, think_ms, captcha_answer, upload_pdf):
+        self.vu_id = vu_id
+        self.base = base_url
+        self.ids = ids
+        self.accounts = accounts
+        self.rec = recorder
+        self.rng = rng
+        self.think_ms = think_ms
+        self.captcha_answer = captcha_answer
+        self.upload_pdf = upload_pdf
+        self.http = requests.Session()
+        self.scenario = None
+        self.headers = {}
+        self.uploads = 0
+
+    def step(self, name, method, path, expect=(200,), **kwargs):
+        t0 = time.perf_counter()
+        ok, resp = False, None
+        try:
+            resp = self.http.request(method, self.base + path, headers=self.headers, timeout=120, **kwargs)
+            _ = resp.content
+            ok = resp.status_code in expect
+        except requests.RequestException: pass
+        self.rec.record(f"{self.scenario}.{name}", time.perf_counter() - t0, ok)
+        if not ok: raise StepFailed(name)
+        return resp
+
+    def think(self):
+        if self.think_ms: time.sleep(self.rng.expovariate(1000.0 / self.think_ms))
+
+    # ---------- 登录 ----------
+    def login_password(self, account):
+        self.headers = {}
+        captcha = self.step('captcha', 'GET', '/api/captcha').json()
+        self.step('captcha_image', 'GET', captcha['image'])
+        code = self.captcha_answer(captcha['token'])
+        data = self.step('login_admin', 'POST', '/api/login_admin', json={
+            "username": account['username'], "password": PASSWORD, "captcha_token": captcha['token'], "captcha_code": code}).json()
+        if data.get('status') == 'mfa_required':
+            import pyotp
+            data = self.step('verify_mfa', 'POST', '/api/login/verify_mfa', json={
+                "pre_auth_token": data['pre_auth_token'], "mfa_code": pyotp.TOTP(account['mfa_secret']).now()}).json()
+        if data.get('status') != 'success': raise StepFailed('login')
+        self.headers = {'Authorization': f"Bearer {data['token']}"}
+
+    def login_feishu(self):
+        self.headers = {}
+        data = self.step('login_feishu', 'POST', '/api/login_feishu', json={"code": f"load{self.vu_id}"}).json()
+        self.headers = {'Authorization': f"Bearer {data['token']}"}
+
+    # ---------- 场景 ----------
+    def browse_preview(self):
+        self.login_password(self.rng.choice(self.accounts['user']))
+        self.think()
+        folders = self.step('list_root', 'GET', '/api/folders?parent_id=0').json()
+        self.think()
+        parent = self.rng.choice(folders)['id'] if folders else self.ids['top'][0]
+        subfolders = self.step('list_subfolders', 'GET', f"/api/folders?parent_id={parent}").json()
+        target = self.rng.choice(subfolders)['id'] if subfolders else parent
+        self.step('list_files', 'GET', f"/api/contracts?folder_id={target}")
+        self.think()
+        start = self.rng.randint(1, 3)
+        self.step('preview_pdf', 'GET', f"/api/download/{self.ids['samples']['pdf']}?pages={start}-{start + 2}")
+        self.think()
+        kind = self.rng.choice(['jpg', 'png'])
+        self.step('preview_image', 'GET', f"/api/download/{self.ids['samples'][kind]}")
+
+    def search_download(self):
+        self.login_password(self.rng.choice(self.accounts['user']))
+        self.think()
+        self.step('search', 'GET', f"/api/search?q={self.rng.choice(SEARCH_TERMS)}")
+        self.think()
+        kind = self.rng.choice(list(self.ids['samples']))
+        self.step(f'download_{kind}', 'POST', f"/api/download/{self.ids['samples'][kind]}")
+
+    def upload(self):
+        self.login_password(self.rng.choice(self.accounts['admin']))
+        self.think()
+        self.uploads += 1
+        name = f"load_{self.vu_id}_{self.uploads}_{int(time.time())}.pdf"
+        self.step('upload', 'POST', '/api/upload', files={'file': (name, io.BytesIO(self.upload_pdf), 'application/pdf')},
+                  data={'folder_id': str(self.ids['sample_folder']), 'conflict_mode': 'rename'})
+        self.step('list_files', 'GET', f"/api/contracts?folder_id={self.ids['sample_folder']}")
+
+    def feishu_browse(self):
+        self.login_feishu()
+        self.think()
+        self.step('list_root', 'GET', '/api/folders?parent_id=0')
+        self.think()
+        self.step('search', 'GET', f"/api/search?q={self.rng.choice(SEARCH_TERMS)}")
+
+    def run(self, mix, deadline):
+        names, weights = zip(*mix.items())
+        while time.monotonic() < deadline:
+            self.scenario = self.rng.choices(names, weights)[0]
+            try:
+                getattr(self, self.scenario)()
+                self.rec.session(self.scenario, True)
+            except StepFailed:
+                self.rec.session(self.scenario, False)
+            self.think()
+
+
+# ---------- 准备 ----------
+def prepare_accounts(conn, ids, n_users, n_admins):
+    """创建 / 复用压测账号 (固定密码 + MFA 密钥)，普通账号复制 bench 用户的组与样本文件授权"""
+    import pyotp
+    accounts = {"user": [], "admin": []}
+    with conn.cursor() as cursor:
+        for role, n in (('user', n_users), ('admin', n_admins)):
+            for i in range(n):
+                username = f"load_{role}_{i}"
+                cursor.execute("SELECT id, mfa_secret FROM users WHERE username=%s", (username,))
+                row = cursor.fetchone()
+                if row: uid, secret = row['id'], row['mfa_secret']
+                else:
+                    secret = pyotp.random_base32()
+                    cursor.execute("INSERT INTO users (username, password, name, email, role, mfa_secret) VALUES (%s, %s, %s, %s, %s, %s)",
+                                   (username, PASSWORD, f"压测{role}{i}", f"{username}@example.com", role, secret))
+                    uid = cursor.lastrowid
+                    if role == 'user':
+                        cursor.execute("INSERT IGNORE INTO group_members (group_id, user_id) SELECT group_id, %s FROM group_members WHERE user_id=%s", (uid, ids['user']))
+                        for cid in ids['samples'].values():
+                            cursor.execute("INSERT IGNORE INTO contract_permissions (contract_id, subject_id, subject_type, can_view, can_download) VALUES (%s, %s, 'user', 1, 1)", (cid, uid))
+                accounts[role].append({"id": uid, "username": username, "mfa_secret": secret})
+    conn.commit()
+    return accounts
+
+
+def make_upload_pdf(pages=3):
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for p in range(pages):
+        c.drawString(72, 760, f"Load test upload - page {p + 1}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('browse_preview', 'search_download', 'upload', 'feishu_browse'): sys.exit(f"❌ 未知场景: {name}")
+        if float(weight or 1) > 0: mix[name] = float(weight or 1)
+    return mix
+
+
+def summarize(recorder, wall):
+    steps = {}
+    for name, samples in sorted(recorder.samples.items()):
+        s = sorted(samples)
+        errors = recorder.errors.get(name, 0)
+        steps[name] = {
+            "count": len(s), "errors": errors, "error_rate": round(errors / len(s), 4), "rps": round(len(s) / wall, 2),
+            "p50_ms": round(percentile(s, 50) * 1000, 1), "p90_ms": round(percentile(s, 90) * 1000, 1),
+            "p95_ms": round(percentile(s, 95) * 1000, 1), "p99_ms": round(percentile(s, 99) * 1000, 1),
+            "max_ms": round(s[-1] * 1000, 1),
+        }
+    scenarios = {}
+    for name, n in sorted(recorder.sessions.items()):
+        failed = recorder.failed_sessions.get(name, 0)
+        scenarios[name] = {"sessions": n, "failed": failed, "failure_rate": round(failed / n, 4), "sessions_per_s": round(n / wall, 2)}
+    total = sum(v['count'] for v in steps.values())
+    errors = sum(v['errors'] for v in steps.values())
+    overall = {"requests": total, "errors": errors, "error_rate": round(errors / total, 4) if total else 0, "rps": round(total / wall, 2)}
+    return overall, scenarios, steps
+
+
+def stage_summary(metrics):
+    """水印流水线各阶段的次数与平均耗时"""
+    result = {}
+    with metrics._lock:
+        for (stage, file_type), (_, total, n) in metrics.stage_latency._series.items():
+            if n: result[f"{stage}:{file_type or '-'}"] = {"count": n, "mean_ms": round(total / n * 1000, 1)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario-based load test against a local server")
+    parser.add_argument('--db', default='contract_bench', help="由 bench_suite.py 生成的基准库")
+    parser.add_argument('--users', type=int, default=20, help="并发虚拟用户数")
+    parser.add_argument('--duration', type=float, default=60, help="持续时间(秒)")
+    parser.add_argument('--ramp', type=float, default=10, help="虚拟用户在该时间内逐个启动(秒)")
+    parser.add_argument('--think-ms', type=float, default=1000, help="步骤间平均思考时间 (指数分布)，0 为不停顿")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="场景权重，如 browse_preview=6,upload=1")
+    parser.add_argument('--accounts', type=int, default=10, help="普通压测账号数 (管理员账号取其 1/5)")
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--stub-latency', type=float, default=0.05, help="飞书 stub 每次调用的模拟延迟(秒)")
+    parser.add_argument('--workdir', default=os.path.join(BACKEND_DIR, 'bench_data'))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="结果 JSON 路径，默认输出到 stdout")
+    args = parser.parse_args()
+
+    if args.db == 'contract_system': sys.exit("❌ 拒绝在业务库 contract_system 上压测，请使用 bench_suite.py 生成的独立库")
+    mix = parse_mix(args.mix)
+    stub = start_stub(latency=args.stub_latency)
+    os.environ['DB_NAME'] = args.db
+    os.environ['FEISHU_BASE_URL'] = f"http://127.0.0.1:{stub.server_address[1]}"
+    os.environ.setdefault('PREVIEW_CACHE_FOLDER', os.path.join(args.workdir, 'cache'))
+    os.environ.setdefault('BACKUP_FOLDER', os.path.join(args.workdir, 'backups'))
+
+    import pymysql
+    from werkzeug.serving import make_server
+    from app import create_app
+    from app.config import Config
+    from app.extensions import limiter, captcha_pool, metrics
+
+    app = create_app()
+    limiter.enabled = False
+    app.config['UPLOAD_FOLDER'] = os.path.join(args.workdir, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    conn = pymysql.connect(host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASS,
+                           database=args.db, cursorclass=pymysql.cursors.DictCursor)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT `value` FROM system_settings WHERE `key`='bench_seed'")
+            row = cursor.fetchone()
+        if not row: sys.exit(f"❌ {args.db} 中没有基准数据，请先运行 python tools/bench_suite.py --db {args.db}")
+        seed_info = json.loads(row['value'])
+        ids = seed_info['ids']
+        accounts = prepare_accounts(conn, ids, args.accounts, max(1, args.accounts // 5))
+    finally: conn.close()
+
+    def captcha_answer(token):
+        # 本地模式：直接读取进程内验证码答案
+        with captcha_pool._issued_lock:
+            item = captcha_pool._issued.get(token)
+        return item['code'] if item else ''
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"Serving on {base_url}, {args.users} users for {args.duration}s, mix={mix}", file=sys.stderr)
+
+    recorder = Recorder()
+    upload_pdf = make_upload_pdf()
+    usage0 = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.monotonic()
+    deadline = start + args.ramp + args.duration
+    threads = []
+    for i in range(args.users):
+        vu = VirtualUser(i, base_url, ids, accounts, recorder, random.Random(args.seed * 1000 + i), args.think_ms, captcha_answer, upload_pdf)
+        t = threading.Thread(target=vu.run, args=(mix, deadline), name=f"vu-{i}", daemon=True)
+        threads.append(t)
+        t.start()
+        if args.ramp and args.users > 1: time.sleep(args.ramp / args.users)
+    for t in threads: t.join()
+    wall = time.monotonic() - start
+    usage1 = resource.getrusage(resource.RUSAGE_SELF)
+    server.shutdown()
+
+    overall, scenarios, steps = summarize(recorder, wall)
+    # CPU 含压测客户端本身，作为单 worker 所需 CPU 的上限估计
+    cpu = (usage1.ru_utime - usage0.ru_utime) + (usage1.ru_stime - usage0.ru_stime)
+    report = {
+        "meta": {"users": args.users, "duration_s": args.duration, "ramp_s": args.ramp, "think_ms": args.think_ms,
+                 "mix": mix, "scale": seed_info['scale'], "cpu_count": os.cpu_count(),
+                 "at": datetime.datetime.now().isoformat(timespec='seconds'), "wall_s": round(wall, 1)},
+        "overall": dict(overall, cpu_s=round(cpu, 1), cpu_ms_per_request=round(cpu * 1000 / overall['requests'], 1) if overall['requests'] else None),
+        "scenarios": scenarios,
+        "steps": steps,
+        "watermark_stages": stage_summary(metrics),
+        "captcha": captcha_pool.snapshot(),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(text)
+    else: print(text)
+    for name, s in steps.items():
+        print(f"{name:<36} n={s['count']:<6} err={s['error_rate']:<7} p50={s['p50_ms']:>8} p95={s['p95_ms']:>8} p99={s['p99_ms']:>8} ms", file=sys.stderr)
+    print(f"TOTAL rps={overall['rps']} error_rate={overall['error_rate']} cpu_ms/req={report['overall']['cpu_ms_per_request']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# backend/tools/log_aggregator.py
+"""
+日志聚合进程：接收各 gunicorn worker 通过 LOG_SINK=socket 发来的 JSON 行，写入单个轮转文件，
+避免多个进程同时写 / 轮转同一个 app.log。
+
+只接受换行分隔的 JSON (不反序列化 pickle)；默认只监听本机。
+
+用法:
+    python tools/log_aggregator.py --port 9020 --output logs/app.log --max-mb 100 --backups 20
+    LOG_SINK=socket LOG_SOCKET=127.0.0.1:9020 gunicorn -w 4 run:app
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+import socketserver
+import logging.handlers
+
+STATS = {"lines": 0, "invalid": 0, "connections": 0}
+_lock = threading.Lock()
+
+
+def make_handler(writer):
+    class LineHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            with _lock: STATS["connections"] += 1
+            for raw in self.rfile:
+                line = raw.decode('utf-8', 'replace').strip()
+                if not line: continue
+                try: json.loads(line)
+                except ValueError:
+                    with _lock: STATS["invalid"] += 1
+                    continue
+                # 写入与轮转在同一把锁内完成，多个连接的行不会交错
+                with _lock:
+                    writer.emit(logging.makeLogRecord({"msg": line}))
+                    STATS["lines"] += 1
+
+    return LineHandler
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate JSON log lines from app workers into one rotating file")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9020)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'app.log'))
+    parser.add_argument('--rotate', choices=['size', 'time'], default='size')
+    parser.add_argument('--max-mb', type=int, default=100)
+    parser.add_argument('--when', default='midnight', help="--rotate time 时的轮转周期")
+    parser.add_argument('--backups', type=int, default=20)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if args.rotate == 'time':
+        writer = logging.handlers.TimedRotatingFileHandler(args.output, when=args.when, backupCount=args.backups, encoding='utf-8')
+    else:
+        writer = logging.handlers.RotatingFileHandler(args.output, maxBytes=args.max_mb * 1024 * 1024, backupCount=args.backups, encoding='utf-8')
+    writer.setFormatter(logging.Formatter('%(message)s'))
+
+    server = Server((args.host, args.port), make_handler(writer))
+    print(f"Log aggregator listening on {args.host}:{args.port} -> {args.output}", file=sys.stderr)
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        server.server_close()
+        writer.close()
+        print(json.dumps(STATS), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+# backend/tools/restore_backup.py
+"""
+按 manifest 链把某个备份时间点的 contracts_storage (及 db.sql.gz) 还原到指定目录。
+
+用法:
+    python tools/restore_backup.py backup_20240101_020000_inc.tar /tmp/restore
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.backup_service import BackupManager  # noqa: E402
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Restore a backup point from the manifest chain")
+    parser.add_argument('filename')
+    parser.add_argument('target_dir')
+    parser.add_argument('--no-db', action='store_true', help="不解出 db.sql.gz")
+    args = parser.parse_args()
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    count = BackupManager(root_dir).restore(args.filename, args.target_dir, with_db=not args.no_db)
+    print(f"✅ 已还原 {count} 个文件到 {args.target_dir}")
@@ -43,7 +43,8 @@ export default function Login({ onLoginSuccess }: LoginProps) {
         try {
             const res = await fetch(`${API_BASE_URL}/captcha`);
             const data = await res.json();
-            setCaptchaUrl(data.image);
+            // 图片通过 token URL 单独拉取 (服务端预渲染池)
+            setCaptchaUrl(`${API_BASE_URL}/captcha/${data.token}/image`);
             setCaptchaToken(data.token);
         } catch (e) { console.error('Captcha load failed'); }
     };